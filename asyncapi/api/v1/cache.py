@@ -0,0 +1,18 @@
+from core import context_logger
+from db.storage import TwoTierStorage, get_cache
+from fastapi import APIRouter, Depends
+from security.token_cache import token_cache
+
+logger = context_logger.get(__name__)
+
+router = APIRouter()
+
+
+@router.get(
+    '/cache/stats',
+    summary='Статистика кэша',
+    description='Количество попаданий и промахов по каждому уровню кэша и по кэшу проверенных JWT текущего воркера',
+    response_description='Размер локального кэша, попадания и промахи в памяти и в Redis, доля попаданий и время проверки JWT'
+)
+async def cache_stats(storage: TwoTierStorage = Depends(get_cache)) -> dict:
+    return {**storage.stats(), 'jwt': token_cache.stats()}
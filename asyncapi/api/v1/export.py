@@ -0,0 +1,47 @@
+import settings
+from core import context_logger
+from core.helpers import ndjson_chunks
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from security.security import get_permissions
+from services.film import FilmService, get_film_service
+from services.person import PersonService, get_person_service
+
+logger = context_logger.get(__name__)
+
+router = APIRouter()
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+# Каталог отдается потоком: документы читаются из эластика через scroll и отправляются кусками NDJSON.
+# Следующая пачка запрашивается у эластика, только когда клиент забрал предыдущую,
+# поэтому память не растет с размером каталога, а медленный клиент не копит очередь
+@router.get(
+    '/film/export',
+    summary='Выгрузка каталога фильмов',
+    description='Все доступные пользователю фильмы каталога в формате NDJSON: одна строка - один фильм',
+    response_description='Поток NDJSON с краткой или полной информацией о фильмах'
+)
+async def film_export(
+    full: bool = Query(default=False, description='Выгружать полную информацию о фильме'),
+    permissions: int = Depends(get_permissions),
+    film_service: FilmService = Depends(get_film_service)
+) -> StreamingResponse:
+    return StreamingResponse(
+        ndjson_chunks(film_service.export(full=full, permissions=permissions), settings.EXPORT_CHUNK_SIZE),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+@router.get(
+    '/person/export',
+    summary='Выгрузка каталога персон',
+    description='Все участники фильмов в формате NDJSON: одна строка - одна персона',
+    response_description='Поток NDJSON: ФИО и фильмы с ролями'
+)
+async def person_export(person_service: PersonService = Depends(get_person_service)) -> StreamingResponse:
+    return StreamingResponse(
+        ndjson_chunks(person_service.export(), settings.EXPORT_CHUNK_SIZE),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
@@ -4,7 +4,7 @@ from typing import List
 from core import context_logger
 from core.logger_route import LoggerRoute
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import Response
 from models.film import Film
 from security.security import jwt_permissions_required
 from services.film import FilmService, get_film_service
@@ -23,15 +23,16 @@ router = APIRouter(route_class=LoggerRoute)
     description='Детальная информация о фильме',
     response_description='Название, рейтинг, описание фильма и список участников'
 )
-async def film_details(film_id: str, film_service: FilmService = Depends(get_film_service)) -> ORJSONResponse:
-    film, cached = await film_service.get_by_id(film_id)
-    if not film:
+async def film_details(film_id: str, film_service: FilmService = Depends(get_film_service)) -> Response:
+    # из кэша приходит уже готовый json фильма, отдаем его как есть, минуя модель
+    body, cached = await film_service.get_body_by_id(film_id)
+    if not body:
         # Если фильм не найден, отдаём 404 статус
         # Желательно пользоваться уже определёнными HTTP-статусами, которые содержат enum
         # Такой код будет более поддерживаемым
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='film not found')
 
-    return ORJSONResponse(content=film.dict(), headers={'X-Cached': cached})
+    return Response(content=body, media_type='application/json', headers={'X-Cached': cached})
 
 
 @router.get(
@@ -1,13 +1,20 @@
+from http import HTTPStatus
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
+import settings
 from core import context_logger
 from core.logger_route import LoggerRoute
 from models.enumerations import QueryType
+from models.film import Film
 from models.film_response import FilmResponse
+from models.suggestion import FilmSuggestion
 from schemas.film_list import FilmFilterRequest, FilmSearchRequest
+from schemas.suggest import SuggestRequest
+from security.security import get_permissions
 from services.film import FilmService, get_film_service
+from services.suggest import SuggestService, get_suggest_service
 
 logger = context_logger.get(__name__)
 
@@ -23,12 +30,25 @@ router = APIRouter(route_class=LoggerRoute)
     response_description='Название и рейтинг фильма'
 )
 async def film_list_with_filter(
+    response: Response,
     request: FilmFilterRequest = Depends(),
+    permissions: int = Depends(get_permissions),
     film_list_service: FilmService = Depends(get_film_service)
 ) -> List[FilmResponse]:
+    if request.cursor is not None:
+        film_list, next_cursor = await film_list_service.get_by_cursor(
+            body=dict(request.dict(exclude_none=True)),
+            query_type=QueryType.FILTER,
+            permissions=permissions,
+        )
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return film_list
+
     film_list = await film_list_service.get_by_query(
         body=dict(request.dict(exclude_none=True)),
-        query_type=QueryType.FILTER
+        query_type=QueryType.FILTER,
+        permissions=permissions,
     )
     if not film_list:
         # вернем пустой список
@@ -45,15 +65,71 @@ async def film_list_with_filter(
     response_description='Название и рейтинг фильма'
 )
 async def film_search(
+    response: Response,
     request: FilmSearchRequest = Depends(),
+    permissions: int = Depends(get_permissions),
     film_list_service: FilmService = Depends(get_film_service)
 ) -> List[FilmResponse]:
-    film_list = await film_list_service.get_by_query(
+    # в заголовке X-Search-Phase сообщаем, какой этап поиска нашел фильмы: exact или fuzzy
+    if request.cursor is not None:
+        film_list, next_cursor, phase = await film_list_service.search_by_cursor(
+            body=dict(request.dict(exclude_none=True)),
+            permissions=permissions,
+        )
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        if phase:
+            response.headers['X-Search-Phase'] = phase.value
+        return film_list
+
+    film_list, phase = await film_list_service.search(
         body=dict(request.dict(exclude_none=True)),
-        query_type=QueryType.SEARCH
+        permissions=permissions,
     )
+    if phase:
+        response.headers['X-Search-Phase'] = phase.value
     if not film_list:
         # вернем пустой список
         return []
 
     return film_list
+
+
+@router.get(
+    '/film/batch',
+    response_model=List[Film],
+    summary='Информация о нескольких фильмах',
+    description='Детальная информация о фильмах по списку id за один запрос',
+    response_description='Фильмы в порядке запрошенных id, ненайденные и недоступные пропускаются'
+)
+async def film_batch(
+    ids: str = Query(..., description='id фильмов через запятую'),
+    permissions: int = Depends(get_permissions),
+    film_list_service: FilmService = Depends(get_film_service)
+) -> List[Film]:
+    film_ids = [film_id.strip() for film_id in ids.split(',') if film_id.strip()]
+    if len(film_ids) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=f'no more than {settings.BATCH_MAX_IDS} ids allowed'
+        )
+    if not film_ids:
+        return []
+
+    return await film_list_service.get_by_ids(film_ids, permissions)
+
+
+@router.get(
+    '/film/suggest',
+    response_model=List[FilmSuggestion],
+    summary='Подсказки названий фильмов',
+    description='Подсказки при наборе названия фильма: фильмы, название которых начинается с введенных слов',
+    response_description='id и название фильма'
+)
+async def film_suggest(
+    request: SuggestRequest = Depends(),
+    permissions: int = Depends(get_permissions),
+    suggest_service: SuggestService = Depends(get_suggest_service)
+) -> Response:
+    body, cached = await suggest_service.suggest_films(request.query, request.size, permissions)
+    return Response(content=body, media_type='application/json', headers={'X-Cached': cached})
@@ -2,7 +2,7 @@ from http import HTTPStatus
 
 from core import context_logger
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import Response
 from models.genre import Genre
 from services.genre import GenreService, get_genre_service
 logger = context_logger.get(__name__)
@@ -16,10 +16,10 @@ router = APIRouter()
     summary='Информация о жанре',
     response_description='Наименование жанра'
 )
-async def genre_details(genre_id: str, genre_service: GenreService = Depends(get_genre_service)) -> ORJSONResponse:
-    genre, cached = await genre_service.get_by_id(genre_id)
-    if not genre:
+async def genre_details(genre_id: str, genre_service: GenreService = Depends(get_genre_service)) -> Response:
+    body, cached = await genre_service.get_body_by_id(genre_id)
+    if not body:
         # Если пусто, отдаём 404 статус
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='genre not found')
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='Genre not found')
 
-    return ORJSONResponse(content=genre.dict(), headers={'X-Cached': cached})
+    return Response(content=body, media_type='application/json', headers={'X-Cached': cached})
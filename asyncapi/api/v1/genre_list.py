@@ -1,7 +1,8 @@
 from typing import List
 
 from core import context_logger
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends
+from fastapi.responses import Response
 from models.genre import Genre
 from services.genre import GenreService, get_genre_service
 logger = context_logger.get(__name__)
@@ -15,15 +16,6 @@ router = APIRouter()
     summary='Список жанров',
     response_description='Id и наименование жанра'
 )
-async def genre_list(
-    request: Request,
-    genre_list_service: GenreService = Depends(get_genre_service)
-) -> List[Genre]:
-    item_list = await genre_list_service.get_by_query(
-        body=dict(request.query_params)
-    )
-    if not item_list:
-        # вернем пустой список
-        return []
-
-    return item_list
+async def genre_list(genre_list_service: GenreService = Depends(get_genre_service)) -> Response:
+    # список жанров берется из снимка в памяти уже готовым json
+    return Response(content=await genre_list_service.get_list_body(), media_type='application/json')
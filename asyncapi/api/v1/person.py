@@ -3,9 +3,10 @@ from typing import List
 
 from core import context_logger
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import Response
 from models.film_response import FilmResponse
 from models.person_response import PersonResponse
+from schemas.person_list import PersonFilmsRequest
 from services.person import PersonService, get_person_service
 logger = context_logger.get(__name__)
 
@@ -22,13 +23,13 @@ router = APIRouter()
 async def person_details(
     person_id: str,
     person_service: PersonService = Depends(get_person_service)
-) -> ORJSONResponse:
-    person, cached = await person_service.get_by_id(person_id)
-    if not person:
+) -> Response:
+    body, cached = await person_service.get_body_by_id(person_id)
+    if not body:
         # Если пусто, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='person not found')
 
-    return ORJSONResponse(content=person.dict(), headers={'X-Cached': cached})
+    return Response(content=body, media_type='application/json', headers={'X-Cached': cached})
 
 
 @router.get(
@@ -41,9 +42,14 @@ async def person_details(
 )
 async def person_films(
     person_id: str,
+    request: PersonFilmsRequest = Depends(),
     person_service: PersonService = Depends(get_person_service)
 ) -> List[FilmResponse]:
-    film_list = await person_service.get_films_by_person_id(person_id)
+    film_list = await person_service.get_films_by_person_id(
+        person_id,
+        page_size=request.page_size,
+        page_number=request.page_number,
+    )
     if not film_list:
         # Если пусто, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='nothing found')
@@ -1,11 +1,14 @@
 from typing import List
 
 from core import context_logger
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from models.enumerations import QueryType
 from models.person_response import PersonResponse
+from models.suggestion import PersonSuggestion
 from schemas.person_list import PersonSearchRequest
+from schemas.suggest import SuggestRequest
 from services.person import PersonService, get_person_service
+from services.suggest import SuggestService, get_suggest_service
 
 logger = context_logger.get(__name__)
 
@@ -20,9 +23,16 @@ router = APIRouter()
     response_description='ФИО персонажа, его роль и список фильмов'
 )
 async def person_details(
+    response: Response,
     request: PersonSearchRequest = Depends(),
     person_list_service: PersonService = Depends(get_person_service)
 ) -> List[PersonResponse]:
+    if request.cursor is not None:
+        item_list, next_cursor = await person_list_service.get_by_cursor(body=dict(request.dict(exclude_none=True)))
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return item_list
+
     item_list = await person_list_service.get_by_query(
         body=dict(request.dict(exclude_none=True)),
         query_type=QueryType.SEARCH
@@ -32,3 +42,18 @@ async def person_details(
         return []
 
     return item_list
+
+
+@router.get(
+    '/person/suggest',
+    response_model=List[PersonSuggestion],
+    summary='Подсказки имен персонажей',
+    description='Подсказки при наборе имени участника фильма',
+    response_description='id и ФИО персонажа'
+)
+async def person_suggest(
+    request: SuggestRequest = Depends(),
+    suggest_service: SuggestService = Depends(get_suggest_service)
+) -> Response:
+    body, cached = await suggest_service.suggest_persons(request.query, request.size)
+    return Response(content=body, media_type='application/json', headers={'X-Cached': cached})
@@ -1,13 +1,16 @@
+import asyncio
 import logging
 
 import aioredis
 import settings
-from api.v1 import film, film_list, genre, genre_list, person, person_list
+from api.v1 import cache, export, film, film_list, genre, genre_list, person, person_list
 from core import context_logger
-from db import db_client, storage
+from db import compression, db_client, storage
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
-from security.security import init_jwt_public_key
+from security import key_provider
+from services import genre_catalogue, suggest
+from services.cache_invalidation import listen_invalidations
 
 from elasticsearch import AsyncElasticsearch
 
@@ -26,7 +29,15 @@ app = FastAPI(
 
 @app.on_event('startup')
 async def startup():
-    app.state.jwt_public_key = await init_jwt_public_key()
+    key_provider.key_provider = key_provider.PublicKeyProvider(
+        url=settings.JWT_KEY_URL,
+        static_key=settings.JWT_PUBLIC_KEY,
+        cache_path=settings.JWT_KEY_CACHE_PATH,
+        refresh_interval=settings.JWT_KEY_REFRESH_IN_SECONDS,
+        min_backoff=settings.JWT_KEY_MIN_BACKOFF_IN_SECONDS,
+        max_backoff=settings.JWT_KEY_MAX_BACKOFF_IN_SECONDS,
+    )
+    await key_provider.key_provider.start(settings.JWT_KEY_STARTUP_TIMEOUT_IN_SECONDS)
     storage.redis = aioredis.Redis(
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
@@ -34,16 +45,40 @@ async def startup():
         ssl=settings.REDIS_USE_SSL,
         ssl_cert_reqs='none',
     )
+    compression.dictionary = compression.load_dictionary(settings.CACHE_COMPRESSION_DICT_PATH)
+    storage.local_cache = storage.LRUStorage(
+        max_size=settings.LOCAL_CACHE_MAX_SIZE,
+        expire=settings.LOCAL_CACHE_EXPIRE_IN_SECONDS,
+    )
     db_client.es = AsyncElasticsearch(
         hosts=[f'{settings.ELASTIC_HOST}:{settings.ELASTIC_PORT}'],
         http_auth=(settings.ELASTIC_USER, settings.ELASTIC_PASSWORD),
         use_ssl=settings.ELASTIC_USE_SSL,
         verify_certs=False
     )
+    suggest.suggest_cache = storage.LRUStorage(
+        max_size=settings.SUGGEST_CACHE_MAX_SIZE,
+        expire=settings.SUGGEST_CACHE_EXPIRE_IN_SECONDS,
+    )
+    genre_catalogue.genre_catalogue = genre_catalogue.GenreCatalogue(
+        db_client.EsDatabaseClient(db_client.es),
+        refresh_interval=settings.GENRE_SNAPSHOT_REFRESH_IN_SECONDS,
+    )
+    genre_catalogue.genre_catalogue.start()
+    app.state.invalidation_listener = None
+    if settings.CACHE_INVALIDATION_ENABLED:
+        app.state.invalidation_listener = asyncio.create_task(listen_invalidations(
+            storage.redis,
+            storage.TwoTierStorage(local=storage.local_cache, remote=storage.RedisStorage(storage.redis)),
+        ))
 
 
 @app.on_event('shutdown')
 async def shutdown():
+    await key_provider.key_provider.stop()
+    if app.state.invalidation_listener:
+        app.state.invalidation_listener.cancel()
+    genre_catalogue.genre_catalogue.stop()
     await storage.redis.close()
     await db_client.es.close()
 
@@ -53,9 +88,11 @@ async def shutdown():
 # !Порядок следования имеет значение!
 # /api/v1/film/search - это должно уходить в первый маршрутизатор
 # иначе он рассматривается как /api/v1/film/<uuid:UUID>
+app.include_router(export.router, prefix='/api/v1', tags=['Выгрузка'])
 app.include_router(film_list.router, prefix='/api/v1', tags=['Фильмы'])
 app.include_router(film.router, prefix='/api/v1', tags=['Фильмы'])
 app.include_router(person_list.router, prefix='/api/v1', tags=['Люди'])
 app.include_router(person.router, prefix='/api/v1', tags=['Люди'])
 app.include_router(genre.router, prefix='/api/v1', tags=['Жанры'])
 app.include_router(genre_list.router, prefix='/api/v1', tags=['Жанры'])
+app.include_router(cache.router, prefix='/api/v1', tags=['Служебное'])
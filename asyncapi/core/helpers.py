@@ -1,6 +1,21 @@
+from typing import AsyncIterator
+
 import orjson
+from pydantic import BaseModel
 
 
 def orjson_dumps(v, *, default):
     # orjson.dumps returns bytes, to match standard json.dumps we need to decode
     return orjson.dumps(v, default=default).decode()
+
+
+async def ndjson_chunks(items: AsyncIterator[BaseModel], chunk_size: int) -> AsyncIterator[bytes]:
+    """Собирает объекты моделей в куски NDJSON по chunk_size строк, в памяти держится только текущий кусок"""
+    lines = []
+    async for item in items:
+        lines.append(orjson.dumps(item.dict()))
+        if len(lines) >= chunk_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
@@ -0,0 +1,87 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+import settings
+import zstandard
+from core import context_logger
+
+logger = context_logger.get(__name__)
+
+# Первый байт значения в Redis: как оно записано. Значения без заголовка (записанные до сжатия)
+# начинаются с '{', поэтому старые и новые записи могут лежать в Redis одновременно
+RAW = b'\x00'
+ZSTD = b'\x01'
+ZSTD_DICT = b'\x02'
+
+# Размер словаря по умолчанию, как у zstd --train
+MAX_DICTIONARY_SIZE = 110 * 1024
+
+# Словарь для сжатия. Загружается при старте приложения, один на процесс
+dictionary: Optional[zstandard.ZstdCompressionDict] = None
+
+
+def load_dictionary(path: Optional[str]) -> Optional[zstandard.ZstdCompressionDict]:
+    if not path:
+        return None
+    data = Path(path).read_bytes()
+    logger.info(f'Loaded cache compression dictionary {path}, {len(data)} bytes')
+    return zstandard.ZstdCompressionDict(data)
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = MAX_DICTIONARY_SIZE) -> bytes:
+    """
+    Обучает словарь zstd по образцам значений: в него попадают ключи json и повторяющиеся строки (жанры, имена).
+    Id словаря записывается в каждое сжатое им значение, поэтому чужой словарь не даст испорченных данных
+    """
+    return zstandard.train_dictionary(size, list(samples)).as_bytes()
+
+
+@lru_cache(maxsize=4)
+def _compressor(zstd_dict: Optional[zstandard.ZstdCompressionDict], level: int) -> zstandard.ZstdCompressor:
+    # подготовка словаря дорогая, поэтому компрессор создается один раз на словарь и уровень
+    if zstd_dict is None:
+        return zstandard.ZstdCompressor(level=level)
+    return zstandard.ZstdCompressor(level=level, dict_data=zstd_dict)
+
+
+@lru_cache(maxsize=4)
+def _decompressor(zstd_dict: Optional[zstandard.ZstdCompressionDict]) -> zstandard.ZstdDecompressor:
+    if zstd_dict is None:
+        return zstandard.ZstdDecompressor()
+    return zstandard.ZstdDecompressor(dict_data=zstd_dict)
+
+
+def compress(value: bytes) -> bytes:
+    """Добавляет к значению заголовок и сжимает его, если оно не меньше CACHE_COMPRESSION_MIN_SIZE"""
+    if not settings.CACHE_COMPRESSION_ENABLED or len(value) < settings.CACHE_COMPRESSION_MIN_SIZE:
+        return RAW + value
+
+    header = ZSTD_DICT if dictionary else ZSTD
+    return header + _compressor(dictionary, settings.CACHE_COMPRESSION_LEVEL).compress(value)
+
+
+def decompress(value: Optional[bytes]) -> Optional[bytes]:
+    """
+    Возвращает исходное значение по заголовку. Если значение сжато со словарем, которого у воркера нет
+    или он другой, то возвращает None - запись считается промахом и будет перезаписана
+    """
+    if not value:
+        return value
+
+    header, data = value[:1], value[1:]
+    try:
+        if header == RAW:
+            return data
+        if header == ZSTD:
+            return _decompressor(None).decompress(data)
+        if header == ZSTD_DICT:
+            if not dictionary:
+                return None
+            return _decompressor(dictionary).decompress(data)
+    except zstandard.ZstdError as e:
+        logger.warning(f'Failed to decompress cache value: {str(e)}')
+        return None
+
+    # значение записано до появления заголовков
+    return value
@@ -1,9 +1,11 @@
 import logging
 
+import settings
 from core import context_logger
 from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_scan
 import abc
-from typing import Optional, Awaitable, Union, List
+from typing import Optional, Awaitable, Union, List, Tuple, AsyncIterator
 
 es: Optional[AsyncElasticsearch] = None
 logger = context_logger.get(__name__)
@@ -17,11 +19,34 @@ class BaseDatabaseClient(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def search(self, index: str, body: Optional[dict] = None, size: int = None) -> Union[List[dict], Awaitable]:
+    def search(self, index: str, body: Optional[dict] = None, size: int = None,
+               source_includes: Optional[List[str]] = None,
+               source_excludes: Optional[List[str]] = None) -> Union[List[dict], Awaitable]:
         pass
 
     @abc.abstractmethod
-    def mget(self, index: str, body: Optional[dict] = None) -> Union[List[dict], Awaitable]:
+    def search_with_total(self, index: str, body: dict) -> Union[Tuple[List[dict], int], Awaitable]:
+        """Поиск, который кроме документов возвращает общее количество найденных (не больше 10000)"""
+        pass
+
+    @abc.abstractmethod
+    def mget(self, index: str, body: Optional[dict] = None,
+             source_includes: Optional[List[str]] = None) -> Union[List[dict], Awaitable]:
+        pass
+
+    @abc.abstractmethod
+    def search_page(self, index: str, body: dict) -> Union[Tuple[List[dict], Optional[list], Optional[str]], Awaitable]:
+        """Поиск для выдачи по курсору: документы, значения sort последнего документа и id point-in-time"""
+        pass
+
+    @abc.abstractmethod
+    def open_point_in_time(self, index: str, keep_alive: str) -> Union[str, Awaitable]:
+        pass
+
+    @abc.abstractmethod
+    def scan(self, index: str, body: Optional[dict] = None, source_includes: Optional[List[str]] = None,
+             size: int = 1000) -> AsyncIterator[dict]:
+        """Обойти все документы индекса, не загружая их в память целиком"""
         pass
 
 
@@ -33,14 +58,59 @@ class EsDatabaseClient(BaseDatabaseClient):
         raw_data = await self.es_client.get(search_path, doc_id)
         return raw_data['_source']
 
-    async def search(self, index: str, body: Optional[dict] = None,
-                     size: int = None) -> Union[List[dict], Awaitable]:
-        results = await self.es_client.search(index=index, body=body, size=size)
+    async def search(self, index: str, body: Optional[dict] = None, size: int = None,
+                     source_includes: Optional[List[str]] = None,
+                     source_excludes: Optional[List[str]] = None) -> Union[List[dict], Awaitable]:
+        # source_includes/source_excludes ограничивают поля документов, которые вернет эластик
+        results = await self.es_client.search(
+            index=index,
+            body=body,
+            size=size,
+            _source_includes=source_includes,
+            _source_excludes=source_excludes,
+        )
         return [doc['_source'] for doc in results['hits']['hits']]
 
-    async def mget(self, index: str, body: Optional[dict] = None) -> Union[List[dict], Awaitable]:
-        results = await self.es_client.mget(body=body, index=index)
-        return [doc['_source'] for doc in results['docs']]
+    async def search_with_total(self, index: str, body: dict) -> Tuple[List[dict], int]:
+        results = await self.es_client.search(index=index, body=body)
+        return [doc['_source'] for doc in results['hits']['hits']], results['hits']['total']['value']
+
+    async def mget(self, index: str, body: Optional[dict] = None,
+                   source_includes: Optional[List[str]] = None) -> Union[List[dict], Awaitable]:
+        # source_includes ограничивает поля документа, которые вернет эластик
+        results = await self.es_client.mget(body=body, index=index, _source_includes=source_includes)
+        # ненайденные документы приходят с found=false и без _source, пропускаем их
+        return [doc['_source'] for doc in results['docs'] if doc.get('found')]
+
+    async def search_page(self, index: str, body: dict) -> Tuple[List[dict], Optional[list], Optional[str]]:
+        if 'pit' in body:
+            # point-in-time уже привязан к индексу, указывать индекс в запросе нельзя
+            results = await self.es_client.search(body=body)
+        else:
+            results = await self.es_client.search(index=index, body=body)
+        hits = results['hits']['hits']
+        last_sort = hits[-1]['sort'] if hits else None
+        return [doc['_source'] for doc in hits], last_sort, results.get('pit_id')
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> str:
+        # https://www.elastic.co/guide/en/elasticsearch/reference/current/point-in-time-api.html
+        result = await self.es_client.open_point_in_time(index=index, keep_alive=keep_alive)
+        return result['id']
+
+    async def scan(self, index: str, body: Optional[dict] = None, source_includes: Optional[List[str]] = None,
+                   size: int = 1000) -> AsyncIterator[dict]:
+        # scroll отдает документы пачками по size штук, следующая пачка запрашивается,
+        # только когда предыдущая прочитана. При досрочном выходе scroll будет очищен
+        # https://www.elastic.co/guide/en/elasticsearch/reference/current/paginate-search-results.html#scroll-search-results
+        async for doc in async_scan(
+            self.es_client,
+            query=body,
+            index=index,
+            size=size,
+            scroll=settings.ELASTIC_SCROLL_KEEP_ALIVE,
+            _source_includes=source_includes,
+        ):
+            yield doc['_source']
 
 
 # Функция понадобится при внедрении зависимостей
@@ -1,12 +1,131 @@
-from aioredis import Redis
 import abc
-from typing import Optional, Union, Awaitable
+import hashlib
+import math
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union
+
+import orjson
+import settings
+from aioredis import Redis
+from aioredis.exceptions import LockError
+from pydantic import BaseModel
 
 from core import context_logger
+from db import compression
 
 redis: Optional[Redis] = None
+# Кэш в памяти воркера. Создается при старте приложения, один на процесс
+local_cache: Optional['LRUStorage'] = None
 logger = context_logger.get(__name__)
 
+ModelType = TypeVar('ModelType', bound=BaseModel)
+
+# Поколения пространств ключей, прочитанные из Redis: пространство -> (до какого момента верно, поколение).
+# Общие для воркера, т.к. хранилище создается на каждый запрос
+_generations: Dict[str, Tuple[float, int]] = {}
+
+
+@lru_cache()
+def model_version(model: Type[BaseModel]) -> str:
+    """
+    Версия схемы модели. Меняется при любом изменении полей модели,
+    поэтому после деплоя новая версия кода просто не видит записи старой и не требует очистки кэша
+    """
+    return hashlib.sha1(model.schema_json().encode()).hexdigest()[:8]
+
+
+class CacheEntry(Generic[ModelType]):
+    """
+    Конверт для объекта в кэше: помимо самого объекта хранит,
+    когда и за сколько секунд он был получен и сколько он считается свежим.
+
+    Объект хранится готовым телом ответа API в json. Модель проверяется только при записи в кэш,
+    а при чтении из кэша тело отдается как есть и разбирается в модель, только если обратиться к item
+    """
+
+    def __init__(
+        self,
+        item: Optional[ModelType] = None,
+        computed_at: float = 0,
+        delta: float = 0,
+        expire: float = 0,
+        *,
+        body: Optional[bytes] = None,
+        model: Optional[Type[ModelType]] = None,
+    ):
+        self._item = item
+        self._body = body
+        self.model = model or type(item)
+        self.computed_at = computed_at
+        self.delta = delta
+        self.expire = expire
+
+    @property
+    def item(self) -> ModelType:
+        if self._item is None:
+            self._item = self.model.parse_raw(self._body)
+        return self._item
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            # то же, что ORJSONResponse(content=item.dict()), а для списков __root__ - сам список
+            self._body = self._item.json().encode()
+        return self._body
+
+    def is_stale(self) -> bool:
+        return time.time() >= self.computed_at + self.expire
+
+    def should_refresh(self, beta: float = 1.0) -> bool:
+        """
+        Вероятностное досрочное обновление (XFetch): чем ближе окончание срока свежести
+        и чем дольше объект вычислялся, тем выше шанс обновить его заранее.
+        Для устаревшей записи всегда True.
+        https://cseweb.ucsd.edu/~avattani/papers/cache_stampede.pdf
+        """
+        # 1 - random() лежит в (0, 1], логарифм от нуля не берем
+        early = -self.delta * beta * math.log(1 - random.random())
+        return time.time() + early >= self.computed_at + self.expire
+
+    def dumps(self) -> bytes:
+        # Первая строка - служебные поля, дальше тело ответа. В json от orjson переводов строк нет,
+        # поэтому при чтении тело отделяется по первому переводу строки без разбора json
+        meta = orjson.dumps({'computed_at': self.computed_at, 'delta': self.delta, 'expire': self.expire})
+        return meta + b'\n' + self.body
+
+    @classmethod
+    def loads(cls, data: Union[str, bytes], model: Type[ModelType]) -> 'CacheEntry[ModelType]':
+        if isinstance(data, str):
+            data = data.encode()
+
+        meta, separator, body = data.partition(b'\n')
+        if separator:
+            meta = orjson.loads(meta)
+            return cls(
+                computed_at=meta['computed_at'],
+                delta=meta['delta'],
+                expire=meta['expire'],
+                body=body,
+                model=model,
+            )
+
+        # записи прежних форматов: json-конверт с полем data или объект без конверта
+        envelope = orjson.loads(data)
+        if 'data' not in envelope:
+            # запись без конверта считаем устаревшей, чтобы она обновилась
+            return cls(item=model.parse_obj(envelope), computed_at=0)
+
+        return cls(
+            item=model.parse_obj(envelope['data']),
+            computed_at=envelope['computed_at'],
+            delta=envelope['delta'],
+            expire=envelope['expire'],
+        )
+
 
 class BaseStorage(abc.ABC):
     @abc.abstractmethod
@@ -19,19 +138,324 @@ class BaseStorage(abc.ABC):
         """Загрузить состояние локально из постоянного хранилища"""
         pass
 
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Загрузить несколько значений. Отсутствующим ключам соответствует None"""
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, mapping: Dict[str, str], expire=None) -> None:
+        """Сохранить несколько значений с одинаковым временем жизни"""
+        for key, value in mapping.items():
+            await self.set(key, value, expire=expire)
+
+    async def delete_many(self, keys: List[str]) -> None:
+        """Удалить значения. По умолчанию хранилище удаление не поддерживает, значения истекут сами"""
+        pass
+
+    async def get_generation(self, namespace: str) -> int:
+        """Текущее поколение пространства ключей. По умолчанию хранилище поколения не поддерживает"""
+        return 0
+
+    async def bump_generation(self, namespace: str) -> int:
+        """Сменить поколение пространства ключей: все его записи перестают читаться и истекают сами"""
+        return 0
+
+    async def make_key(self, namespace: str, model: Type[BaseModel], id: str) -> str:
+        """
+        Ключ объекта в хранилище: пространство сущности, версия схемы модели, поколение и id.
+        Например, film:v1a2b3c4d:g0:3d825f60-9fff-4dfe-b294-1a45fa1e115d
+        """
+        generation = await self.get_generation(namespace)
+        return f'{namespace}:v{model_version(model)}:g{generation}:{id}'
+
+    async def make_keys(self, namespace: str, model: Type[BaseModel], ids: List[str]) -> Dict[str, str]:
+        """Ключи нескольких объектов одного пространства: id -> ключ"""
+        generation = await self.get_generation(namespace)
+        return {id: f'{namespace}:v{model_version(model)}:g{generation}:{id}' for id in ids}
+
+    async def get_entry(self, key: str, model: Type[ModelType]) -> Optional[CacheEntry[ModelType]]:
+        """Загрузить объект модели вместе с конвертом из хранилища"""
+        data = await self.get(key)
+        if not data:
+            return None
+
+        return CacheEntry.loads(data, model)
+
+    async def get_shared_entry(self, key: str, model: Type[ModelType]) -> Optional[CacheEntry[ModelType]]:
+        """Загрузить объект модели с конвертом из хранилища, общего для всех воркеров, минуя копии в памяти"""
+        return await self.get_entry(key, model)
+
+    async def get_entries(self, keys: List[str], model: Type[ModelType]) -> Dict[str, CacheEntry[ModelType]]:
+        """Загрузить несколько объектов модели одним запросом. В результат попадают только найденные ключи"""
+        values = await self.get_many(keys)
+        return {key: CacheEntry.loads(data, model) for key, data in zip(keys, values) if data}
+
+    async def set_entries(self, entries: Dict[str, CacheEntry], expire: float, stale_expire: float = 0) -> None:
+        """Сохранить несколько объектов модели одним запросом"""
+        await self.set_many(
+            {key: entry.dumps() for key, entry in entries.items()},
+            expire=math.ceil(expire + stale_expire),
+        )
+
+    async def set_entry(self, key: str, entry: CacheEntry, stale_expire: float = 0) -> None:
+        """
+        Сохранить объект модели вместе с конвертом в хранилище.
+        Запись хранится еще stale_expire секунд после окончания срока свежести,
+        чтобы её можно было отдать, пока объект обновляется в фоне
+        """
+        await self.set(key, entry.dumps(), expire=math.ceil(entry.expire + stale_expire))
+
+    async def get_item(self, key: str, model: Type[ModelType]) -> Optional[ModelType]:
+        """Загрузить объект модели из хранилища"""
+        entry = await self.get_entry(key, model)
+        if entry is None:
+            return None
+        return entry.item
+
+    async def set_item(self, key: str, item: BaseModel, expire=None) -> None:
+        """Сохранить объект модели в хранилище"""
+        await self.set_entry(key, CacheEntry(item=item, computed_at=time.time(), expire=expire or 0))
+
+    @asynccontextmanager
+    async def lock(self, key: str, timeout: float, blocking_timeout: float) -> AsyncIterator[bool]:
+        """Блокировка ключа между воркерами. По умолчанию хранилище блокировки не поддерживает"""
+        yield True
+
 
 class RedisStorage(BaseStorage):
+    """
+    Хранилище в Redis. Значения больше CACHE_COMPRESSION_MIN_SIZE сжимаются,
+    у каждого значения есть байт-заголовок со способом записи (см. db.compression)
+    """
+
     def __init__(self, redis_adapter: Redis):
         self.redis_adapter = redis_adapter
 
+    @staticmethod
+    def _encode(value: Union[str, bytes]) -> bytes:
+        if isinstance(value, str):
+            value = value.encode()
+        return compression.compress(value)
+
+    async def set(self, key: str, value: Union[str, bytes], expire=None) -> None:
+        await self.redis_adapter.set(key, self._encode(value), ex=expire)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raw_data = await self.redis_adapter.get(key)
+        return compression.decompress(raw_data)
+
+    async def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        # https://redis.io/commands/mget
+        if not keys:
+            return []
+        return [compression.decompress(value) for value in await self.redis_adapter.mget(keys)]
+
+    async def set_many(self, mapping: Dict[str, str], expire=None) -> None:
+        # MSET не умеет задавать время жизни, поэтому отправляем SET-ы одним пакетом без транзакции
+        if not mapping:
+            return
+        async with self.redis_adapter.pipeline(transaction=False) as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, self._encode(value), ex=expire)
+            await pipe.execute()
+
+    async def delete_many(self, keys: List[str]) -> None:
+        if not keys:
+            return
+        await self.redis_adapter.delete(*keys)
+
+    async def get_generation(self, namespace: str) -> int:
+        # поколение меняется редко, поэтому не ходим за ним в Redis на каждый запрос,
+        # а перечитываем раз в CACHE_GENERATION_REFRESH_IN_SECONDS
+        cached = _generations.get(namespace)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        generation = int(await self.redis_adapter.get(f'generation:{namespace}') or 0)
+        _generations[namespace] = (time.monotonic() + settings.CACHE_GENERATION_REFRESH_IN_SECONDS, generation)
+        return generation
+
+    async def bump_generation(self, namespace: str) -> int:
+        generation = await self.redis_adapter.incr(f'generation:{namespace}')
+        _generations[namespace] = (time.monotonic() + settings.CACHE_GENERATION_REFRESH_IN_SECONDS, generation)
+        logger.info(f'Cache namespace {namespace} moved to generation {generation}')
+        return generation
+
+    @asynccontextmanager
+    async def lock(self, key: str, timeout: float, blocking_timeout: float) -> AsyncIterator[bool]:
+        # Блокировка снимется сама через timeout секунд, если воркер упадет, не отпустив её.
+        # thread_local выключен: все корутины воркера живут в одном потоке
+        # https://redis.io/topics/distlock
+        lock = self.redis_adapter.lock(
+            f'lock:{key}', timeout=timeout, blocking_timeout=blocking_timeout, thread_local=False
+        )
+        acquired = await lock.acquire()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except LockError:
+                    logger.warning(f'Lock for {key = } expired before release')
+
+
+class LRUStorage(BaseStorage):
+    """
+    Хранилище в памяти процесса с ограниченным размером.
+    Хранит объекты как есть, без сериализации: при переполнении вытесняется
+    давно не использованная запись, у каждой записи есть время жизни.
+    """
+
+    def __init__(self, max_size: int, expire: int):
+        self.max_size = max_size
+        self.expire = expire
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def set(self, key: str, value: Any, expire=None) -> None:
+        # локальная копия не должна жить дольше, чем запись в основном хранилище
+        ttl = min(expire, self.expire) if expire else self.expire
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    async def get(self, key: str) -> Any:
+        record = self._data.get(key)
+        if record is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = record
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def delete_many(self, keys: List[str]) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_entry(self, key: str, model: Type[ModelType]) -> Optional[CacheEntry[ModelType]]:
+        entry = await self.get(key)
+        # ключи разных сущностей пересекаться не должны, но проверим тип на всякий случай
+        if not isinstance(entry, CacheEntry) or not issubclass(entry.model, model):
+            return None
+        return entry
+
+    async def set_entry(self, key: str, entry: CacheEntry, stale_expire: float = 0) -> None:
+        await self.set(key, entry, expire=entry.expire + stale_expire)
+
+    async def get_entries(self, keys: List[str], model: Type[ModelType]) -> Dict[str, CacheEntry[ModelType]]:
+        entries = {key: await self.get_entry(key, model) for key in keys}
+        return {key: entry for key, entry in entries.items() if entry is not None}
+
+    async def set_entries(self, entries: Dict[str, CacheEntry], expire: float, stale_expire: float = 0) -> None:
+        for key, entry in entries.items():
+            await self.set(key, entry, expire=expire + stale_expire)
+
+    def stats(self) -> dict:
+        return {'size': len(self._data), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+class TwoTierStorage(BaseStorage):
+    """
+    Двухуровневый кэш: LRU в памяти воркера перед Redis.
+    Объекты моделей ищутся сначала в памяти, где лежат уже разобранными,
+    и только при промахе запрашиваются из Redis с последующим разбором json.
+    """
+
+    # счетчики Redis общие для всех экземпляров, т.к. хранилище создается на каждый запрос
+    remote_hits = 0
+    remote_misses = 0
+
+    def __init__(self, local: LRUStorage, remote: BaseStorage):
+        self.local = local
+        self.remote = remote
+
     async def set(self, key: str, value: str, expire=None) -> None:
-        await self.redis_adapter.set(key, value, ex=expire)
+        await self.remote.set(key, value, expire=expire)
 
     async def get(self, key: str) -> str:
-        raw_data = await self.redis_adapter.get(key)
-        return raw_data
+        return await self.remote.get(key)
+
+    async def delete_many(self, keys: List[str]) -> None:
+        await self.remote.delete_many(keys)
+        await self.local.delete_many(keys)
+
+    async def get_generation(self, namespace: str) -> int:
+        # поколение входит в ключ, поэтому записи старого поколения в памяти тоже перестают читаться
+        return await self.remote.get_generation(namespace)
+
+    async def bump_generation(self, namespace: str) -> int:
+        return await self.remote.bump_generation(namespace)
+
+    async def get_entry(self, key: str, model: Type[ModelType]) -> Optional[CacheEntry[ModelType]]:
+        entry = await self.local.get_entry(key, model)
+        if entry is not None:
+            return entry
+
+        entry = await self.remote.get_entry(key, model)
+        if entry is None:
+            TwoTierStorage.remote_misses += 1
+            return None
+
+        TwoTierStorage.remote_hits += 1
+        await self.local.set(key, entry)
+        return entry
+
+    async def get_shared_entry(self, key: str, model: Type[ModelType]) -> Optional[CacheEntry[ModelType]]:
+        # в памяти может лежать старая копия, а другой воркер уже обновил запись в Redis
+        entry = await self.remote.get_shared_entry(key, model)
+        if entry is not None:
+            await self.local.set(key, entry)
+        return entry
+
+    async def set_entry(self, key: str, entry: CacheEntry, stale_expire: float = 0) -> None:
+        await self.remote.set_entry(key, entry, stale_expire=stale_expire)
+        await self.local.set_entry(key, entry, stale_expire=stale_expire)
+
+    async def get_entries(self, keys: List[str], model: Type[ModelType]) -> Dict[str, CacheEntry[ModelType]]:
+        entries = await self.local.get_entries(keys, model)
+        misses = [key for key in keys if key not in entries]
+        if not misses:
+            return entries
+
+        remote_entries = await self.remote.get_entries(misses, model)
+        TwoTierStorage.remote_hits += len(remote_entries)
+        TwoTierStorage.remote_misses += len(misses) - len(remote_entries)
+        for key, entry in remote_entries.items():
+            await self.local.set(key, entry)
+
+        entries.update(remote_entries)
+        return entries
+
+    async def set_entries(self, entries: Dict[str, CacheEntry], expire: float, stale_expire: float = 0) -> None:
+        await self.remote.set_entries(entries, expire=expire, stale_expire=stale_expire)
+        await self.local.set_entries(entries, expire=expire, stale_expire=stale_expire)
+
+    def lock(self, key: str, timeout: float, blocking_timeout: float):
+        return self.remote.lock(key, timeout=timeout, blocking_timeout=blocking_timeout)
+
+    def stats(self) -> dict:
+        return {
+            'local': self.local.stats(),
+            'redis': {'hits': TwoTierStorage.remote_hits, 'misses': TwoTierStorage.remote_misses},
+        }
 
 
 # Функция понадобится при внедрении зависимостей
 async def get_redis() -> RedisStorage:
     return RedisStorage(redis_adapter=redis)
+
+
+async def get_cache() -> TwoTierStorage:
+    return TwoTierStorage(local=local_cache, remote=RedisStorage(redis_adapter=redis))
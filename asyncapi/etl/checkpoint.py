@@ -0,0 +1,44 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from core import context_logger
+
+logger = context_logger.get(__name__)
+
+
+class Checkpoint:
+    """
+    Контрольная точка загрузки: сколько первых записей источника уже точно записано в индекс.
+    Хранится в json-файле, запись атомарная, чтобы падение во время сохранения не портило файл
+    """
+
+    def __init__(self, path: Optional[Path], source: Path, index: str):
+        self.path = path
+        self.source = str(source)
+        self.index = index
+
+    def load(self) -> int:
+        if self.path is None or not self.path.exists():
+            return 0
+
+        with open(self.path, 'r') as f:
+            state = json.load(f)
+        if state.get('source') != self.source or state.get('index') != self.index:
+            logger.warning(f'Checkpoint {self.path} belongs to another load, starting from scratch')
+            return 0
+        return state.get('offset', 0)
+
+    def save(self, offset: int) -> None:
+        if self.path is None:
+            return
+
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'source': self.source, 'index': self.index, 'offset': offset}, f)
+        os.replace(tmp_path, self.path)
+
+    def reset(self) -> None:
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
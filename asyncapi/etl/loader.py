@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, Iterator, List, Optional, Type
+
+from core import context_logger
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_streaming_bulk
+from etl.checkpoint import Checkpoint
+from pydantic import BaseModel, ValidationError
+
+logger = context_logger.get(__name__)
+
+
+@dataclass
+class LoadStats:
+    indexed: int = 0
+    invalid: int = 0
+    failed: int = 0
+    # сколько первых записей источника записано целиком - до этого места сдвинута контрольная точка
+    committed: int = 0
+    failed_ids: List[str] = field(default_factory=list, repr=False)
+
+
+@dataclass
+class _Chunk:
+    number: int
+    # номер первой записи пачки в источнике, с учетом уже загруженных до контрольной точки
+    offset: int
+    actions: List[dict]
+    # сколько записей источника покрывает пачка, включая не прошедшие проверку
+    size: int
+
+
+class BulkLoader:
+    """
+    Загрузка записей в индекс Elasticsearch через async_streaming_bulk.
+
+    Записи читаются из источника потоком, проверяются моделью и собираются в пачки по chunk_size.
+    Пачки отправляют concurrency параллельных обработчиков, очередь между ними ограничена,
+    поэтому чтение источника не убегает вперед записи. Отклоненные с 429 документы
+    повторяются с экспоненциальной задержкой. После каждой пачки, все предыдущие к которой
+    тоже записаны, сохраняется контрольная точка, с которой можно продолжить после падения.
+    Пачка, в которой не записался хотя бы один документ, контрольную точку не сдвигает:
+    повторный запуск начнет с нее и запишет эти документы заново.
+    """
+
+    def __init__(
+        self,
+        es_client: AsyncElasticsearch,
+        index: str,
+        model: Type[BaseModel],
+        checkpoint: Checkpoint,
+        chunk_size: int = 500,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        initial_backoff: float = 1,
+        max_backoff: float = 60,
+        on_indexed: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    ):
+        self.es_client = es_client
+        self.index = index
+        self.model = model
+        self.checkpoint = checkpoint
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        # вызывается с записанными записями каждой пачки, например, чтобы сбросить их в кэше API
+        self.on_indexed = on_indexed
+        self.stats = LoadStats()
+
+        self._done_chunks = set()
+        self._failed_chunks = set()
+        self._next_chunk_to_commit = 0
+        self._committed_offset = 0
+        self._chunk_sizes = {}
+
+    def _to_action(self, record: dict) -> Optional[dict]:
+        try:
+            item = self.model(**record)
+        except ValidationError as e:
+            logger.warning(f'Skip invalid record {record.get("uuid")}: {str(e)}')
+            return None
+
+        # в индекс пишем исходную запись: в ней есть поля для поиска, которых нет в модели ответа API
+        return {
+            '_index': self.index,
+            '_id': str(item.uuid),
+            '_source': record,
+        }
+
+    def _chunks(self, records: Iterable[dict], start_offset: int) -> Iterator[_Chunk]:
+        offset = start_offset
+        records = iter(records)
+        for number in itertools.count():
+            batch = list(itertools.islice(records, self.chunk_size))
+            if not batch:
+                return
+
+            actions = []
+            for record in batch:
+                action = self._to_action(record)
+                if action is None:
+                    self.stats.invalid += 1
+                    continue
+                actions.append(action)
+
+            yield _Chunk(number=number, offset=offset, actions=actions, size=len(batch))
+            offset += len(batch)
+
+    async def _write_chunk(self, chunk: _Chunk) -> None:
+        failed_ids = set()
+        async for ok, info in async_streaming_bulk(
+            self.es_client,
+            chunk.actions,
+            chunk_size=max(len(chunk.actions), 1),
+            max_retries=self.max_retries,
+            initial_backoff=self.initial_backoff,
+            max_backoff=self.max_backoff,
+            raise_on_error=False,
+            yield_ok=False,
+        ):
+            failed_ids.add(info.get('index', {}).get('_id'))
+            logger.error(f'Failed to index document: {info}')
+
+        self.stats.failed += len(failed_ids)
+        self.stats.failed_ids.extend(sorted(str(_id) for _id in failed_ids))
+        self.stats.indexed += len(chunk.actions) - len(failed_ids)
+        if failed_ids:
+            self._failed_chunks.add(chunk.number)
+            logger.error(
+                f'{len(failed_ids)} documents of records {chunk.offset}-{chunk.offset + chunk.size - 1} '
+                f'were not indexed, checkpoint {self.index} will not move past record {chunk.offset}'
+            )
+        if self.on_indexed:
+            await self.on_indexed([action['_source'] for action in chunk.actions if action['_id'] not in failed_ids])
+        self._commit(chunk)
+
+    def _commit(self, chunk: _Chunk) -> None:
+        """Сдвигает контрольную точку, только если все пачки до этой тоже записаны без ошибок"""
+        if chunk.number not in self._failed_chunks:
+            self._done_chunks.add(chunk.number)
+        self._chunk_sizes[chunk.number] = chunk.offset + chunk.size
+        advanced = False
+        while self._next_chunk_to_commit in self._done_chunks:
+            self._done_chunks.remove(self._next_chunk_to_commit)
+            self._committed_offset = self._chunk_sizes.pop(self._next_chunk_to_commit)
+            self._next_chunk_to_commit += 1
+            advanced = True
+
+        if advanced:
+            self.stats.committed = self._committed_offset
+            self.checkpoint.save(self._committed_offset)
+            logger.info(f'Checkpoint {self.index}: {self._committed_offset} records')
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            chunk = await queue.get()
+            try:
+                if chunk is None:
+                    return
+                await self._write_chunk(chunk)
+            finally:
+                queue.task_done()
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, chunk: Optional[_Chunk], workers: List[asyncio.Task]) -> None:
+        """
+        Кладет пачку в очередь. Если обработчики не успевают, то ждет и чтение источника приостанавливается.
+        Обработчик завершается раньше времени только с ошибкой - тогда прекращаем загрузку, а не ждем вечно
+        """
+        put = asyncio.ensure_future(queue.put(chunk))
+        done, _ = await asyncio.wait([put, *workers], return_when=asyncio.FIRST_COMPLETED)
+        for worker in workers:
+            if worker in done:
+                put.cancel()
+                worker.result()
+                raise RuntimeError('Bulk worker stopped unexpectedly')
+
+    async def load(self, records: Iterable[dict], start_offset: int = 0) -> LoadStats:
+        self._committed_offset = start_offset
+        self.stats.committed = start_offset
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+
+        try:
+            for chunk in self._chunks(records, start_offset):
+                await self._put(queue, chunk, workers)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            raise
+
+        return self.stats
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import logging.config
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import aioredis
+import settings
+from core import context_logger
+from elasticsearch import AsyncElasticsearch
+from etl.checkpoint import Checkpoint
+from etl.loader import BulkLoader
+from etl.mappings import MAPPINGS
+from etl.sources import read_records
+from models.film import Film
+from models.genre import Genre
+from models.person import Person
+from db.storage import RedisStorage
+from services.cache_invalidation import flush, publish_invalidation
+
+logging.config.dictConfig(settings.LOGGING)
+logger = context_logger.get(__name__)
+logging.getLogger('elasticsearch').propagate = False
+
+# индекс и модель, которой проверяются записи перед загрузкой
+INDEXES = {
+    'film': (settings.ELASTIC_INDEX_FILM, Film),
+    'person': (settings.ELASTIC_INDEX_PERSON, Person),
+    'genre': (settings.ELASTIC_INDEX_GENRE, Genre),
+}
+
+
+def changed_ids(index: str, records: List[dict]) -> Dict[str, List[str]]:
+    """id объектов, которые нужно сбросить в кэше API после записи. У фильма это еще и его участники"""
+    ids = [str(record['uuid']) for record in records]
+    if index != 'film':
+        return {index: ids}
+
+    persons = {
+        str(person['uuid'])
+        for record in records
+        for role in ('actors', 'writers', 'directors')
+        for person in record.get(role) or []
+    }
+    return {'film': ids, 'person': list(persons)}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Загрузка записей из файла в индекс Elasticsearch')
+    parser.add_argument('--index', choices=INDEXES, required=True)
+    parser.add_argument('--source', type=Path, required=True, help='файл NDJSON или JSON-массив')
+    parser.add_argument('--chunk-size', type=int, default=settings.ETL_CHUNK_SIZE)
+    parser.add_argument('--concurrency', type=int, default=settings.ETL_CONCURRENCY)
+    parser.add_argument('--max-retries', type=int, default=settings.ETL_MAX_RETRIES)
+    parser.add_argument('--checkpoint', type=Path, default=None, help='файл контрольной точки')
+    parser.add_argument('--reset', action='store_true', help='начать загрузку заново, игнорируя контрольную точку')
+    parser.add_argument(
+        '--create-index', action='store_true', help='создать индекс со схемой из etl.mappings, если его еще нет'
+    )
+    parser.add_argument(
+        '--flush-cache', action='store_true', help='после загрузки сбросить весь кэш API по этому типу объектов'
+    )
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    index, model = INDEXES[args.index]
+    checkpoint = Checkpoint(args.checkpoint, source=args.source, index=index)
+    if args.reset:
+        checkpoint.reset()
+    start = checkpoint.load()
+    if start:
+        logger.info(f'Resume loading {args.source} into {index} from record {start}')
+
+    es = AsyncElasticsearch(
+        hosts=[f'{settings.ELASTIC_HOST}:{settings.ELASTIC_PORT}'],
+        http_auth=(settings.ELASTIC_USER, settings.ELASTIC_PASSWORD),
+        use_ssl=settings.ELASTIC_USE_SSL,
+        verify_certs=False
+    )
+    redis: Optional[aioredis.Redis] = None
+    if settings.CACHE_INVALIDATION_ENABLED or args.flush_cache:
+        redis = aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            password=settings.REDIS_PASS if settings.REDIS_PASS else None,
+            ssl=settings.REDIS_USE_SSL,
+            ssl_cert_reqs='none',
+        )
+
+    async def publish(records: List[dict]) -> None:
+        # загрузка важнее свежести кэша: если Redis недоступен, записи в кэше просто доживут свой срок
+        try:
+            await publish_invalidation(redis, changed_ids(args.index, records))
+        except Exception as e:
+            logger.warning(f'Failed to publish cache invalidation: {str(e)}')
+
+    try:
+        if args.create_index and not await es.indices.exists(index=index):
+            await es.indices.create(index=index, body={'mappings': MAPPINGS[args.index]})
+            logger.info(f'Created index {index}')
+
+        loader = BulkLoader(
+            es,
+            index,
+            model,
+            checkpoint,
+            chunk_size=args.chunk_size,
+            concurrency=args.concurrency,
+            max_retries=args.max_retries,
+            on_indexed=publish if settings.CACHE_INVALIDATION_ENABLED else None,
+        )
+        stats = await loader.load(read_records(args.source, skip=start), start)
+        if args.flush_cache:
+            await flush(RedisStorage(redis), args.index)
+    finally:
+        await es.close()
+        if redis:
+            await redis.close()
+
+    logger.info(f'Loaded {args.source} into {index}: {stats}')
+    if stats.failed:
+        # контрольная точка осталась перед первой пачкой с ошибками, повторный запуск запишет их заново
+        logger.error(
+            f'{stats.failed} documents were not indexed, rerun to retry from record {stats.committed}. '
+            f'Failed ids: {", ".join(stats.failed_ids)}'
+        )
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
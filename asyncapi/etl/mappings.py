@@ -0,0 +1,17 @@
+# Явная схема только для полей, по которым работают подсказки при наборе (см. services.suggest),
+# остальные поля эластик размечает динамически, как и раньше.
+# search_as_you_type - это text с подполями _2gram, _3gram и _index_prefix, поэтому полнотекстовый поиск по полю
+# работает как прежде, а keyword-подполе сохраняет то, что раньше давала динамическая схема.
+# Уровень доступа фильма задан явно: по нему фильтрует каждый запрос списка (см. QueryConstructor.add_permissions_filter)
+SEARCH_AS_YOU_TYPE = {
+    'type': 'search_as_you_type',
+    'fields': {
+        'keyword': {'type': 'keyword', 'ignore_above': 256},
+    },
+}
+
+MAPPINGS = {
+    'film': {'properties': {'title': SEARCH_AS_YOU_TYPE, 'permissions': {'type': 'byte'}}},
+    'person': {'properties': {'full_name': SEARCH_AS_YOU_TYPE}},
+    'genre': {},
+}
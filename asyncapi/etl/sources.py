@@ -0,0 +1,31 @@
+import json
+from pathlib import Path
+from typing import Iterator
+
+from core import context_logger
+
+logger = context_logger.get(__name__)
+
+
+def read_records(path: Path, skip: int = 0) -> Iterator[dict]:
+    """
+    Читает записи из файла по одной.
+    NDJSON (.ndjson, .jsonl) читается построчно и не загружается в память целиком,
+    JSON-массив (.json, как в testdata) загружается полностью - подходит только для небольших файлов.
+    skip - сколько первых записей пропустить, используется при продолжении загрузки с контрольной точки
+    """
+    if path.suffix in ('.ndjson', '.jsonl'):
+        with open(path, 'r') as f:
+            position = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                if position >= skip:
+                    yield json.loads(line)
+                position += 1
+        return
+
+    with open(path, 'r') as f:
+        records = json.load(f)
+    logger.info(f'Loaded {len(records)} records from {path} into memory')
+    yield from records[skip:]
@@ -0,0 +1,44 @@
+import argparse
+import itertools
+import logging.config
+import time
+from pathlib import Path
+
+import settings
+from core import context_logger
+from db.compression import MAX_DICTIONARY_SIZE, train_dictionary
+from db.storage import CacheEntry
+from etl.sources import read_records
+from models.film import Film
+from pydantic import ValidationError
+
+logging.config.dictConfig(settings.LOGGING)
+logger = context_logger.get(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Построение словаря для сжатия кэша фильмов в Redis')
+    parser.add_argument('--source', type=Path, required=True, help='файл NDJSON или JSON-массив с фильмами')
+    parser.add_argument('--output', type=Path, required=True, help='куда сохранить словарь')
+    parser.add_argument('--samples', type=int, default=5000, help='сколько фильмов взять в образцы')
+    parser.add_argument('--size', type=int, default=MAX_DICTIONARY_SIZE, help='размер словаря в байтах')
+    return parser.parse_args()
+
+
+def main(args: argparse.Namespace) -> None:
+    samples = []
+    for record in itertools.islice(read_records(args.source), args.samples):
+        try:
+            film = Film(**record)
+        except ValidationError:
+            continue
+        # образцы в том же виде, в каком фильмы лежат в кэше
+        samples.append(CacheEntry(item=film, computed_at=time.time()).dumps())
+
+    dictionary = train_dictionary(samples, size=args.size)
+    args.output.write_bytes(dictionary)
+    logger.info(f'Trained dictionary of {len(dictionary)} bytes on {len(samples)} films into {args.output}')
+
+
+if __name__ == '__main__':
+    main(parse_args())
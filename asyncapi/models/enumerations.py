@@ -10,3 +10,9 @@ class ItemType(Enum):
     FILM = 1
     PERSON = 2
     GENRE = 3
+
+
+class SearchPhase(Enum):
+    """Какой этап поиска дал ответ: точный поиск фразы или нечеткий поиск"""
+    EXACT = 'exact'
+    FUZZY = 'fuzzy'
@@ -1,6 +1,6 @@
 import orjson
 import uuid
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 from core.helpers import orjson_dumps
@@ -16,3 +16,22 @@ class FilmResponse(BaseModel):
         title = 'Film (short info)'
         json_loads = orjson.loads
         json_dumps = orjson_dumps
+
+
+class FilmResponseList(BaseModel):
+    """Страница списка фильмов, в таком виде она хранится в кэше"""
+    __root__: List[FilmResponse]
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
+
+
+class FilmSearchResult(BaseModel):
+    """Страница поиска фильмов и этап поиска, который её нашел. В таком виде она хранится в кэше"""
+    phase: str
+    films: List[FilmResponse]
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
@@ -24,3 +24,12 @@ class PersonResponse(BaseModel):
         title = 'Person (full info)'
         json_loads = orjson.loads
         json_dumps = orjson_dumps
+
+
+class PersonResponseList(BaseModel):
+    """Страница результатов поиска персон, в таком виде она хранится в кэше"""
+    __root__: List[PersonResponse]
+
+    class Config:
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
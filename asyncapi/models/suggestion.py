@@ -0,0 +1,39 @@
+import orjson
+import uuid
+
+from pydantic import BaseModel, validator
+from core.helpers import orjson_dumps
+
+
+class FilmSuggestion(BaseModel):
+    """Подсказка при наборе названия фильма"""
+    uuid: uuid.UUID
+    title: str
+
+    @validator('uuid', pre=True)
+    def convert_to_uuid(cls, v):
+        if isinstance(v, str):
+            return uuid.UUID(v)
+        return v
+
+    class Config:
+        title = 'Film suggestion'
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
+
+
+class PersonSuggestion(BaseModel):
+    """Подсказка при наборе имени персоны"""
+    uuid: uuid.UUID
+    full_name: str
+
+    @validator('uuid', pre=True)
+    def convert_to_uuid(cls, v):
+        if isinstance(v, str):
+            return uuid.UUID(v)
+        return v
+
+    class Config:
+        title = 'Person suggestion'
+        json_loads = orjson.loads
+        json_dumps = orjson_dumps
@@ -17,6 +17,12 @@ class FilmRequestBase(BaseModel):
         default=0,
         description='Номер страницы результатов'
     )
+    cursor: str = Query(
+        default=None,
+        description='Курсор для постраничной выдачи без ограничения глубины. '
+                    'Пустое значение - первая страница, следующий курсор приходит в заголовке X-Next-Cursor. '
+                    'Если курсор задан, то page_number не учитывается'
+    )
 
 
 class FilmFilterRequest(FilmRequestBase):
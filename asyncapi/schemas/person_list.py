@@ -19,3 +19,13 @@ class PersonSearchRequest(PersonRequestBase):
         default=None,
         description='Строка поиска по полям: full_name'
     )
+    cursor: str = Query(
+        default=None,
+        description='Курсор для постраничной выдачи без ограничения глубины. '
+                    'Пустое значение - первая страница, следующий курсор приходит в заголовке X-Next-Cursor. '
+                    'Если курсор задан, то page_number не учитывается'
+    )
+
+
+class PersonFilmsRequest(PersonRequestBase):
+    pass
@@ -0,0 +1,19 @@
+from fastapi import Query
+from pydantic import BaseModel
+
+import settings
+
+
+class SuggestRequest(BaseModel):
+    query: str = Query(
+        ...,
+        min_length=1,
+        max_length=100,
+        description='Начало строки, которую набирает пользователь'
+    )
+    size: int = Query(
+        default=settings.SUGGEST_SIZE,
+        ge=1,
+        le=settings.SUGGEST_MAX_SIZE,
+        description='Сколько подсказок вернуть'
+    )
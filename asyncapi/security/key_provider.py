@@ -0,0 +1,186 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+from stat import S_IWGRP, S_IWOTH
+from typing import Dict, Optional
+
+import aiohttp
+import orjson
+from core import context_logger
+from security.token_cache import token_cache
+
+logger = context_logger.get(__name__)
+
+# kid ключа, если сервис авторизации его не прислал. Токены без kid проверяются текущим ключом
+DEFAULT_KID = ''
+# Как часто можно внепланово перезапрашивать ключи из-за токена с незнакомым kid
+UNKNOWN_KID_REFRESH_INTERVAL = 30
+REQUEST_TIMEOUT = 5
+
+
+class PublicKeyProvider:
+    """
+    Публичные ключи для проверки JWT. Ключи хранятся по kid, текущий ключ проверяет токены без kid.
+    Ключи запрашиваются в фоне раз в refresh_interval, при недоступности сервиса авторизации -
+    повторно с растущей паузой, старые ключи при этом остаются в работе.
+    Последние полученные ключи сохраняются на диск, и с ними воркер стартует, не дожидаясь сервиса авторизации.
+    Если ключ задан в настройках, то он используется всегда и ничего не запрашивается
+    """
+
+    def __init__(
+        self,
+        url: str,
+        static_key: Optional[str],
+        cache_path: Optional[str],
+        refresh_interval: float,
+        min_backoff: float,
+        max_backoff: float,
+    ):
+        self.url = url
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.keys: Dict[str, str] = {}
+        self.current_kid: Optional[str] = None
+        self._loaded = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._last_wake = 0.0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+        # пустой JWT_PUBLIC_KEY= из .env - то же, что не заданный
+        static_key = static_key or None
+        self._static = static_key is not None
+        if self._static:
+            self._set_keys({DEFAULT_KID: static_key}, DEFAULT_KID)
+
+    def get(self, kid: Optional[str] = None) -> Optional[str]:
+        """Ключ по kid или текущий. Незнакомый kid - повод перезапросить ключи: возможно, ключ сменился"""
+        if kid is None:
+            return self.keys.get(self.current_kid)
+
+        key = self.keys.get(kid)
+        if key is None:
+            self.request_refresh()
+        return key
+
+    def request_refresh(self) -> None:
+        if self._static or time.monotonic() - self._last_wake < UNKNOWN_KID_REFRESH_INTERVAL:
+            return
+        self._last_wake = time.monotonic()
+        self._wake.set()
+
+    async def start(self, startup_timeout: float) -> None:
+        """
+        Запускает фоновое обновление ключей. Если ключей нет ни в настройках, ни на диске,
+        то ждет первый ответ сервиса авторизации не дольше startup_timeout: дальше запросы с токеном
+        будут получать 503, пока ключ не придет
+        """
+        if self._static:
+            return
+
+        self._load_from_disk()
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+        self._refresher = asyncio.create_task(self._refresh_periodically())
+        if self.keys:
+            return
+
+        try:
+            await asyncio.wait_for(self._loaded.wait(), startup_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f'No JWT public key after {startup_timeout}s, keep fetching in background')
+
+    async def stop(self) -> None:
+        if self._refresher:
+            self._refresher.cancel()
+        if self._session:
+            await self._session.close()
+
+    async def refresh(self) -> None:
+        async with self._session.get(self.url) as r:
+            r.raise_for_status()
+            body = await r.json()
+
+        # {'public_key': ..., 'kid': ...} или набор ключей {'keys': [{'kid': ..., 'public_key': ...}], 'current': ...}
+        if 'keys' in body:
+            keys = {key.get('kid', DEFAULT_KID): key['public_key'] for key in body['keys']}
+            current_kid = body.get('current', next(reversed(keys)))
+        else:
+            current_kid = body.get('kid', DEFAULT_KID)
+            keys = {current_kid: body['public_key']}
+
+        if keys != self.keys or current_kid != self.current_kid:
+            self._set_keys(keys, current_kid)
+            self._save_to_disk()
+
+    async def _refresh_periodically(self) -> None:
+        backoff = self.min_backoff
+        while True:
+            try:
+                await self.refresh()
+                backoff = self.min_backoff
+                delay = self.refresh_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f'Failed to fetch JWT public key from {self.url}: {str(e)}, retry in {backoff}s')
+                delay = backoff
+                backoff = min(backoff * 2, self.max_backoff)
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _set_keys(self, keys: Dict[str, str], current_kid: str) -> None:
+        if self.keys:
+            # claims проверены старыми ключами, среди которых может быть отозванный
+            token_cache.clear()
+            logger.info(f'JWT public keys rotated, current kid {current_kid!r}')
+        self.keys = keys
+        self.current_kid = current_kid
+        self._loaded.set()
+
+    def _load_from_disk(self) -> None:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        if not self._is_trusted(self.cache_path):
+            logger.warning(
+                f'Ignore JWT public keys from {self.cache_path}: '
+                f'file must be owned by the service user and not writable by others'
+            )
+            return
+        try:
+            data = orjson.loads(Path(self.cache_path).read_bytes())
+            self._set_keys(data['keys'], data['current'])
+            logger.info(f'Loaded JWT public keys from {self.cache_path}')
+        except Exception as e:
+            logger.warning(f'Failed to load JWT public keys from {self.cache_path}: {str(e)}')
+
+    @staticmethod
+    def _is_trusted(path: str) -> bool:
+        """
+        Ключам с диска можно верить, только если файл не мог подменить никто, кроме самого сервиса:
+        иначе подложенный ключ позволит выпускать любые токены
+        """
+        stat = os.stat(path)
+        return stat.st_uid == os.getuid() and not stat.st_mode & (S_IWGRP | S_IWOTH)
+
+    def _save_to_disk(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            # пишем во временный файл и подменяем, чтобы соседний воркер не прочитал файл наполовину
+            tmp_path = f'{self.cache_path}.{os.getpid()}'
+            Path(tmp_path).write_bytes(orjson.dumps({'keys': self.keys, 'current': self.current_kid}))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f'Failed to save JWT public keys to {self.cache_path}: {str(e)}')
+
+
+# Провайдер создается при старте приложения, один на процесс
+key_provider: Optional[PublicKeyProvider] = None
@@ -2,35 +2,21 @@ import inspect
 from enum import Enum
 from typing import Optional
 
-import aiohttp
 import jwt
 from core import context_logger
 from fastapi import HTTPException
 from fastapi.params import Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jwt import InvalidSignatureError, ExpiredSignatureError
+from jwt.exceptions import InvalidKeyError, InvalidTokenError
 from pydantic import BaseModel
-from settings import JWT_KEY_URL, JWT_PUBLIC_KEY
+from security import key_provider
+from security.token_cache import token_cache
 from starlette import status
-from starlette.requests import Request
 logger = context_logger.get(__name__)
 
 X_API_KEY = HTTPBearer(auto_error=False)
 
 
-async def init_jwt_public_key() -> str:
-    if JWT_PUBLIC_KEY is not None:
-        return JWT_PUBLIC_KEY
-    async with aiohttp.ClientSession() as session:
-        while True:
-            try:
-                async with session.get(JWT_KEY_URL) as r:
-                    json_body = await r.json()
-                    return json_body.get('public_key')
-            except:
-                ...
-
-
 class Permissions(Enum):
     OTHER = 0
     USER = 1
@@ -38,27 +24,58 @@ class Permissions(Enum):
     ADMIN = 3
 
 
-def _get_permissions(jwt_public_key: str, credentials: Optional[HTTPAuthorizationCredentials]) -> int:
+def _public_key(token: str) -> str:
+    """Ключ, которым подписан токен: по kid из заголовка токена, без kid - текущий"""
+    key = key_provider.key_provider.get(jwt.get_unverified_header(token).get('kid'))
+    if key is None:
+        if key_provider.key_provider.get() is None:
+            # сервис авторизации еще ни разу не ответил, проверить токен нечем
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Public key is not available'
+            )
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Invalid API Key'
+        )
+    return key
+
+
+def _get_permissions(credentials: Optional[HTTPAuthorizationCredentials]) -> int:
     if credentials is None:
         return Permissions.OTHER.value  # Если токена нет, то права 0
     else:
         try:
-            payload = jwt.decode(
-                jwt=credentials.credentials,
-                key=jwt_public_key,
-                algorithms=['RS256']
-            )
+            payload = token_cache.decode(credentials.credentials, _public_key)
             return payload.get('permissions', 0)
-        except (InvalidSignatureError, ExpiredSignatureError):
+        except (ValueError, InvalidKeyError) as e:
+            # ключ в настройках или от сервиса авторизации не разбирается: проблема не в токене
+            logger.error(f'Failed to load JWT public key: {str(e)}')
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Public key is not available'
+            )
+        except InvalidTokenError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail='Invalid API Key'
             )
 
 
+async def get_permissions(credentials: Optional[HTTPAuthorizationCredentials] = Depends(X_API_KEY)) -> int:
+    """
+    Зависимость: уровень доступа вызывающего по JWT, без токена - 0.
+    Уровень передается в сервисы, чтобы недоступные объекты отсекались прямо в запросе к базе
+    """
+    return _get_permissions(credentials)
+
+
+def is_allowed(obj_permissions: int, permissions: int) -> bool:
+    return obj_permissions == Permissions.OTHER.value or obj_permissions <= permissions
+
+
 def transform_obj_by_permissions(res, permissions):
-    obj_permissions = getattr(res, '_permissions', 0)
-    if obj_permissions != Permissions.OTHER.value and obj_permissions > permissions:
+    if not is_allowed(getattr(res, '_permissions', 0), permissions):
         res = {}
     return res
 
@@ -69,10 +86,9 @@ def jwt_permissions_required(optional=False, response_model=None):
 
     def decorator(fn):
         async def wrapper(*args, credentials: HTTPAuthorizationCredentials = Depends(X_API_KEY), **kwargs):
-            request: Request = kwargs.get('request')
             res = await fn(*args, **kwargs)
             if optional is False:
-                permissions = _get_permissions(request.app.state.jwt_public_key, credentials)
+                permissions = _get_permissions(credentials)
                 if isinstance(response_model, BaseModel):
                     res = transform_obj_by_permissions(res, permissions)
                 elif issubclass(response_model.__origin__, list):
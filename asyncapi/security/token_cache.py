@@ -0,0 +1,90 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import jwt
+import settings
+
+
+class VerifiedTokenCache:
+    """
+    Кэш проверенных JWT в памяти процесса: sha256 токена -> claims.
+    Один и тот же токен приходит с каждым запросом, пока не истечет, а проверка подписи RS256 дорогая.
+    Запись живет до exp токена, но не дольше max_ttl, чтобы смена ключа или отзыв токена не ждали exp.
+    Хранится хэш, а не сам токен. Невалидные токены не кешируются
+    """
+
+    def __init__(self, max_size: int, max_ttl: float):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._data: OrderedDict[str, Tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.verify_seconds = 0.0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        record = self._data.get(key)
+        if record is None:
+            return None
+
+        expires_at, claims = record
+        if expires_at <= time.time():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return claims
+
+    def set(self, token: str, claims: dict) -> None:
+        expires_at = time.time() + self.max_ttl
+        if 'exp' in claims:
+            expires_at = min(expires_at, claims['exp'])
+
+        key = self._key(token)
+        self._data[key] = (expires_at, claims)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def decode(self, token: str, get_key: Callable[[str], str]) -> dict:
+        """
+        Возвращает claims из кэша или проверяет подпись ключом get_key(token) и кладет в кэш.
+        Ошибки проверки пробрасываются как есть
+        """
+        claims = self.get(token)
+        if claims is not None:
+            self.hits += 1
+            return claims
+
+        self.misses += 1
+        started = time.perf_counter()
+        try:
+            claims = jwt.decode(jwt=token, key=get_key(token), algorithms=['RS256'])
+        finally:
+            self.verify_seconds += time.perf_counter() - started
+        self.set(token, claims)
+        return claims
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / requests, 4) if requests else 0,
+            # проверяются подписи только при промахах, включая невалидные токены
+            'verify_avg_ms': round(self.verify_seconds / self.misses * 1000, 3) if self.misses else 0,
+        }
+
+
+token_cache = VerifiedTokenCache(settings.JWT_CACHE_MAX_SIZE, settings.JWT_CACHE_MAX_TTL_IN_SECONDS)
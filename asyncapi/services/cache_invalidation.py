@@ -0,0 +1,101 @@
+import asyncio
+from typing import Dict, List, Union
+
+import orjson
+import settings
+from aioredis import Redis
+from core import context_logger
+from db.storage import BaseStorage, TwoTierStorage
+from models.film import Film
+from models.film_response import FilmResponseList
+from models.person_response import PersonResponse
+from services import genre_catalogue
+
+logger = context_logger.get(__name__)
+
+# Пауза перед повторной подпиской после обрыва соединения с Redis
+RESUBSCRIBE_INITIAL_BACKOFF = 1
+RESUBSCRIBE_MAX_BACKOFF = 30
+
+# Пространства ключей, в которых по id лежит объект: сам объект и производные от него записи
+ENTITY_NAMESPACES = {
+    'film': [('film', Film)],
+    'person': [('person', PersonResponse), ('person_films', FilmResponseList)],
+}
+# Пространства, которые сбрасываются при полной перезагрузке индекса: вместе с объектами и страницы запросов,
+# а для фильмов и фильмографии персон, в которых есть названия и рейтинги фильмов
+FLUSH_NAMESPACES = {
+    'film': ['film', 'film_query:filter', 'film_query:search', 'person_films'],
+    'person': ['person', 'person_films', 'person_query:search'],
+    # жанры не кешируются в Redis, их снимок в памяти перезагружается по событию инвалидации
+    'genre': [],
+}
+
+
+async def cache_keys(storage: BaseStorage, entity: str, ids: List[str]) -> List[str]:
+    """Ключи кэша, в которых лежат объекты"""
+    keys = []
+    for namespace, model in ENTITY_NAMESPACES.get(entity, []):
+        keys += (await storage.make_keys(namespace, model, ids)).values()
+    return keys
+
+
+async def flush(storage: BaseStorage, entity: str) -> None:
+    """Сбрасывает кэш всех объектов типа сменой поколения, без перебора и удаления ключей"""
+    for namespace in FLUSH_NAMESPACES[entity]:
+        await storage.bump_generation(namespace)
+
+
+async def publish_invalidation(redis: Redis, changed: Dict[str, List[str]]) -> None:
+    """
+    Публикует id измененных объектов по типам, например {'film': [...], 'person': [...]}.
+    Вызывается загрузчиком индексов после записи в эластик
+    """
+    changed = {entity: ids for entity, ids in changed.items() if ids}
+    if not changed:
+        return
+    await redis.publish(settings.CACHE_INVALIDATION_CHANNEL, orjson.dumps(changed))
+
+
+async def _evict(storage: TwoTierStorage, data: Union[str, bytes]) -> None:
+    try:
+        changed = orjson.loads(data)
+    except orjson.JSONDecodeError:
+        logger.warning(f'Skip malformed invalidation message {data!r}')
+        return
+
+    if 'genre' in changed and genre_catalogue.genre_catalogue:
+        genre_catalogue.genre_catalogue.request_reload()
+
+    keys = []
+    for entity, ids in changed.items():
+        keys += await cache_keys(storage, entity, ids)
+    await storage.delete_many(keys)
+    logger.info(f'Evicted {len(keys)} cache keys')
+
+
+async def listen_invalidations(redis: Redis, storage: TwoTierStorage) -> None:
+    """
+    Слушает канал инвалидации и удаляет измененные объекты из Redis и из памяти воркера.
+    Сообщения pub/sub, пришедшие пока воркер не был подписан, теряются,
+    поэтому после каждой (пере)подписки кэш в памяти сбрасывается целиком,
+    а записи в Redis доживают до окончания своего времени жизни.
+    """
+    backoff = RESUBSCRIBE_INITIAL_BACKOFF
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                storage.local.clear()
+                backoff = RESUBSCRIBE_INITIAL_BACKOFF
+                logger.info(f'Subscribed to {settings.CACHE_INVALIDATION_CHANNEL}')
+
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        await _evict(storage, message['data'])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f'Invalidation subscription failed: {str(e)}, retry in {backoff}s')
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RESUBSCRIBE_MAX_BACKOFF)
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional, Set, Tuple, Type
+
+import orjson
+import settings
+from core import context_logger
+from db.storage import BaseStorage, CacheEntry, ModelType
+from services.single_flight import single_flight
+
+logger = context_logger.get(__name__)
+
+# Ссылки на фоновые обновления, чтобы задачи не собрал сборщик мусора до завершения
+_background_refreshes: Set[asyncio.Task] = set()
+
+
+@asynccontextmanager
+async def _no_lock() -> AsyncIterator[bool]:
+    yield False
+
+
+async def _load(
+    key: str,
+    storage: BaseStorage,
+    model: Type[ModelType],
+    from_db: Callable[[], Awaitable[Optional[ModelType]]],
+    expire: float,
+    computed_after: float,
+) -> Optional[CacheEntry[ModelType]]:
+    """
+    Загружает объект из базы и кладет его в кэш в конверте с временем вычисления.
+    Если включена блокировка в Redis, то ключ обновляет только один воркер кластера,
+    а остальные после ожидания забирают из кэша результат, посчитанный позже computed_after.
+    """
+    if settings.CACHE_LOCK_ENABLED:
+        lock = storage.lock(
+            key,
+            timeout=settings.CACHE_LOCK_TIMEOUT_IN_SECONDS,
+            blocking_timeout=settings.CACHE_LOCK_WAIT_IN_SECONDS,
+        )
+    else:
+        lock = _no_lock()
+
+    async with lock as locked:
+        if settings.CACHE_LOCK_ENABLED:
+            # пока ждали блокировку, другой воркер мог уже обновить объект в кэше.
+            # Смотрим в Redis: копия в памяти воркера об этом не знает
+            entry = await storage.get_shared_entry(key, model)
+            if entry and entry.computed_at > computed_after:
+                return entry
+            if not locked:
+                logger.warning(f'Lock wait for {key = } timed out, loading without lock')
+
+        started = time.time()
+        item = await from_db()
+        if not item:
+            return None
+
+        entry = CacheEntry(item=item, computed_at=time.time(), delta=time.time() - started, expire=expire)
+        await storage.set_entry(key, entry, stale_expire=settings.CACHE_STALE_IN_SECONDS)
+        return entry
+
+
+async def _refresh_in_background(key: str, load: Callable[[], Awaitable]) -> None:
+    try:
+        await single_flight.do(key, load)
+    except Exception as e:
+        logger.warning(f'Background refresh of {key = } failed: {str(e)}')
+
+
+async def get_or_load_entry(
+    namespace: str,
+    id: str,
+    storage: BaseStorage,
+    model: Type[ModelType],
+    from_db: Callable[[], Awaitable[Optional[ModelType]]],
+    expire: float = settings.REDIS_CACHE_EXPIRE_IN_SECONDS,
+) -> Tuple[Optional[CacheEntry[ModelType]], str]:
+    """
+    Возвращает запись кэша с объектом из кэша или из базы и флаг, что объект взят из кэша.
+
+    - Одновременные промахи воркера по одному ключу делят один запрос в базу и одну запись в кэш.
+    - Устаревшая запись отдается сразу, а объект обновляется в фоне (stale-while-revalidate).
+    - Свежая запись с некоторой вероятностью обновляется в фоне заранее (XFetch),
+      чтобы ключи популярных объектов не истекали у всех одновременно.
+    """
+    key = await storage.make_key(namespace, model, id)
+    entry = await storage.get_entry(key, model)
+    if entry is not None:
+        if entry.should_refresh(settings.CACHE_EARLY_REFRESH_BETA):
+            logger.info(f'Refresh {key} in background, stale={entry.is_stale()}')
+            task = asyncio.ensure_future(_refresh_in_background(
+                key,
+                lambda: _load(key, storage, model, from_db, expire, computed_after=entry.computed_at),
+            ))
+            _background_refreshes.add(task)
+            task.add_done_callback(_background_refreshes.discard)
+        return entry, '1'
+
+    entry = await single_flight.do(
+        key,
+        lambda: _load(key, storage, model, from_db, expire, computed_after=0),
+    )
+    return entry, '0'
+
+
+async def get_or_load(
+    namespace: str,
+    id: str,
+    storage: BaseStorage,
+    model: Type[ModelType],
+    from_db: Callable[[], Awaitable[Optional[ModelType]]],
+    expire: float = settings.REDIS_CACHE_EXPIRE_IN_SECONDS,
+) -> Tuple[Optional[ModelType], str]:
+    """Возвращает объект из кэша или из базы и флаг, что объект взят из кэша. См. get_or_load_entry"""
+    entry, cached = await get_or_load_entry(namespace, id, storage, model, from_db, expire=expire)
+    if entry is None:
+        return None, cached
+    return entry.item, cached
+
+
+async def get_or_load_body(
+    namespace: str,
+    id: str,
+    storage: BaseStorage,
+    model: Type[ModelType],
+    from_db: Callable[[], Awaitable[Optional[ModelType]]],
+    expire: float = settings.REDIS_CACHE_EXPIRE_IN_SECONDS,
+) -> Tuple[Optional[bytes], str]:
+    """
+    Возвращает готовое тело ответа с объектом и флаг, что объект взят из кэша.
+    При попадании в кэш объект не разбирается в модель и не сериализуется заново
+    """
+    entry, cached = await get_or_load_entry(namespace, id, storage, model, from_db, expire=expire)
+    if entry is None:
+        return None, cached
+    return entry.body, cached
+
+
+def query_digest(payload: dict) -> str:
+    """id запроса в Elasticsearch для ключа кэша: одинаковые запросы дают одинаковый id независимо от порядка полей"""
+    return hashlib.sha1(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+async def get_or_load_query(
+    namespace: str,
+    payload: dict,
+    storage: BaseStorage,
+    model: Type[ModelType],
+    from_db: Callable[[], Awaitable[ModelType]],
+    expire: float,
+) -> ModelType:
+    """
+    Возвращает страницу результатов запроса из кэша или из базы.
+    Кэшируются только первые QUERY_CACHE_MAX_PAGES страниц: глубокие страницы запрашивают редко,
+    и они только вытесняли бы из кэша популярные
+    """
+    page_size = payload.get('size') or 1
+    if payload.get('from', 0) // page_size >= settings.QUERY_CACHE_MAX_PAGES:
+        return await from_db()
+
+    item, _ = await get_or_load(namespace, query_digest(payload), storage, model, from_db, expire=expire)
+    return item
@@ -0,0 +1,54 @@
+import base64
+import binascii
+from http import HTTPStatus
+from typing import List, Optional, Tuple
+
+import orjson
+import settings
+from core import context_logger
+from db.db_client import BaseDatabaseClient
+from fastapi import HTTPException
+
+logger = context_logger.get(__name__)
+
+
+def encode_cursor(search_after: list, pit_id: Optional[str] = None, phase: Optional[str] = None) -> str:
+    """
+    Непрозрачный для клиента курсор: значения sort последнего документа страницы, id point-in-time
+    и этап поиска, которым найдена первая страница, чтобы следующие искались так же
+    """
+    cursor = {'search_after': search_after}
+    if pit_id:
+        cursor['pit'] = pit_id
+    if phase:
+        cursor['phase'] = phase
+    return base64.urlsafe_b64encode(orjson.dumps(cursor)).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        decoded = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='invalid cursor')
+    if not isinstance(decoded, dict) or not isinstance(decoded.get('search_after'), list):
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='invalid cursor')
+    return decoded
+
+
+async def search_by_cursor(
+    db_client: BaseDatabaseClient, index: str, payload: dict, phase: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Выполняет запрос, собранный QueryConstructor.add_search_after, и возвращает документы страницы
+    и курсор следующей. Если страница неполная, то она последняя и курсора нет
+    """
+    if settings.ELASTIC_USE_PIT and 'pit' not in payload:
+        # первая страница: открываем point-in-time, дальше его id передается в курсоре
+        pit_id = await db_client.open_point_in_time(index, keep_alive=settings.ELASTIC_PIT_KEEP_ALIVE)
+        payload = {**payload, 'pit': {'id': pit_id, 'keep_alive': settings.ELASTIC_PIT_KEEP_ALIVE}}
+
+    docs, last_sort, pit_id = await db_client.search_page(index, payload)
+    if not last_sort or len(docs) < payload.get('size', 0):
+        return docs, None
+
+    return docs, encode_cursor(last_sort, pit_id, phase)
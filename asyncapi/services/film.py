@@ -1,77 +1,274 @@
 import logging
+import time
 from functools import lru_cache
 from http import HTTPStatus
-from typing import Optional, List, Tuple
+from typing import AsyncIterator, Optional, List, Tuple, Union
 
 import settings
 from core import context_logger
 from db.db_client import get_elastic, BaseDatabaseClient
-from db.storage import get_redis, BaseStorage
+from db.storage import get_cache, BaseStorage, CacheEntry
 from fastapi import Depends, HTTPException
-from models.enumerations import QueryType
+from models.enumerations import QueryType, SearchPhase
 from models.film import Film
-from models.film_response import FilmResponse
+from models.film_response import FilmResponse, FilmResponseList, FilmSearchResult
+from services.cache_loader import get_or_load, get_or_load_body, get_or_load_query
+from services.cursor import decode_cursor, search_by_cursor
+from security.security import Permissions
 from services.query_constructor import QueryConstructor
 
 logger = context_logger.get(__name__)
 logging.getLogger('elasticsearch').propagate = False
 
+SEARCH_FIELDS = [
+    'title',
+    'description',
+    'genre.name',
+    'actors.full_name',
+    'writers.full_name',
+    'directors.full_name'
+]
+# при точном поиске совпадение фразы в названии важнее, чем в описании или именах участников
+PHRASE_SEARCH_FIELDS = ['title^3', *SEARCH_FIELDS[1:]]
+
 
 class FilmService:
     def __init__(self, storage: BaseStorage, db_client: BaseDatabaseClient):
         self.storage = storage
         self.db_client = db_client
 
-    async def _search_query_db(self, body: dict, query_type: QueryType) -> Optional[List[Film]]:
-
-        query_constructor = QueryConstructor(body).add_sort().add_limits()
-        if query_type == QueryType.SEARCH:
-            query_constructor = query_constructor.add_multi_field_search([
-                'title',
-                'description',
-                'genre.name',
-                'actors.full_name',
-                'writers.full_name',
-                'directors.full_name'
-            ])
+    def _build_query(
+        self,
+        body: dict,
+        query_type: QueryType,
+        phase: SearchPhase = SearchPhase.FUZZY,
+        permissions: int = Permissions.OTHER.value,
+    ) -> dict:
+        query_constructor = QueryConstructor(body).add_sort().add_limits().add_search_after(
+            settings.ELASTIC_TIEBREAKER_FIELD, settings.ELASTIC_PIT_KEEP_ALIVE
+        )
+        if query_type == QueryType.SEARCH and phase == SearchPhase.EXACT:
+            query_constructor = query_constructor.add_phrase_search(PHRASE_SEARCH_FIELDS)
+        elif query_type == QueryType.SEARCH:
+            query_constructor = query_constructor.add_multi_field_search(SEARCH_FIELDS)
         if query_type == QueryType.FILTER:
             query_constructor = query_constructor.add_filter('genre.name.keyword', 'filter_genre')
 
-        payload = query_constructor.get_payload()
+        # фильмы, недоступные пользователю, отсекает сам эластик: страница заполняется целиком одним запросом
+        query_constructor = query_constructor.add_permissions_filter(permissions)
+
+        # в списке отдаем только краткую информацию о фильме, поэтому описание и участников из эластика не берем
+        query_constructor = query_constructor.add_source(includes=list(FilmResponse.__fields__))
 
+        return query_constructor.get_payload()
+
+    async def _search_query_db(self, payload: dict) -> FilmResponseList:
         results = await self.db_client.search(index=settings.ELASTIC_INDEX_FILM, body=payload)
-        return [Film(**doc) for doc in results]
+        # документы уже урезаны до полей ответа, так что сразу проверяем их моделью ответа, минуя полную модель фильма
+        return FilmResponseList(__root__=[FilmResponse(**doc) for doc in results])
+
+    async def get_by_query(
+        self, body: dict, query_type: QueryType, permissions: int = Permissions.OTHER.value
+    ) -> List[FilmResponse]:
+        """Получает список фильмов из кэша или эластика в формате ответа API"""
+        # ключ кэша строим по уже разобранному запросу в эластик, а не по сырым параметрам,
+        # чтобы, например, page_size=50 и запрос без page_size попадали в одну запись
+        payload = self._build_query(body, query_type, permissions=permissions)
+        if query_type == QueryType.SEARCH:
+            expire = settings.QUERY_CACHE_SEARCH_EXPIRE_IN_SECONDS
+        else:
+            expire = settings.QUERY_CACHE_FILTER_EXPIRE_IN_SECONDS
+
+        film_list = await get_or_load_query(
+            f'film_query:{query_type.name.lower()}',
+            payload,
+            self.storage,
+            FilmResponseList,
+            from_db=lambda: self._search_query_db(payload),
+            expire=expire,
+        )
+        return film_list.__root__
+
+    async def get_by_cursor(
+        self, body: dict, query_type: QueryType, permissions: int = Permissions.OTHER.value
+    ) -> Tuple[List[FilmResponse], Optional[str]]:
+        """
+        Получает страницу фильмов по курсору и курсор следующей страницы.
+        Такие страницы не кешируются: курсоры у всех клиентов разные
+        """
+        payload = self._build_query(body, query_type, permissions=permissions)
+        docs, next_cursor = await search_by_cursor(self.db_client, settings.ELASTIC_INDEX_FILM, payload)
+        return [FilmResponse(**doc) for doc in docs], next_cursor
+
+    async def _two_phase_search_db(self, body: dict, permissions: int) -> FilmSearchResult:
+        """
+        Сначала ищет фразу точно. Нечеткий поиск по всем полям запускается, только если точный
+        нашел меньше SEARCH_EXACT_MIN_HITS фильмов. Решение принимается по общему числу найденных,
+        а не по текущей странице, поэтому все страницы одного запроса ищутся одинаково
+        """
+        payload = self._build_query(body, QueryType.SEARCH, SearchPhase.EXACT, permissions)
+        docs, total = await self.db_client.search_with_total(index=settings.ELASTIC_INDEX_FILM, body=payload)
+        phase = SearchPhase.EXACT
+        if total < settings.SEARCH_EXACT_MIN_HITS:
+            payload = self._build_query(body, QueryType.SEARCH, SearchPhase.FUZZY, permissions)
+            docs = await self.db_client.search(index=settings.ELASTIC_INDEX_FILM, body=payload)
+            phase = SearchPhase.FUZZY
+
+        return FilmSearchResult(phase=phase.value, films=[FilmResponse(**doc) for doc in docs])
+
+    async def search(
+        self, body: dict, permissions: int = Permissions.OTHER.value
+    ) -> Tuple[List[FilmResponse], Optional[SearchPhase]]:
+        """Поиск фильмов в два этапа, см. _two_phase_search_db. Возвращает страницу и этап, который её нашел"""
+        if 'query' not in body:
+            # без строки поиска искать нечего, отдаем список фильмов как есть
+            return await self.get_by_query(body, QueryType.SEARCH, permissions), None
+
+        result = await get_or_load_query(
+            'film_query:search',
+            self._build_query(body, QueryType.SEARCH, SearchPhase.EXACT, permissions),
+            self.storage,
+            FilmSearchResult,
+            from_db=lambda: self._two_phase_search_db(body, permissions),
+            expire=settings.QUERY_CACHE_SEARCH_EXPIRE_IN_SECONDS,
+        )
+        return result.films, SearchPhase(result.phase)
+
+    async def search_by_cursor(
+        self, body: dict, permissions: int = Permissions.OTHER.value
+    ) -> Tuple[List[FilmResponse], Optional[str], Optional[SearchPhase]]:
+        """
+        Поиск фильмов в два этапа с выдачей по курсору. Этап выбирается на первой странице
+        и передается в курсоре, чтобы следующие страницы искались так же
+        """
+        if 'query' not in body:
+            films, next_cursor = await self.get_by_cursor(body, QueryType.SEARCH, permissions)
+            return films, next_cursor, None
 
-    async def get_by_query(self, body: dict, query_type: QueryType) -> List[FilmResponse]:
-        """Получает список фильмов из эластика и преобразовывает в нужный формат ответа API"""
-        film_list = await self._search_query_db(body, query_type)
-        return [FilmResponse(
-            uuid=film.uuid,
-            title=film.title,
-            imdb_rating=film.imdb_rating
-        ) for film in film_list]
+        index = settings.ELASTIC_INDEX_FILM
+        if body['cursor']:
+            phase = SearchPhase(decode_cursor(body['cursor']).get('phase', SearchPhase.FUZZY.value))
+            payload = self._build_query(body, QueryType.SEARCH, phase, permissions)
+            docs, next_cursor = await search_by_cursor(self.db_client, index, payload, phase.value)
+            return [FilmResponse(**doc) for doc in docs], next_cursor, phase
+
+        # на первой странице общего числа найденных нет, но неполная страница означает, что больше ничего не нашлось
+        phase = SearchPhase.EXACT
+        payload = self._build_query(body, QueryType.SEARCH, phase, permissions)
+        docs, next_cursor = await search_by_cursor(self.db_client, index, payload, phase.value)
+        if len(docs) < min(settings.SEARCH_EXACT_MIN_HITS, payload['size']):
+            phase = SearchPhase.FUZZY
+            payload = self._build_query(body, QueryType.SEARCH, phase, permissions)
+            docs, next_cursor = await search_by_cursor(self.db_client, index, payload, phase.value)
+        return [FilmResponse(**doc) for doc in docs], next_cursor, phase
+
+    async def export(
+        self, full: bool = False, permissions: int = Permissions.OTHER.value
+    ) -> AsyncIterator[Union[Film, FilmResponse]]:
+        """
+        Обходит весь индекс фильмов, отдавая фильмы по одному: полную информацию или краткую.
+        Фильмы, недоступные с уровнем permissions, отсекает сам эластик
+        """
+        model = Film if full else FilmResponse
+        query = QueryConstructor({}).add_permissions_filter(permissions).get_payload()
+        async for doc in self.db_client.scan(
+            settings.ELASTIC_INDEX_FILM,
+            body=query,
+            source_includes=list(model.__fields__),
+            size=settings.EXPORT_SCROLL_SIZE,
+        ):
+            yield model(**doc)
 
     # get_by_id возвращает объект фильма и флаг если объект из кэша.
     # Объект опционален, так как фильм может отсутствовать в базе
     async def get_by_id(self, film_id: str) -> Tuple[Optional[Film], str]:
-        # Пытаемся получить данные из кеша, потому что оно работает быстрее
+        # Пытаемся получить данные из кеша, потому что оно работает быстрее: сначала из памяти воркера, затем из Redis.
+        # Если фильма нет в кеше, то ищем его в Elasticsearch и сохраняем в кеш на 5 минут.
+        # Устаревший фильм отдаем из кеша сразу, а обновляем в фоне
         logger.info(f'Try to find film {film_id = } in cache')
-        film = await self._film_from_cache(film_id)
-        cached = '1'
+        film, cached = await get_or_load(
+            'film',
+            film_id,
+            self.storage,
+            Film,
+            from_db=lambda: self._get_film_from_db(film_id),
+        )
         if not film:
-            # Если фильма нет в кеше, то ищем его в Elasticsearch
-            logger.info(f'Try to find film {film_id = } in es')
-            film = await self._get_film_from_db(film_id)
-            cached = '0'
-            if not film:
-                logger.info(f'Film not found')
-                # Если он отсутствует в Elasticsearch, значит, фильма вообще нет в базе
-                return None, cached
-            # Сохраняем фильм  в кеш
-            await self._put_film_to_cache(film)
+            logger.info(f'Film not found')
+            # Если он отсутствует в Elasticsearch, значит, фильма вообще нет в базе
+            return None, cached
 
         return film, cached
 
+    async def get_body_by_id(self, film_id: str) -> Tuple[Optional[bytes], str]:
+        """Возвращает готовое тело ответа с фильмом и флаг если фильм из кэша, без разбора фильма в модель"""
+        return await get_or_load_body(
+            'film',
+            film_id,
+            self.storage,
+            Film,
+            from_db=lambda: self._get_film_from_db(film_id),
+        )
+
+    async def _allowed_ids(self, film_ids: List[str], permissions: int) -> List[str]:
+        """
+        Оставляет id фильмов, доступных с уровнем permissions. В кеше уровень доступа фильма не хранится,
+        поэтому спрашиваем эластик: запрос по id без тела документов дешевый
+        """
+        if permissions >= Permissions.ADMIN.value:
+            return film_ids
+
+        payload = QueryConstructor({}).add_ids_filter(film_ids).add_permissions_filter(permissions).add_source(
+            includes=['uuid']
+        ).get_payload()
+        docs = await self.db_client.search(index=settings.ELASTIC_INDEX_FILM, body=payload)
+        allowed = {str(doc['uuid']) for doc in docs}
+        return [film_id for film_id in film_ids if film_id in allowed]
+
+    async def get_by_ids(self, film_ids: List[str], permissions: int = Permissions.OTHER.value) -> List[Film]:
+        """
+        Возвращает фильмы по списку id в том же порядке, пропуская ненайденные и недоступные с уровнем permissions.
+        Всё, что есть в кеше, берется одним MGET, недостающие и устаревшие фильмы - одним mget из эластика,
+        а затем пакетом записываются обратно в кеш
+        """
+        film_ids = await self._allowed_ids(list(dict.fromkeys(film_ids)), permissions)
+        if not film_ids:
+            return []
+        keys = await self.storage.make_keys('film', Film, film_ids)
+        cached = await self.storage.get_entries(list(keys.values()), Film)
+        entries = {film_id: cached[key] for film_id, key in keys.items() if key in cached}
+        films = {film_id: entry.item for film_id, entry in entries.items() if not entry.is_stale()}
+
+        misses = [film_id for film_id in film_ids if film_id not in films]
+        if misses:
+            logger.info(f'Try to find {len(misses)} films in es')
+            started = time.time()
+            docs = await self.db_client.mget(body={'ids': misses}, index=settings.ELASTIC_INDEX_FILM)
+            delta = time.time() - started
+
+            loaded = {}
+            for doc in docs:
+                film = Film(**doc)
+                loaded[str(film.uuid)] = CacheEntry(
+                    item=film,
+                    computed_at=time.time(),
+                    delta=delta,
+                    expire=settings.REDIS_CACHE_EXPIRE_IN_SECONDS,
+                )
+            await self.storage.set_entries(
+                {keys[film_id]: entry for film_id, entry in loaded.items() if film_id in keys},
+                expire=settings.REDIS_CACHE_EXPIRE_IN_SECONDS,
+                stale_expire=settings.CACHE_STALE_IN_SECONDS,
+            )
+            films.update({film_id: entry.item for film_id, entry in loaded.items()})
+
+            # если эластик не нашел фильм, но в кеше была устаревшая запись - отдаем её
+            for film_id in misses:
+                if film_id not in films and film_id in entries:
+                    films[film_id] = entries[film_id].item
+
+        return [films[film_id] for film_id in film_ids if film_id in films]
+
     async def _get_film_from_db(self, film_id: str) -> Optional[Film]:
         # Если не найдено по id, то эластик кидает исключение. Оборачиваем в попытку и ругаемся правильно
         try:
@@ -80,28 +277,10 @@ class FilmService:
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='film not found')
         return Film(**doc)
 
-    async def _film_from_cache(self, film_id: str) -> Optional[Film]:
-        # Пытаемся получить данные о фильме из кеша, используя команду get
-        # https://redis.io/commands/get
-        data = await self.storage.get(film_id)
-        if not data:
-            return None
-
-        # pydantic предоставляет удобное API для создания объекта моделей из json
-        film = Film.parse_raw(data)
-        return film
-
-    async def _put_film_to_cache(self, film: Film):
-        # Сохраняем данные о фильме, используя команду set
-        # Выставляем время жизни кеша — 5 минут
-        # https://redis.io/commands/set
-        # pydantic позволяет сериализовать модель в json
-        await self.storage.set(str(film.uuid), film.json(), expire=settings.REDIS_CACHE_EXPIRE_IN_SECONDS)
-
 
 @lru_cache()
 def get_film_service(
-        storage: BaseStorage = Depends(get_redis),
+        storage: BaseStorage = Depends(get_cache),
         db_client: BaseDatabaseClient = Depends(get_elastic),
 ) -> FilmService:
     return FilmService(storage, db_client)
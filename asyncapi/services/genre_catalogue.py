@@ -0,0 +1,102 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional, Set, Tuple
+
+import orjson
+import settings
+from core import context_logger
+from db.db_client import BaseDatabaseClient
+from models.genre import Genre
+from services.single_flight import single_flight
+
+logger = context_logger.get(__name__)
+
+
+@dataclass(frozen=True)
+class GenreSnapshot:
+    """Неизменяемый снимок всех жанров с индексом по id и готовыми телами ответов"""
+    genres: Tuple[Genre, ...]
+    by_id: Mapping[str, Genre]
+    body: bytes
+    bodies: Mapping[str, bytes]
+    loaded_at: float
+
+    @classmethod
+    def build(cls, genres: Tuple[Genre, ...]) -> 'GenreSnapshot':
+        return cls(
+            genres=genres,
+            by_id=MappingProxyType({str(genre.uuid): genre for genre in genres}),
+            body=orjson.dumps([genre.dict() for genre in genres]),
+            bodies=MappingProxyType({str(genre.uuid): orjson.dumps(genre.dict()) for genre in genres}),
+            loaded_at=time.time(),
+        )
+
+
+class GenreCatalogue:
+    """
+    Каталог жанров в памяти воркера. Жанры меняются редко, поэтому воркер держит снимок всех жанров
+    и отдает их без запросов в Redis и эластик. Снимок загружается при первом обращении,
+    а затем перезагружается в фоне раз в GENRE_SNAPSHOT_REFRESH_IN_SECONDS или по событию инвалидации.
+    Снимок заменяется целиком, поэтому запрос никогда не видит его наполовину обновленным
+    """
+
+    def __init__(self, db_client: BaseDatabaseClient, refresh_interval: float):
+        self.db_client = db_client
+        self.refresh_interval = refresh_interval
+        self.snapshot: Optional[GenreSnapshot] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._reloads: Set[asyncio.Task] = set()
+
+    async def get(self) -> Tuple[GenreSnapshot, str]:
+        """Возвращает снимок и флаг, что он уже был в памяти"""
+        if self.snapshot is not None:
+            return self.snapshot, '1'
+        return await single_flight.do('genre_snapshot', self.reload), '0'
+
+    async def reload(self) -> GenreSnapshot:
+        # если не задать size, то он по дефолту 10. Передаем максимум, чтобы вернул всё, что есть
+        docs = await self.db_client.search(
+            index=settings.ELASTIC_INDEX_GENRE,
+            size=10000,
+            source_includes=list(Genre.__fields__),
+        )
+        self.snapshot = GenreSnapshot.build(tuple(Genre(**doc) for doc in docs))
+        logger.info(f'Genre snapshot reloaded, {len(self.snapshot.genres)} genres')
+        return self.snapshot
+
+    def request_reload(self) -> None:
+        """Перезагрузить снимок в фоне, например, по событию инвалидации"""
+        task = asyncio.ensure_future(self._safe_reload())
+        self._reloads.add(task)
+        task.add_done_callback(self._reloads.discard)
+
+    async def _safe_reload(self) -> None:
+        try:
+            await single_flight.do('genre_snapshot', self.reload)
+        except Exception as e:
+            # старый снимок остается в работе до следующей попытки
+            logger.warning(f'Genre snapshot reload failed: {str(e)}')
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self._safe_reload()
+
+    def start(self) -> None:
+        self._refresher = asyncio.create_task(self._refresh_periodically())
+
+    def stop(self) -> None:
+        if self._refresher:
+            self._refresher.cancel()
+        for task in self._reloads:
+            task.cancel()
+
+
+# Каталог создается при старте приложения, один на процесс
+genre_catalogue: Optional[GenreCatalogue] = None
+
+
+async def get_genre_catalogue() -> GenreCatalogue:
+    return genre_catalogue
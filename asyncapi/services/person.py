@@ -1,17 +1,19 @@
 from functools import lru_cache
 from http import HTTPStatus
-from typing import Optional, List, Tuple
+from typing import AsyncIterator, Optional, List, Tuple
 
 import settings
 from core import context_logger
 from db.db_client import get_elastic, BaseDatabaseClient
-from db.storage import get_redis, BaseStorage
+from db.storage import get_cache, BaseStorage
 from fastapi import Depends, HTTPException
 from models.enumerations import QueryType
-from models.film_response import FilmResponse
+from models.film_response import FilmResponse, FilmResponseList
 from models.person import Person
-from models.person_response import PersonResponse
-from services.query_constructor import QueryConstructor
+from models.person_response import PersonResponse, PersonResponseList
+from services.cache_loader import get_or_load, get_or_load_body, get_or_load_query
+from services.cursor import search_by_cursor
+from services.query_constructor import LIMIT_PER_PAGE, QueryConstructor
 
 logger = context_logger.get(__name__)
 
@@ -21,19 +23,17 @@ class PersonService:
         self.storage = storage
         self.db_client = db_client
 
-    async def _search_query_db(self, body: dict, query_type: QueryType) -> Optional[List[Person]]:
-        """Возвращает список персон из индекса, с ограничениями и поиском, если задано в запросе"""
+    def _build_query(self, body: dict) -> dict:
+        query_constructor = QueryConstructor(body).add_sort().add_limits().add_search_after(
+            settings.ELASTIC_TIEBREAKER_FIELD, settings.ELASTIC_PIT_KEEP_ALIVE
+        ).add_single_field_search('full_name')
+        # служебные поля документа персоны (даты создания, пол и т.п.) в ответ не попадают, не забираем их
+        query_constructor = query_constructor.add_source(includes=list(Person.__fields__))
+        return query_constructor.get_payload()
 
-        query_constructor = QueryConstructor(body).add_sort().add_limits().add_single_field_search('full_name')
-        payload = query_constructor.get_payload()
-
-        results = await self.db_client.search(index=settings.ELASTIC_INDEX_PERSON, body=payload)
-        return [Person(**doc) for doc in results]
-
-    async def get_by_query(self, body: dict, query_type: QueryType) -> Optional[List[PersonResponse]]:
-        """Получает список персон из эластика и преобразовывает в нужный формат ответа API"""
-
-        person_list = await self._search_query_db(body, query_type)
+    def _split_by_roles(self, docs: List[dict]) -> List[PersonResponse]:
+        """Преобразует документы персон в формат ответа API: по записи на каждую роль персоны"""
+        person_list = [Person(**doc) for doc in docs]
 
         result = []
         for person in person_list:
@@ -52,23 +52,73 @@ class PersonService:
 
         return result
 
+    async def _search_query_db(self, payload: dict) -> PersonResponseList:
+        """Возвращает список персон из индекса в формате ответа API"""
+
+        results = await self.db_client.search(index=settings.ELASTIC_INDEX_PERSON, body=payload)
+        return PersonResponseList(__root__=self._split_by_roles(results))
+
+    async def get_by_query(self, body: dict, query_type: QueryType) -> Optional[List[PersonResponse]]:
+        """Получает список персон из кэша или эластика, с ограничениями и поиском, если задано в запросе"""
+
+        payload = self._build_query(body)
+        person_list = await get_or_load_query(
+            'person_query:search',
+            payload,
+            self.storage,
+            PersonResponseList,
+            from_db=lambda: self._search_query_db(payload),
+            expire=settings.QUERY_CACHE_SEARCH_EXPIRE_IN_SECONDS,
+        )
+        return person_list.__root__
+
+    async def get_by_cursor(self, body: dict) -> Tuple[List[PersonResponse], Optional[str]]:
+        """Получает страницу персон по курсору и курсор следующей страницы, без кеширования"""
+
+        payload = self._build_query(body)
+        docs, next_cursor = await search_by_cursor(self.db_client, settings.ELASTIC_INDEX_PERSON, payload)
+        return self._split_by_roles(docs), next_cursor
+
+    async def export(self) -> AsyncIterator[Person]:
+        """Обходит весь индекс персон, отдавая персоны по одному"""
+        async for doc in self.db_client.scan(
+            settings.ELASTIC_INDEX_PERSON,
+            source_includes=list(Person.__fields__),
+            size=settings.EXPORT_SCROLL_SIZE,
+        ):
+            yield Person(**doc)
+
     # get_by_id возвращает объект персонажа. Он опционален, так как фильм может отсутствовать в базе
     async def get_by_id(self, id: str) -> Tuple[Optional[PersonResponse], str]:
-        # Пытаемся получить данные из кеша, потому что оно работает быстрее
-        person_response = await self._get_from_cache(id)
-        cached = '1'
+        # Пытаемся получить данные из кеша, потому что оно работает быстрее.
+        # Если персоны нет в кеше, то ищем её в Elasticsearch
+        person_response, cached = await get_or_load(
+            'person',
+            id,
+            self.storage,
+            PersonResponse,
+            from_db=lambda: self._get_response_from_elastic(id),
+        )
         if not person_response:
-            # Если персоны нет в кеше, то ищем его в Elasticsearch
-            person = await self._get_from_elastic(id)
-            cached = '0'
-            if not person:
-                return None, cached
+            return None, cached
 
-            person_response = await self._convert_person(person)
+        return person_response, cached
 
-            await self._put_to_cache(person_response)
+    async def get_body_by_id(self, id: str) -> Tuple[Optional[bytes], str]:
+        """Возвращает готовое тело ответа с персоной и флаг если персона из кэша, без разбора персоны в модель"""
+        return await get_or_load_body(
+            'person',
+            id,
+            self.storage,
+            PersonResponse,
+            from_db=lambda: self._get_response_from_elastic(id),
+        )
 
-        return person_response, cached
+    async def _get_response_from_elastic(self, id: str) -> Optional[PersonResponse]:
+        person = await self._get_from_elastic(id)
+        if not person:
+            return None
+        return await self._convert_person(person)
 
     async def _convert_person(self, person: Person) -> PersonResponse:
         film_roles = {'actor': [], 'writer': [], 'director': []}
@@ -97,41 +147,48 @@ class PersonService:
             raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='person not found')
         return Person(**doc)
 
-    async def _get_from_cache(self, id: str) -> Optional[PersonResponse]:
-        # Пытаемся получить данные о фильме из кеша, используя команду get
-        # https://redis.io/commands/get
-        data = await self.storage.get(id)
-        if not data:
-            return None
-
-        # pydantic предоставляет удобное API для создания объекта моделей из json
-        item = PersonResponse.parse_raw(data)
-        return item
-
-    async def _put_to_cache(self, item: PersonResponse):
+    async def _get_films_from_elastic(self, person: PersonResponse) -> FilmResponseList:
+        # строим свой запрос в эластик: забираем из документов только поля краткой информации о фильме,
+        # полные документы с описанием и участниками здесь не нужны
+        try:
+            docs = await self.db_client.mget(
+                body={'ids': list(dict.fromkeys(person.film_ids))},
+                index=settings.ELASTIC_INDEX_FILM,
+                source_includes=list(FilmResponse.__fields__),
+            )
+        except Exception:
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='person not found')
 
-        await self.storage.set(str(item.uuid), item.json(), expire=settings.REDIS_CACHE_EXPIRE_IN_SECONDS)
+        return FilmResponseList(__root__=[FilmResponse(**doc) for doc in docs])
 
-    async def get_films_by_person_id(self, id: str) -> Optional[List[FilmResponse]]:
+    async def get_films_by_person_id(
+        self,
+        id: str,
+        page_size: int = LIMIT_PER_PAGE,
+        page_number: int = 1,
+    ) -> Optional[List[FilmResponse]]:
+        """Возвращает страницу фильмографии персоны. Фильмография целиком кешируется по id персоны"""
         person, cached = await self.get_by_id(id)
         if not person:
             return None
 
-        # строим свой запрос в эластик
-        try:
-            docs = await self.db_client.mget(
-                body={'ids': person.film_ids},
-                index=settings.ELASTIC_INDEX_FILM
-            )
-        except Exception:
-            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='person not found')
+        film_list, cached = await get_or_load(
+            'person_films',
+            id,
+            self.storage,
+            FilmResponseList,
+            from_db=lambda: self._get_films_from_elastic(person),
+        )
 
-        return [FilmResponse(**doc) for doc in docs]
+        if page_size <= 0:
+            page_size = LIMIT_PER_PAGE
+        start = (max(page_number, 1) - 1) * page_size
+        return film_list.__root__[start:start + page_size]
 
 
 @lru_cache()
 def get_person_service(
-    storage: BaseStorage = Depends(get_redis),
+    storage: BaseStorage = Depends(get_cache),
     db_client: BaseDatabaseClient = Depends(get_elastic),
 ) -> PersonService:
     return PersonService(storage, db_client)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import logging
+from typing import List, Optional
 
 from core import context_logger
+from services.cursor import decode_cursor
 
 LIMIT_PER_PAGE = 50
 
@@ -72,6 +74,20 @@ class QueryConstructor:
 
         return self
 
+    def add_phrase_search(self, fields: list) -> QueryConstructor:
+        """Поиск фразы целиком без нечеткого сравнения: намного дешевле add_multi_field_search"""
+        if 'query' not in self.body:
+            return self
+
+        self._payload['query'] = {
+            'multi_match': {
+                'query': self.body['query'],
+                'type': 'phrase',
+                'fields': fields,
+            }
+        }
+        return self
+
     def add_multi_field_search(self, fields: list) -> QueryConstructor:
         if 'query' not in self.body:
             return self
@@ -98,5 +114,88 @@ class QueryConstructor:
         }
         return self
 
+    def add_prefix_search(self, field: str) -> QueryConstructor:
+        """
+        Поиск по началу слов для подсказок при наборе: последнее слово запроса считается префиксом.
+        Поле должно быть типа search_as_you_type, иначе подполей _2gram/_3gram нет и поиск идет только по полю
+        """
+        if 'query' not in self.body:
+            return self
+
+        self._payload['query'] = {
+            'multi_match': {
+                'query': self.body['query'],
+                'type': 'bool_prefix',
+                'fields': [field, f'{field}._2gram', f'{field}._3gram'],
+            }
+        }
+        return self
+
+    def add_ids_filter(self, ids: List[str]) -> QueryConstructor:
+        """Только документы с указанными id, по одному на id"""
+        self._payload['query'] = {'ids': {'values': ids}}
+        self._payload['size'] = len(ids)
+        return self
+
+    def add_permissions_filter(self, permissions: int, field: str = 'permissions') -> QueryConstructor:
+        """
+        Оставляет только документы, доступные с уровнем доступа permissions: уровень документа не выше
+        или не задан вовсе, т.е. документ общедоступный. Вызывать после поиска или фильтра.
+        Условие в filter не влияет на релевантность и кешируется эластиком
+        """
+        allowed = {
+            'bool': {
+                'should': [
+                    {'range': {field: {'lte': permissions}}},
+                    {'bool': {'must_not': {'exists': {'field': field}}}},
+                ],
+                'minimum_should_match': 1,
+            }
+        }
+        self._payload['query'] = {
+            'bool': {
+                'must': self._payload.get('query', {'match_all': {}}),
+                'filter': allowed,
+            }
+        }
+        return self
+
+    def add_search_after(self, tiebreaker: str, pit_keep_alive: str) -> QueryConstructor:
+        """
+        Постраничная выдача по курсору (search_after) вместо from: стоимость страницы не растет с её номером,
+        и нет ограничения max_result_window. Включается параметром cursor, пустой cursor - первая страница.
+        Вызывать после add_sort и add_limits.
+        https://www.elastic.co/guide/en/elasticsearch/reference/current/paginate-search-results.html#search-after
+        """
+        if 'cursor' not in self.body:
+            return self
+
+        # search_after требует однозначной сортировки, поэтому добавляем поле, уникальное для документа
+        sort = self._payload.get('sort', [{'_score': 'desc'}])
+        if not any(tiebreaker in field for field in sort):
+            sort = [*sort, {tiebreaker: 'asc'}]
+        self._payload['sort'] = sort
+        self._payload.pop('from', None)
+
+        if self.body['cursor']:
+            cursor = decode_cursor(self.body['cursor'])
+            self._payload['search_after'] = cursor['search_after']
+            if 'pit' in cursor:
+                self._payload['pit'] = {'id': cursor['pit'], 'keep_alive': pit_keep_alive}
+
+        return self
+
+    def add_source(self, includes: Optional[List[str]] = None, excludes: Optional[List[str]] = None) -> QueryConstructor:
+        """Ограничивает поля документов, которые вернет эластик, чтобы не гонять по сети лишнее"""
+        source = {}
+        if includes:
+            source['includes'] = includes
+        if excludes:
+            source['excludes'] = excludes
+        if source:
+            self._payload['_source'] = source
+
+        return self
+
     def get_payload(self) -> dict:
         return self._payload
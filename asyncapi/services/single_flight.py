@@ -0,0 +1,34 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+from core import context_logger
+
+logger = context_logger.get(__name__)
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Объединение одновременных запросов по одному ключу.
+    Первый запрос запускает загрузку, остальные ждут её результат, а не идут в базу сами.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            # ключ освобождаем по завершении загрузки, а не запроса:
+            # если клиент первого запроса отключится, остальные всё равно получат результат
+            call.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            logger.debug(f'Join in-flight request for {key = }')
+        return await asyncio.shield(call)
+
+
+# Один объект на воркер, общий для всех сервисов
+single_flight = SingleFlight()
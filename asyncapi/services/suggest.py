@@ -0,0 +1,103 @@
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+
+import orjson
+import settings
+from core import context_logger
+from db.db_client import get_elastic, BaseDatabaseClient
+from db.storage import LRUStorage
+from fastapi import Depends
+from models.suggestion import FilmSuggestion, PersonSuggestion
+from pydantic import BaseModel
+from security.security import Permissions
+from services.query_constructor import QueryConstructor
+
+logger = context_logger.get(__name__)
+
+# Кэш подсказок в памяти воркера: ключ - тип, уровень доступа, размер и префикс, значение - готовое тело ответа.
+# Создается при старте приложения, один на процесс
+suggest_cache: Optional[LRUStorage] = None
+
+
+class SuggestService:
+    """
+    Подсказки при наборе: легкий запрос bool_prefix по одному полю вместо нечеткого поиска по шести полям.
+    Поле в индексе должно быть типа search_as_you_type (см. etl.mappings), тогда префиксы ищутся
+    по готовым подполям _2gram/_3gram/_index_prefix. На индексе с динамической схемой запрос тоже работает,
+    только медленнее. Ответы на короткие, а значит самые частые, префиксы кешируются в памяти воркера
+    """
+
+    def __init__(self, db_client: BaseDatabaseClient, cache: LRUStorage):
+        self.db_client = db_client
+        self.cache = cache
+
+    @staticmethod
+    def _normalize(prefix: str) -> str:
+        return ' '.join(prefix.lower().split())
+
+    async def _suggest(
+        self,
+        entity: str,
+        index: str,
+        field: str,
+        model: Type[BaseModel],
+        prefix: str,
+        size: int,
+        permissions: Optional[int] = None,
+    ) -> Tuple[bytes, str]:
+        """permissions - уровень доступа пользователя, если у документов индекса он есть"""
+        prefix = self._normalize(prefix)
+        if not prefix:
+            return b'[]', '0'
+
+        cacheable = len(prefix) <= settings.SUGGEST_CACHE_MAX_PREFIX_LENGTH
+        # пользователи с разным уровнем доступа видят разные подсказки
+        key = f'{entity}:{permissions}:{size}:{prefix}'
+        if cacheable:
+            body = await self.cache.get(key)
+            if body is not None:
+                return body, '1'
+
+        query_constructor = QueryConstructor({'query': prefix}).add_prefix_search(field)
+        if permissions is not None:
+            query_constructor = query_constructor.add_permissions_filter(permissions)
+
+        docs = await self.db_client.search(
+            index=index,
+            body=query_constructor.get_payload(),
+            size=size,
+            source_includes=list(model.__fields__),
+        )
+        body = orjson.dumps([model(**doc).dict() for doc in docs])
+        if cacheable:
+            await self.cache.set(key, body)
+        return body, '0'
+
+    async def suggest_films(
+        self, prefix: str, size: int, permissions: int = Permissions.OTHER.value
+    ) -> Tuple[bytes, str]:
+        """
+        Возвращает готовое тело ответа с подсказками названий фильмов и флаг, что ответ из кэша.
+        Фильмы, недоступные с уровнем permissions, в подсказки не попадают
+        """
+        return await self._suggest(
+            'film', settings.ELASTIC_INDEX_FILM, 'title', FilmSuggestion, prefix, size, permissions
+        )
+
+    async def suggest_persons(self, prefix: str, size: int) -> Tuple[bytes, str]:
+        """Возвращает готовое тело ответа с подсказками имен персон и флаг, что ответ из кэша"""
+        return await self._suggest(
+            'person', settings.ELASTIC_INDEX_PERSON, 'full_name', PersonSuggestion, prefix, size
+        )
+
+
+async def get_suggest_cache() -> LRUStorage:
+    return suggest_cache
+
+
+@lru_cache()
+def get_suggest_service(
+    db_client: BaseDatabaseClient = Depends(get_elastic),
+    cache: LRUStorage = Depends(get_suggest_cache),
+) -> SuggestService:
+    return SuggestService(db_client, cache)
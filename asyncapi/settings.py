@@ -16,7 +16,58 @@ REDIS_HOST = env('REDIS_HOST', '127.0.0.1')
 REDIS_PORT = env.int('REDIS_PORT', 6379)
 REDIS_PASS = env('REDIS_PASSWORD', '')
 REDIS_USE_SSL = env.bool('REDIS_USE_SSL', False)
-REDIS_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
+# Инвалидация кэша по событиям: загрузчик индексов публикует id измененных объектов в канал Redis,
+# а воркеры удаляют их из Redis и из памяти. С ней объекты можно держать в кэше часами
+CACHE_INVALIDATION_ENABLED = env.bool('CACHE_INVALIDATION_ENABLED', False)
+CACHE_INVALIDATION_CHANNEL = env('CACHE_INVALIDATION_CHANNEL', 'cache:invalidate')
+REDIS_CACHE_EXPIRE_IN_SECONDS = env.int(
+    'REDIS_CACHE_EXPIRE_IN_SECONDS',
+    60 * 60 * 6 if CACHE_INVALIDATION_ENABLED else 60 * 5,  # 6 часов или 5 минут
+)
+# Сколько еще после REDIS_CACHE_EXPIRE_IN_SECONDS можно отдавать устаревшую запись, пока она обновляется в фоне
+CACHE_STALE_IN_SECONDS = env.int('CACHE_STALE_IN_SECONDS', 60 * 10)
+# Коэффициент вероятностного досрочного обновления (XFetch). Больше единицы - обновлять раньше, 0 - выключить
+CACHE_EARLY_REFRESH_BETA = env.float('CACHE_EARLY_REFRESH_BETA', 1.0)
+
+# Как часто воркер перечитывает из Redis поколения пространств ключей кэша (см. db.storage.make_key)
+CACHE_GENERATION_REFRESH_IN_SECONDS = env.float('CACHE_GENERATION_REFRESH_IN_SECONDS', 5)
+
+# Сжатие значений в Redis: значения меньше CACHE_COMPRESSION_MIN_SIZE байт не сжимаются.
+# Словарь строится по образцам фильмов командой python -m etl.train_dictionary
+CACHE_COMPRESSION_ENABLED = env.bool('CACHE_COMPRESSION_ENABLED', True)
+CACHE_COMPRESSION_MIN_SIZE = env.int('CACHE_COMPRESSION_MIN_SIZE', 512)
+CACHE_COMPRESSION_LEVEL = env.int('CACHE_COMPRESSION_LEVEL', 3)
+CACHE_COMPRESSION_DICT_PATH = env('CACHE_COMPRESSION_DICT_PATH', None)
+
+# Настройки кэша в памяти воркера (первый уровень перед Redis)
+LOCAL_CACHE_MAX_SIZE = env.int('LOCAL_CACHE_MAX_SIZE', 10000)
+LOCAL_CACHE_EXPIRE_IN_SECONDS = env.int('LOCAL_CACHE_EXPIRE_IN_SECONDS', 60 * 5 if CACHE_INVALIDATION_ENABLED else 30)
+
+# Кэш страниц списков и поиска: время жизни по типу запроса и сколько первых страниц кэшировать
+QUERY_CACHE_FILTER_EXPIRE_IN_SECONDS = env.int('QUERY_CACHE_FILTER_EXPIRE_IN_SECONDS', 60 * 5)
+QUERY_CACHE_SEARCH_EXPIRE_IN_SECONDS = env.int('QUERY_CACHE_SEARCH_EXPIRE_IN_SECONDS', 60)
+QUERY_CACHE_MAX_PAGES = env.int('QUERY_CACHE_MAX_PAGES', 10)
+
+# Как часто воркер перезагружает снимок каталога жанров в памяти
+GENRE_SNAPSHOT_REFRESH_IN_SECONDS = env.int('GENRE_SNAPSHOT_REFRESH_IN_SECONDS', 60 * 10)
+
+# Подсказки при наборе: сколько подсказок по умолчанию и максимум, кэш ответов на короткие префиксы в памяти воркера
+SUGGEST_SIZE = env.int('SUGGEST_SIZE', 5)
+SUGGEST_MAX_SIZE = env.int('SUGGEST_MAX_SIZE', 20)
+SUGGEST_CACHE_MAX_PREFIX_LENGTH = env.int('SUGGEST_CACHE_MAX_PREFIX_LENGTH', 4)
+SUGGEST_CACHE_MAX_SIZE = env.int('SUGGEST_CACHE_MAX_SIZE', 20000)
+SUGGEST_CACHE_EXPIRE_IN_SECONDS = env.int('SUGGEST_CACHE_EXPIRE_IN_SECONDS', 60 * 10)
+
+# Поиск фильмов сначала ищет фразу точно и переходит к нечеткому поиску, только если найдено меньше стольких фильмов
+SEARCH_EXACT_MIN_HITS = env.int('SEARCH_EXACT_MIN_HITS', 3)
+
+# Максимальное количество id в одном пакетном запросе
+BATCH_MAX_IDS = env.int('BATCH_MAX_IDS', 100)
+
+# Блокировка в Redis при обновлении кэша, чтобы ключ в Elasticsearch запрашивал только один воркер кластера
+CACHE_LOCK_ENABLED = env.bool('CACHE_LOCK_ENABLED', False)
+CACHE_LOCK_TIMEOUT_IN_SECONDS = env.float('CACHE_LOCK_TIMEOUT_IN_SECONDS', 10)
+CACHE_LOCK_WAIT_IN_SECONDS = env.float('CACHE_LOCK_WAIT_IN_SECONDS', 5)
 
 
 # Настройки Elasticsearch
@@ -28,12 +79,39 @@ ELASTIC_USE_SSL = env.bool('ELASTIC_USE_SSL', False)
 ELASTIC_INDEX_FILM = env('ELASTIC_INDEX_FILM', 'movies')
 ELASTIC_INDEX_PERSON = env('ELASTIC_INDEX_PERSON', 'persons')
 ELASTIC_INDEX_GENRE = env('ELASTIC_INDEX_GENRE', 'genres')
+# Уникальное поле документа для однозначной сортировки при выдаче по курсору.
+# Сортировать можно только по keyword: uuid в индексе размечен динамически как text с подполем keyword
+ELASTIC_TIEBREAKER_FIELD = env('ELASTIC_TIEBREAKER_FIELD', 'uuid.keyword')
+# Выдача по курсору поверх point-in-time (Elasticsearch 7.10+): страницы не сдвигаются при переиндексации
+ELASTIC_USE_PIT = env.bool('ELASTIC_USE_PIT', False)
+ELASTIC_PIT_KEEP_ALIVE = env('ELASTIC_PIT_KEEP_ALIVE', '5m')
+ELASTIC_SCROLL_KEEP_ALIVE = env('ELASTIC_SCROLL_KEEP_ALIVE', '5m')
+
+# Выгрузка каталога: сколько документов читать из эластика за раз и сколько строк NDJSON отправлять одним куском
+EXPORT_SCROLL_SIZE = env.int('EXPORT_SCROLL_SIZE', 1000)
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', 500)
+
+# Загрузка в индексы (etl): размер пачки, число параллельных пачек и повторов при 429 от эластика
+ETL_CHUNK_SIZE = env.int('ETL_CHUNK_SIZE', 500)
+ETL_CONCURRENCY = env.int('ETL_CONCURRENCY', 4)
+ETL_MAX_RETRIES = env.int('ETL_MAX_RETRIES', 5)
 
 # Корень проекта
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 JWT_KEY_URL = env('JWT_KEY_URL', 'http://localhost:8002/public_key')
-JWT_PUBLIC_KEY = env('JWT_PUBLIC_KEY', 'test')
+JWT_PUBLIC_KEY = env('JWT_PUBLIC_KEY', None)
+# Кэш проверенных токенов: размер и максимальное время жизни записи, если exp токена дальше
+JWT_CACHE_MAX_SIZE = env.int('JWT_CACHE_MAX_SIZE', 10000)
+JWT_CACHE_MAX_TTL_IN_SECONDS = env.int('JWT_CACHE_MAX_TTL_IN_SECONDS', 60 * 10)
+# Публичные ключи JWT: фоновое обновление, пауза между попытками при недоступности сервиса авторизации,
+# копия на диске для старта без него и сколько ждать ключ при старте, если копии нет.
+# Копия на диске выключена по умолчанию: путь должен вести в каталог, куда пишет только сервис
+JWT_KEY_REFRESH_IN_SECONDS = env.int('JWT_KEY_REFRESH_IN_SECONDS', 60 * 10)
+JWT_KEY_MIN_BACKOFF_IN_SECONDS = env.float('JWT_KEY_MIN_BACKOFF_IN_SECONDS', 1)
+JWT_KEY_MAX_BACKOFF_IN_SECONDS = env.float('JWT_KEY_MAX_BACKOFF_IN_SECONDS', 60)
+JWT_KEY_CACHE_PATH = env('JWT_KEY_CACHE_PATH', None)
+JWT_KEY_STARTUP_TIMEOUT_IN_SECONDS = env.float('JWT_KEY_STARTUP_TIMEOUT_IN_SECONDS', 10)
 
 SERVICE_URL = os.getenv('SERVICE_URL', 'http://127.0.0.1:8000/api/v1')
 
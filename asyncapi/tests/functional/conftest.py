@@ -27,6 +27,27 @@ def patch_indexes(monkeypatch):
     monkeypatch.setattr(settings, 'ELASTIC_INDEX_FILM', f'test_{settings.ELASTIC_INDEX_FILM}')
     monkeypatch.setattr(settings, 'ELASTIC_INDEX_GENRE', f'test_{settings.ELASTIC_INDEX_GENRE}')
     monkeypatch.setattr(settings, 'ELASTIC_INDEX_PERSON', f'test_{settings.ELASTIC_INDEX_PERSON}')
+    # сервиса авторизации в тестах нет, ключ JWT не ждем при старте приложения
+    monkeypatch.setattr(settings, 'JWT_KEY_STARTUP_TIMEOUT_IN_SECONDS', 0)
+
+
+@pytest.fixture
+async def restricted_film(es_client, patch_indexes):
+    """Фильм только для администраторов. Живет один тест, чтобы не менять выдачу остальных"""
+    film = {
+        'uuid': 'a1b2c3d4-0000-4000-8000-000000000003',
+        'title': 'Restricted Star Wars Cut',
+        'imdb_rating': 9.9,
+        'description': 'Фильм с доступом только для админов',
+        'genre': [],
+        'actors': [],
+        'writers': [],
+        'directors': [],
+        'permissions': 3,
+    }
+    await es_client.index(index=settings.ELASTIC_INDEX_FILM, id=film['uuid'], body=film, refresh=True)
+    yield film
+    await es_client.delete(index=settings.ELASTIC_INDEX_FILM, id=film['uuid'], refresh=True)
 
 
 @pytest.fixture(scope='session')
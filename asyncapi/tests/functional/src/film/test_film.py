@@ -1,3 +1,8 @@
+import json
+
+import settings
+
+
 async def test_film_list(
     test_client
 ) -> None:
@@ -10,6 +15,28 @@ async def test_film_list(
     assert len(response.json()) == 2
 
 
+async def test_film_list_cursor(
+    test_client
+) -> None:
+    """Тестирование выдачи списка фильмов по курсору до последней страницы"""
+    # Выполнение запроса
+    response = await test_client.get('/film', params={'page_size': 50})
+    assert response.status_code == 200
+    expected = [film['uuid'] for film in response.json()]
+
+    uuids = []
+    cursor = ''
+    while cursor is not None:
+        response = await test_client.get('/film', params={'page_size': 7, 'cursor': cursor})
+        assert response.status_code == 200
+        uuids += [film['uuid'] for film in response.json()]
+        cursor = response.headers.get('X-Next-Cursor')
+
+    # Проверка результата
+    assert len(uuids) == len(set(uuids))
+    assert sorted(uuids) == sorted(expected)
+
+
 async def test_film_filter(
     test_client
 ) -> None:
@@ -71,6 +98,20 @@ async def test_film_search(test_client):
     ]
 
 
+async def test_film_search_phase(test_client):
+    """Тестирование двухэтапного поиска: точная фраза находится без нечеткого поиска"""
+
+    # Выполнение запроса
+    exact_response = await test_client.get('/film/search', params={'query': 'star wars'})
+    fuzzy_response = await test_client.get('/film/search', params={'query': 'camp'})
+
+    # Проверка результата
+    assert exact_response.status_code == 200
+    assert exact_response.headers['x-search-phase'] == 'exact'
+    assert all('star wars' in film['title'].lower() for film in exact_response.json())
+    assert fuzzy_response.headers['x-search-phase'] == 'fuzzy'
+
+
 async def test_film_by_uuid(test_client):
     """Тестирование получения по конкретному UUID"""
 
@@ -167,3 +208,101 @@ async def test_cached(test_client):
 
     assert second_response.status_code == 200
     assert second_response.headers['x-cached'] == '1'
+
+
+async def test_cache_stats(test_client):
+    """Тестирование статистики двухуровневого кэша"""
+
+    # Выполнение запроса: второй запрос должен попасть в кэш в памяти воркера
+    await test_client.get('/film/273de788-81be-4460-9ca2-37f8635dcfd7/', params={})
+    await test_client.get('/film/273de788-81be-4460-9ca2-37f8635dcfd7/', params={})
+    response = await test_client.get('/cache/stats', params={})
+
+    # Проверка результата
+    assert response.status_code == 200
+    assert response.json()['local']['hits'] >= 1
+    assert set(response.json()['redis']) == {'hits', 'misses'}
+    assert {'hits', 'misses', 'hit_ratio', 'verify_avg_ms'} <= set(response.json()['jwt'])
+
+
+async def test_film_batch(test_client):
+    """Тестирование получения нескольких фильмов одним запросом"""
+
+    # Выполнение запроса: первый id не существует, второй повторяется
+    response = await test_client.get(
+        '/film/batch',
+        params={
+            'ids': '11111111-1111-1111-1111-012345678912,'
+                   '273de788-81be-4460-9ca2-37f8635dcfd7,'
+                   '2907029a-68d5-48af-8855-7de80101ee42,'
+                   '273de788-81be-4460-9ca2-37f8635dcfd7'
+        }
+    )
+
+    # Проверка результата
+    assert response.status_code == 200
+    assert [film['uuid'] for film in response.json()] == [
+        '273de788-81be-4460-9ca2-37f8635dcfd7',
+        '2907029a-68d5-48af-8855-7de80101ee42',
+    ]
+    assert response.json()[0]['title'] == 'Star Wars: Episode IV - A New Hope'
+
+
+async def test_film_batch_skips_restricted(test_client, restricted_film):
+    """Тестирование того, что фильм с ограниченным доступом не отдается анонимному пользователю"""
+
+    # Выполнение запроса
+    response = await test_client.get(
+        '/film/batch',
+        params={'ids': f'{restricted_film["uuid"]},273de788-81be-4460-9ca2-37f8635dcfd7'}
+    )
+
+    # Проверка результата
+    assert response.status_code == 200
+    assert [film['uuid'] for film in response.json()] == ['273de788-81be-4460-9ca2-37f8635dcfd7']
+
+
+async def test_film_export(test_client):
+    """Тестирование потоковой выгрузки каталога фильмов"""
+
+    # Выполнение запроса
+    response = await test_client.get('/film/export', params={})
+
+    # Проверка результата
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = response.text.splitlines()
+    assert len(lines) == 50
+    assert set(json.loads(lines[0])) == {'uuid', 'title', 'imdb_rating'}
+
+
+async def test_film_suggest(test_client, monkeypatch):
+    """Тестирование подсказок при наборе названия фильма"""
+    # по умолчанию кешируются только совсем короткие префиксы
+    monkeypatch.setattr(settings, 'SUGGEST_CACHE_MAX_PREFIX_LENGTH', 10)
+
+    # Выполнение запроса: второй одинаковый запрос должен попасть в кэш префиксов
+    first_response = await test_client.get('/film/suggest', params={'query': 'star wa', 'size': 3})
+    second_response = await test_client.get('/film/suggest', params={'query': 'Star  Wa', 'size': 3})
+
+    # Проверка результата
+    assert first_response.status_code == 200
+    assert len(first_response.json()) == 3
+    assert all('star wars' in film['title'].lower() for film in first_response.json())
+    assert set(first_response.json()[0]) == {'uuid', 'title'}
+    assert first_response.headers['x-cached'] == '0'
+    assert second_response.json() == first_response.json()
+    assert second_response.headers['x-cached'] == '1'
+
+
+async def test_film_export_skips_restricted(test_client, restricted_film):
+    """Тестирование того, что фильм с ограниченным доступом не выгружается анонимному пользователю"""
+
+    # Выполнение запроса
+    response = await test_client.get('/film/export', params={'full': 'true'})
+
+    # Проверка результата
+    assert response.status_code == 200
+    uuids = [json.loads(line)['uuid'] for line in response.text.splitlines()]
+    assert len(uuids) == 50
+    assert restricted_film['uuid'] not in uuids
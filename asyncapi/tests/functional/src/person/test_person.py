@@ -69,6 +69,23 @@ async def test_person_films(test_client):
     }]
 
 
+async def test_person_films_pagination(test_client):
+    """Тестирование постраничной выдачи фильмографии из кэша"""
+
+    # Выполнение запроса: у персоны один фильм, поэтому вторая страница пустая
+    first_page = await test_client.get(
+        '/person/d750da99-d533-4c17-a344-4bcb3a04163b/film/', params={'page_size': 1, 'page_number': 1}
+    )
+    second_page = await test_client.get(
+        '/person/d750da99-d533-4c17-a344-4bcb3a04163b/film/', params={'page_size': 1, 'page_number': 2}
+    )
+
+    # Проверка результата
+    assert first_page.status_code == 200
+    assert len(first_page.json()) == 1
+    assert second_page.status_code == 404
+
+
 async def test_fake_uuid(test_client):
     """Тестирование получения ошибки по фейковому UUID"""
 
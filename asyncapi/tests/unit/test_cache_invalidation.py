@@ -0,0 +1,129 @@
+import asyncio
+import contextlib
+from typing import List, Tuple
+
+import orjson
+import settings
+from db.storage import LRUStorage, TwoTierStorage
+from etl.main import changed_ids
+from models.film import Film
+from models.person_response import PersonResponse
+from services import cache_invalidation
+
+FILM_ID = '273de788-81be-4460-9ca2-37f8635dcfd7'
+OTHER_FILM_ID = '2907029a-68d5-48af-8855-7de80101ee42'
+PERSON_ID = 'ba2fbd08-691e-47b2-b0de-dc34f8c718a9'
+
+
+class FakePubSub:
+    def __init__(self, messages: List[dict]):
+        self.messages = messages
+        self.channels = []
+
+    async def __aenter__(self) -> 'FakePubSub':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def subscribe(self, channel: str) -> None:
+        self.channels.append(channel)
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        # дальше сообщений нет, соединение просто ждет
+        await asyncio.Event().wait()
+
+
+class FakeRedis:
+    def __init__(self, messages: List[dict] = None):
+        self.published: List[Tuple[str, bytes]] = []
+        self._pubsub = FakePubSub(messages or [])
+
+    async def publish(self, channel: str, data: bytes) -> None:
+        self.published.append((channel, data))
+
+    def pubsub(self) -> FakePubSub:
+        return self._pubsub
+
+
+async def make_storage() -> Tuple[TwoTierStorage, dict]:
+    """Кэш с фильмами и персоной в обоих уровнях. Возвращает кэш и ключи по id"""
+    storage = TwoTierStorage(local=LRUStorage(max_size=10, expire=60), remote=LRUStorage(max_size=10, expire=60))
+    keys = await storage.make_keys('film', Film, [FILM_ID, OTHER_FILM_ID])
+    keys.update(await storage.make_keys('person', PersonResponse, [PERSON_ID]))
+    for key in keys.values():
+        await storage.local.set(key, 'cached')
+        await storage.remote.set(key, 'cached')
+    return storage, keys
+
+
+def test_changed_ids_of_film_include_persons():
+    """Тестирование того, что запись фильма сбрасывает и его участников"""
+    records = [{'uuid': FILM_ID, 'actors': [{'uuid': PERSON_ID}], 'writers': None, 'directors': [{'uuid': PERSON_ID}]}]
+
+    # Проверка результата
+    assert changed_ids('film', records) == {'film': [FILM_ID], 'person': [PERSON_ID]}
+    assert changed_ids('genre', [{'uuid': FILM_ID}]) == {'genre': [FILM_ID]}
+
+
+async def test_publish_invalidation():
+    """Тестирование публикации id измененных объектов без пустых типов"""
+    redis = FakeRedis()
+
+    # Выполнение публикации
+    await cache_invalidation.publish_invalidation(redis, {'film': [FILM_ID], 'person': []})
+    await cache_invalidation.publish_invalidation(redis, {'person': []})
+
+    # Проверка результата
+    assert redis.published == [(settings.CACHE_INVALIDATION_CHANNEL, orjson.dumps({'film': [FILM_ID]}))]
+
+
+async def test_evict_removes_keys_from_both_tiers():
+    """Тестирование удаления измененных объектов из Redis и из памяти воркера"""
+    storage, keys = await make_storage()
+
+    # Выполнение сброса
+    await cache_invalidation._evict(storage, orjson.dumps({'film': [FILM_ID], 'person': [PERSON_ID]}))
+
+    # Проверка результата
+    for id in (FILM_ID, PERSON_ID):
+        assert await storage.local.get(keys[id]) is None
+        assert await storage.remote.get(keys[id]) is None
+    assert await storage.local.get(keys[OTHER_FILM_ID]) == 'cached'
+    assert await storage.remote.get(keys[OTHER_FILM_ID]) == 'cached'
+
+
+async def test_evict_skips_malformed_message():
+    """Тестирование того, что битое сообщение ничего не сбрасывает"""
+    storage, keys = await make_storage()
+
+    # Выполнение сброса
+    await cache_invalidation._evict(storage, b'not json')
+
+    # Проверка результата
+    assert await storage.remote.get(keys[FILM_ID]) == 'cached'
+
+
+async def test_listen_invalidations():
+    """Тестирование подписки: кэш в памяти сбрасывается при подписке, а объекты из сообщений - в обоих уровнях"""
+    storage, keys = await make_storage()
+    redis = FakeRedis(messages=[
+        {'type': 'subscribe', 'data': 1},
+        {'type': 'message', 'data': orjson.dumps({'film': [FILM_ID]})},
+    ])
+
+    # Выполнение подписки
+    listener = asyncio.ensure_future(cache_invalidation.listen_invalidations(redis, storage))
+    for _ in range(10):
+        await asyncio.sleep(0)
+    listener.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await listener
+
+    # Проверка результата
+    assert redis.pubsub().channels == [settings.CACHE_INVALIDATION_CHANNEL]
+    assert await storage.local.get(keys[OTHER_FILM_ID]) is None
+    assert await storage.remote.get(keys[FILM_ID]) is None
+    assert await storage.remote.get(keys[OTHER_FILM_ID]) == 'cached'
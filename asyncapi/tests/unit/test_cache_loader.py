@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+
+import settings
+from db.storage import CacheEntry, LRUStorage, TwoTierStorage
+from models.genre import Genre
+from services import cache_loader
+
+GENRE = Genre(uuid='6c162475-c7ed-4461-9184-001ef3d9f26e', name='Comedy')
+
+
+def make_loader(result=GENRE, delay: float = 0.01):
+    calls = []
+
+    async def from_db():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result
+    return from_db, calls
+
+
+async def test_concurrent_misses_share_one_load():
+    """Тестирование одного запроса в базу на все одновременные промахи по ключу"""
+    storage = LRUStorage(max_size=10, expire=60)
+    from_db, calls = make_loader()
+
+    # Выполнение запроса
+    results = await asyncio.gather(*(
+        cache_loader.get_or_load('genre', GENRE.uuid, storage, Genre, from_db) for _ in range(5)
+    ))
+
+    # Проверка результата
+    assert len(calls) == 1
+    assert all(item == GENRE and cached == '0' for item, cached in results)
+
+
+async def test_hit_does_not_load():
+    """Тестирование отдачи свежей записи из кэша без запроса в базу"""
+    storage = LRUStorage(max_size=10, expire=60)
+    from_db, calls = make_loader()
+    await cache_loader.get_or_load('genre', GENRE.uuid, storage, Genre, from_db)
+
+    # Выполнение запроса
+    item, cached = await cache_loader.get_or_load('genre', GENRE.uuid, storage, Genre, from_db)
+
+    # Проверка результата
+    assert item == GENRE
+    assert cached == '1'
+    assert len(calls) == 1
+
+
+async def test_not_found_is_not_cached():
+    """Тестирование того, что отсутствующий в базе объект не попадает в кэш"""
+    storage = LRUStorage(max_size=10, expire=60)
+    from_db, calls = make_loader(result=None)
+
+    # Выполнение запроса
+    await cache_loader.get_or_load('genre', GENRE.uuid, storage, Genre, from_db)
+    item, cached = await cache_loader.get_or_load('genre', GENRE.uuid, storage, Genre, from_db)
+
+    # Проверка результата
+    assert item is None
+    assert cached == '0'
+    assert len(calls) == 2
+
+
+async def test_stale_entry_is_served_and_refreshed_in_background():
+    """Тестирование stale-while-revalidate: устаревшая запись отдается сразу, а обновляется в фоне"""
+    storage = LRUStorage(max_size=10, expire=60)
+    key = await storage.make_key('genre', Genre, GENRE.uuid)
+    old = Genre(uuid=GENRE.uuid, name='Old')
+    await storage.set_entry(key, CacheEntry(item=old, computed_at=time.time() - 100, expire=10), stale_expire=600)
+    from_db, calls = make_loader()
+
+    # Выполнение запроса
+    item, cached = await cache_loader.get_or_load('genre', GENRE.uuid, storage, Genre, from_db)
+    await asyncio.gather(*cache_loader._background_refreshes)
+
+    # Проверка результата
+    assert item == old
+    assert cached == '1'
+    assert len(calls) == 1
+    assert (await storage.get_item(key, Genre)) == GENRE
+
+
+async def test_early_refresh(monkeypatch):
+    """Тестирование XFetch: свежая запись обновляется заранее, если выпал ранний срок"""
+    storage = LRUStorage(max_size=10, expire=60)
+    key = await storage.make_key('genre', Genre, GENRE.uuid)
+    await storage.set_entry(key, CacheEntry(item=GENRE, computed_at=time.time(), delta=1, expire=5))
+    from_db, calls = make_loader()
+
+    # Выполнение запроса: при random() близком к 1 ранний срок -ln(1 - random()) огромен
+    monkeypatch.setattr(random, 'random', lambda: 1 - 1e-12)
+    await cache_loader.get_or_load('genre', GENRE.uuid, storage, Genre, from_db)
+    await asyncio.gather(*cache_loader._background_refreshes)
+
+    # Проверка результата
+    assert len(calls) == 1
+
+
+async def test_fresh_entry_is_not_refreshed_early(monkeypatch):
+    """Тестирование XFetch: далеко до окончания срока свежести запись не обновляется"""
+    storage = LRUStorage(max_size=10, expire=60)
+    key = await storage.make_key('genre', Genre, GENRE.uuid)
+    await storage.set_entry(key, CacheEntry(item=GENRE, computed_at=time.time(), delta=0.01, expire=60))
+    from_db, calls = make_loader()
+
+    # Выполнение запроса
+    monkeypatch.setattr(random, 'random', lambda: 0.5)
+    await cache_loader.get_or_load('genre', GENRE.uuid, storage, Genre, from_db)
+
+    # Проверка результата
+    assert not cache_loader._background_refreshes
+    assert len(calls) == 0
+
+
+async def test_lock_rechecks_shared_tier(monkeypatch):
+    """
+    Тестирование повторной проверки кэша после ожидания блокировки: в памяти воркера старая копия,
+    а другой воркер уже положил в Redis свежую - в базу не идем
+    """
+    monkeypatch.setattr(settings, 'CACHE_LOCK_ENABLED', True)
+    remote = LRUStorage(max_size=10, expire=60)
+    local = LRUStorage(max_size=10, expire=60)
+    storage = TwoTierStorage(local=local, remote=remote)
+    key = await storage.make_key('genre', Genre, GENRE.uuid)
+    old = Genre(uuid=GENRE.uuid, name='Old')
+    computed_after = time.time() - 100
+    await local.set_entry(key, CacheEntry(item=old, computed_at=computed_after, expire=10))
+    await remote.set_entry(key, CacheEntry(item=GENRE, computed_at=time.time(), expire=60))
+    from_db, calls = make_loader()
+
+    # Выполнение запроса
+    entry = await cache_loader._load(key, storage, Genre, from_db, 60, computed_after=computed_after)
+
+    # Проверка результата
+    assert entry.item == GENRE
+    assert len(calls) == 0
+    assert (await local.get_item(key, Genre)) == GENRE
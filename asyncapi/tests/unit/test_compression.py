@@ -0,0 +1,92 @@
+import json
+
+import pytest
+import settings
+import zstandard
+from db import compression
+
+FILM = json.dumps({
+    'uuid': '273de788-81be-4460-9ca2-37f8635dcfd7',
+    'title': 'Star Wars: Episode IV - A New Hope',
+    'description': 'The Imperial Forces, under orders from cruel Darth Vader, hold Princess Leia hostage. ' * 10,
+    'genre': [{'uuid': '47392fcb-82e5-4ca3-b01f-aaa9cb96d2a2', 'name': 'Action'}],
+}).encode()
+
+
+def make_samples(prefix: str) -> list:
+    return [
+        json.dumps({
+            'uuid': f'{prefix}-{number}',
+            'title': f'{prefix} title {number}',
+            'genre': [{'name': 'Action'}, {'name': 'Sci-Fi'}, {'name': prefix}],
+            'imdb_rating': number % 10,
+        }).encode()
+        for number in range(1000)
+    ]
+
+
+@pytest.fixture(autouse=True)
+def compression_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_COMPRESSION_ENABLED', True)
+    monkeypatch.setattr(settings, 'CACHE_COMPRESSION_MIN_SIZE', 512)
+    monkeypatch.setattr(compression, 'dictionary', None)
+
+
+def train(prefix: str) -> zstandard.ZstdCompressionDict:
+    return zstandard.ZstdCompressionDict(compression.train_dictionary(make_samples(prefix), size=4096))
+
+
+def test_small_value_is_stored_raw():
+    """Тестирование того, что короткое значение хранится без сжатия"""
+    value = compression.compress(b'{"uuid": "1"}')
+
+    # Проверка результата
+    assert value[:1] == compression.RAW
+    assert compression.decompress(value) == b'{"uuid": "1"}'
+
+
+def test_compressed_without_dictionary():
+    """Тестирование сжатия без словаря"""
+    value = compression.compress(FILM)
+
+    # Проверка результата
+    assert value[:1] == compression.ZSTD
+    assert len(value) < len(FILM)
+    assert compression.decompress(value) == FILM
+
+
+def test_compressed_with_dictionary(monkeypatch):
+    """Тестирование сжатия со словарем"""
+    monkeypatch.setattr(compression, 'dictionary', train('film'))
+    value = compression.compress(FILM)
+
+    # Проверка результата
+    assert value[:1] == compression.ZSTD_DICT
+    assert compression.decompress(value) == FILM
+
+
+def test_dictionary_mismatch_is_a_miss(monkeypatch):
+    """Тестирование того, что значение, сжатое другим словарем или без словаря у воркера, считается промахом"""
+    monkeypatch.setattr(compression, 'dictionary', train('film'))
+    value = compression.compress(FILM)
+
+    # Выполнение запроса: у воркера другой словарь, затем словаря нет совсем
+    monkeypatch.setattr(compression, 'dictionary', train('other'))
+    other_dictionary = compression.decompress(value)
+    monkeypatch.setattr(compression, 'dictionary', None)
+    no_dictionary = compression.decompress(value)
+
+    # Проверка результата
+    assert other_dictionary is None
+    assert no_dictionary is None
+
+
+def test_corrupted_value_is_a_miss():
+    """Тестирование того, что испорченное сжатое значение считается промахом"""
+    assert compression.decompress(compression.ZSTD + b'not zstd') is None
+
+
+def test_legacy_value_without_header():
+    """Тестирование чтения значений, записанных до появления заголовков"""
+    assert compression.decompress(FILM) == FILM
+    assert compression.decompress(None) is None
@@ -0,0 +1,205 @@
+import asyncio
+import uuid
+from typing import Dict, List
+
+from etl import loader
+from etl.checkpoint import Checkpoint
+from etl.loader import BulkLoader
+from models.genre import Genre
+
+from elasticsearch.serializer import JSONSerializer
+
+
+class FakeTransport:
+    serializer = JSONSerializer()
+
+
+class FakeElasticsearch:
+    """
+    Клиент эластика для async_streaming_bulk: statuses - коды ответа на документ по попыткам (по умолчанию 201),
+    delays - задержка ответа на пачку, которая начинается с документа
+    """
+
+    transport = FakeTransport()
+
+    def __init__(self, statuses: Dict[str, List[int]] = None, delays: Dict[str, float] = None):
+        self.statuses = statuses or {}
+        self.delays = delays or {}
+        self.indexed: List[str] = []
+        self.attempts: Dict[str, int] = {}
+
+    async def bulk(self, body: str, *args, **kwargs) -> dict:
+        lines = [self.transport.serializer.loads(line) for line in body.splitlines()]
+        ids = [line['index']['_id'] for line in lines[::2]]
+        await asyncio.sleep(self.delays.get(ids[0], 0))
+
+        items = []
+        for _id in ids:
+            attempt = self.attempts.get(_id, 0)
+            self.attempts[_id] = attempt + 1
+            statuses = self.statuses.get(_id, [])
+            status = statuses[attempt] if attempt < len(statuses) else 201
+            item = {'_id': _id, 'status': status}
+            if status >= 300:
+                item['error'] = {'type': 'es_rejected_execution_exception' if status == 429 else 'mapper_exception'}
+            else:
+                self.indexed.append(_id)
+            items.append({'index': item})
+        return {'errors': any('error' in item['index'] for item in items), 'items': items}
+
+
+class MemoryCheckpoint(Checkpoint):
+    def __init__(self):
+        super().__init__(None, source='source.json', index='genres')
+        self.saved: List[int] = []
+
+    def save(self, offset: int) -> None:
+        self.saved.append(offset)
+
+
+def make_records(count: int) -> List[dict]:
+    return [{'uuid': str(uuid.UUID(int=number + 1)), 'name': f'genre {number}'} for number in range(count)]
+
+
+def make_loader(es_client, checkpoint, **kwargs) -> BulkLoader:
+    return BulkLoader(es_client, 'genres', Genre, checkpoint, initial_backoff=0, **kwargs)
+
+
+async def test_load_all_records():
+    """Тестирование загрузки всех записей и контрольной точки после каждой пачки"""
+    es_client = FakeElasticsearch()
+    checkpoint = MemoryCheckpoint()
+
+    # Выполнение загрузки
+    stats = await make_loader(es_client, checkpoint, chunk_size=10, concurrency=1).load(make_records(25))
+
+    # Проверка результата
+    assert stats.indexed == 25
+    assert stats.committed == 25
+    assert checkpoint.saved == [10, 20, 25]
+    assert len(es_client.indexed) == 25
+
+
+async def test_out_of_order_chunks():
+    """Тестирование контрольной точки, когда вторая пачка записалась раньше первой"""
+    records = make_records(20)
+    es_client = FakeElasticsearch(delays={records[0]['uuid']: 0.05})
+    checkpoint = MemoryCheckpoint()
+
+    # Выполнение загрузки
+    stats = await make_loader(es_client, checkpoint, chunk_size=10, concurrency=2).load(records)
+
+    # Проверка результата: вторая пачка не сдвигает точку, пока не записана первая
+    assert es_client.indexed.index(records[10]['uuid']) < es_client.indexed.index(records[0]['uuid'])
+    assert checkpoint.saved == [20]
+    assert stats.committed == 20
+
+
+async def test_failed_document_holds_checkpoint():
+    """Тестирование того, что пачка с незаписанным документом не сдвигает контрольную точку"""
+    records = make_records(30)
+    es_client = FakeElasticsearch(statuses={records[15]['uuid']: [400]})
+    checkpoint = MemoryCheckpoint()
+
+    # Выполнение загрузки
+    stats = await make_loader(es_client, checkpoint, chunk_size=10, concurrency=1).load(records)
+
+    # Проверка результата: записаны и следующие пачки, но точка остается перед пачкой с ошибкой
+    assert stats.indexed == 29
+    assert stats.failed == 1
+    assert stats.failed_ids == [records[15]['uuid']]
+    assert stats.committed == 10
+    assert checkpoint.saved == [10]
+
+
+async def test_rejected_document_is_retried():
+    """Тестирование повтора документа, отклоненного эластиком с 429"""
+    records = make_records(5)
+    es_client = FakeElasticsearch(statuses={records[2]['uuid']: [429, 429]})
+    checkpoint = MemoryCheckpoint()
+
+    # Выполнение загрузки
+    stats = await make_loader(es_client, checkpoint, chunk_size=10, max_retries=3).load(records)
+
+    # Проверка результата
+    assert es_client.attempts[records[2]['uuid']] == 3
+    assert stats.indexed == 5
+    assert stats.failed == 0
+    assert checkpoint.saved == [5]
+
+
+async def test_rejected_document_fails_after_retries():
+    """Тестирование документа, который эластик отклоняет дольше, чем разрешено повторов"""
+    records = make_records(5)
+    es_client = FakeElasticsearch(statuses={records[2]['uuid']: [429, 429, 429]})
+    checkpoint = MemoryCheckpoint()
+
+    # Выполнение загрузки
+    stats = await make_loader(es_client, checkpoint, chunk_size=10, max_retries=1).load(records)
+
+    # Проверка результата
+    assert stats.failed_ids == [records[2]['uuid']]
+    assert checkpoint.saved == []
+
+
+async def test_invalid_records_are_skipped_but_counted_in_offset():
+    """Тестирование того, что не прошедшие проверку записи пропускаются, а контрольная точка их учитывает"""
+    records = make_records(10)
+    records[3] = {'uuid': 'not-a-uuid', 'name': 'broken'}
+    checkpoint = MemoryCheckpoint()
+
+    # Выполнение загрузки
+    stats = await make_loader(FakeElasticsearch(), checkpoint, chunk_size=10).load(records)
+
+    # Проверка результата
+    assert stats.invalid == 1
+    assert stats.indexed == 9
+    assert checkpoint.saved == [10]
+
+
+async def test_resume_from_checkpoint(tmp_path):
+    """Тестирование продолжения загрузки с сохраненной контрольной точки"""
+    records = make_records(25)
+    path = tmp_path / 'checkpoint.json'
+    Checkpoint(path, source='source.json', index='genres').save(20)
+    checkpoint = Checkpoint(path, source='source.json', index='genres')
+    es_client = FakeElasticsearch()
+
+    # Выполнение загрузки: источник уже пропустил первые start записей
+    start = checkpoint.load()
+    stats = await make_loader(es_client, checkpoint, chunk_size=10).load(records[start:], start)
+
+    # Проверка результата
+    assert start == 20
+    assert es_client.indexed == [record['uuid'] for record in records[20:]]
+    assert stats.committed == 25
+    assert Checkpoint(path, source='source.json', index='genres').load() == 25
+
+
+def test_checkpoint_of_another_load_is_ignored(tmp_path):
+    """Тестирование того, что контрольная точка другого источника не используется"""
+    path = tmp_path / 'checkpoint.json'
+    Checkpoint(path, source='other.json', index='genres').save(20)
+
+    # Проверка результата
+    assert Checkpoint(path, source='source.json', index='genres').load() == 0
+
+
+async def test_stream_bulk_is_called_per_chunk(monkeypatch):
+    """Тестирование того, что каждая пачка отправляется отдельным вызовом async_streaming_bulk"""
+    calls = []
+
+    async def fake_streaming_bulk(client, actions, **kwargs):
+        calls.append([action['_id'] for action in actions])
+        return
+        yield
+
+    monkeypatch.setattr(loader, 'async_streaming_bulk', fake_streaming_bulk)
+    checkpoint = MemoryCheckpoint()
+
+    # Выполнение загрузки
+    await make_loader(None, checkpoint, chunk_size=4, concurrency=2).load(make_records(10))
+
+    # Проверка результата
+    assert sorted(len(ids) for ids in calls) == [2, 4, 4]
+    assert checkpoint.saved[-1] == 10
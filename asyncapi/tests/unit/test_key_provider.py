@@ -0,0 +1,176 @@
+import asyncio
+import os
+from typing import List
+
+import orjson
+import pytest
+from security import key_provider
+from security.key_provider import DEFAULT_KID, PublicKeyProvider
+
+
+class FakeResponse:
+    def __init__(self, body: dict):
+        self.body = body
+
+    async def __aenter__(self) -> 'FakeResponse':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    def raise_for_status(self) -> None:
+        pass
+
+    async def json(self) -> dict:
+        return self.body
+
+
+class FakeSession:
+    """Сервис авторизации: отдает ответы по очереди, последний - на все следующие запросы"""
+
+    def __init__(self, *bodies: dict):
+        self.bodies = list(bodies)
+        self.requests = 0
+
+    def get(self, url: str) -> FakeResponse:
+        self.requests += 1
+        return FakeResponse(self.bodies.pop(0) if len(self.bodies) > 1 else self.bodies[0])
+
+
+def make_provider(cache_path: str = None, session: FakeSession = None) -> PublicKeyProvider:
+    provider = PublicKeyProvider(
+        url='http://auth/public_key',
+        static_key=None,
+        cache_path=cache_path,
+        refresh_interval=600,
+        min_backoff=1,
+        max_backoff=8,
+    )
+    provider._session = session
+    return provider
+
+
+async def test_single_key_response():
+    """Тестирование ответа с одним ключом"""
+    provider = make_provider(session=FakeSession({'public_key': 'key-1', 'kid': 'k1'}))
+
+    # Выполнение запроса
+    await provider.refresh()
+
+    # Проверка результата
+    assert provider.keys == {'k1': 'key-1'}
+    assert provider.get() == 'key-1'
+    assert provider.get('k1') == 'key-1'
+
+
+async def test_key_set_response():
+    """Тестирование ответа с набором ключей: текущий ключ проверяет токены без kid, старый - токены со своим kid"""
+    provider = make_provider(session=FakeSession({
+        'keys': [{'kid': 'k1', 'public_key': 'key-1'}, {'kid': 'k2', 'public_key': 'key-2'}],
+        'current': 'k2',
+    }))
+
+    # Выполнение запроса
+    await provider.refresh()
+
+    # Проверка результата
+    assert provider.get() == 'key-2'
+    assert provider.get('k1') == 'key-1'
+
+
+async def test_key_set_without_current_uses_last_key():
+    """Тестирование набора ключей без current: текущим считается последний"""
+    provider = make_provider(session=FakeSession({'keys': [{'kid': 'k1', 'public_key': 'key-1'}, {'public_key': 'key-2'}]}))
+
+    # Выполнение запроса
+    await provider.refresh()
+
+    # Проверка результата
+    assert provider.current_kid == DEFAULT_KID
+    assert provider.get() == 'key-2'
+
+
+async def test_unknown_kid_requests_refresh(monkeypatch):
+    """Тестирование внепланового обновления из-за незнакомого kid не чаще UNKNOWN_KID_REFRESH_INTERVAL"""
+    monkeypatch.setattr(key_provider, 'UNKNOWN_KID_REFRESH_INTERVAL', 30)
+    provider = make_provider()
+    provider._set_keys({'k1': 'key-1'}, 'k1')
+
+    # Выполнение запроса: знакомый kid не будит обновление, незнакомый - будит, но только раз за интервал
+    assert provider.get('k1') == 'key-1'
+    assert not provider._wake.is_set()
+    assert provider.get('k2') is None
+    assert provider._wake.is_set()
+    provider._wake.clear()
+    provider.get('k3')
+
+    # Проверка результата
+    assert not provider._wake.is_set()
+
+
+async def test_static_key_is_never_refreshed():
+    """Тестирование ключа из настроек: он используется всегда, а обновление не запрашивается"""
+    provider = PublicKeyProvider('http://auth/public_key', 'static', None, 600, 1, 8)
+
+    # Проверка результата
+    assert provider.get() == 'static'
+    assert provider.get('k2') is None
+    assert not provider._wake.is_set()
+
+
+async def test_backoff_when_auth_is_unavailable(monkeypatch):
+    """Тестирование растущей паузы между попытками, пока сервис авторизации недоступен, и её сброса после ответа"""
+    provider = make_provider()
+    results = [Exception('unavailable')] * 5 + [None]
+    delays: List[float] = []
+
+    async def refresh():
+        result = results.pop(0)
+        if result is not None:
+            raise result
+
+    async def fake_wait_for(awaitable, timeout):
+        awaitable.close()
+        delays.append(timeout)
+        if not results:
+            raise asyncio.CancelledError
+        raise asyncio.TimeoutError
+
+    monkeypatch.setattr(provider, 'refresh', refresh)
+    monkeypatch.setattr(key_provider.asyncio, 'wait_for', fake_wait_for)
+
+    # Выполнение обновления
+    with pytest.raises(asyncio.CancelledError):
+        await provider._refresh_periodically()
+
+    # Проверка результата
+    assert delays == [1, 2, 4, 8, 8, 600]
+
+
+async def test_keys_are_saved_and_loaded_from_disk(tmp_path):
+    """Тестирование старта с копией ключей на диске без обращения к сервису авторизации"""
+    path = str(tmp_path / 'keys.json')
+    provider = make_provider(cache_path=path, session=FakeSession({'public_key': 'key-1', 'kid': 'k1'}))
+    await provider.refresh()
+
+    # Выполнение загрузки
+    restarted = make_provider(cache_path=path)
+    restarted._load_from_disk()
+
+    # Проверка результата
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    assert restarted.get('k1') == 'key-1'
+
+
+async def test_writable_by_others_file_is_ignored(tmp_path):
+    """Тестирование того, что копии ключей, которую мог подменить другой пользователь, не доверяем"""
+    path = tmp_path / 'keys.json'
+    path.write_bytes(orjson.dumps({'keys': {'k1': 'forged'}, 'current': 'k1'}))
+    path.chmod(0o666)
+    provider = make_provider(cache_path=str(path))
+
+    # Выполнение загрузки
+    provider._load_from_disk()
+
+    # Проверка результата
+    assert provider.keys == {}
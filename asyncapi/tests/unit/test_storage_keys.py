@@ -0,0 +1,92 @@
+from typing import Optional
+
+from db import storage as storage_module
+from db.storage import LRUStorage, RedisStorage, TwoTierStorage, model_version
+from models.genre import Genre
+from pydantic import BaseModel
+from services.cache_invalidation import flush
+
+GENRE_ID = '6c162475-c7ed-4461-9184-001ef3d9f26e'
+
+
+class FakeRedis:
+    """Счетчики поколений в памяти вместо Redis"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.data.get(key)
+
+    async def incr(self, key: str) -> int:
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+
+def make_storage(monkeypatch) -> TwoTierStorage:
+    # поколения, прочитанные другими тестами, не должны попасть в этот
+    monkeypatch.setattr(storage_module, '_generations', {})
+    return TwoTierStorage(local=LRUStorage(max_size=10, expire=60), remote=RedisStorage(FakeRedis()))
+
+
+async def test_key_format(monkeypatch):
+    """Тестирование формата ключа: пространство, версия схемы, поколение и id"""
+    storage = make_storage(monkeypatch)
+
+    # Проверка результата
+    assert await storage.make_key('genre', Genre, GENRE_ID) == f'genre:v{model_version(Genre)}:g0:{GENRE_ID}'
+    assert await storage.make_keys('genre', Genre, [GENRE_ID]) == {
+        GENRE_ID: f'genre:v{model_version(Genre)}:g0:{GENRE_ID}'
+    }
+
+
+async def test_flush_makes_earlier_keys_unreachable(monkeypatch):
+    """Тестирование того, что после смены поколения записи со старыми ключами больше не читаются"""
+    storage = make_storage(monkeypatch)
+    key = await storage.make_key('film', Genre, GENRE_ID)
+    await storage.local.set(key, 'cached')
+
+    # Выполнение сброса
+    await flush(storage, 'film')
+    new_key = await storage.make_key('film', Genre, GENRE_ID)
+
+    # Проверка результата
+    assert new_key != key
+    assert new_key.split(':')[2] == 'g1'
+    assert await storage.local.get(new_key) is None
+    # пространства других сущностей не затронуты
+    assert (await storage.make_key('genre', Genre, GENRE_ID)).split(':')[2] == 'g0'
+
+
+async def test_generation_is_shared_between_workers(monkeypatch):
+    """Тестирование того, что другой воркер видит новое поколение после окончания срока его копии"""
+    redis = FakeRedis()
+    monkeypatch.setattr(storage_module, '_generations', {})
+    await RedisStorage(redis).bump_generation('film')
+
+    # Выполнение запроса: копия поколения в памяти этого воркера устарела
+    monkeypatch.setattr(storage_module, '_generations', {'film': (0, 0)})
+    generation = await RedisStorage(redis).get_generation('film')
+
+    # Проверка результата
+    assert generation == 1
+
+
+def test_schema_change_changes_model_version():
+    """Тестирование того, что изменение полей модели меняет сегмент v<hash> ключа"""
+
+    class Item(BaseModel):
+        uuid: str
+        name: str
+
+    version = model_version(Item)
+
+    # Выполнение изменения схемы: та же модель с новым полем
+    class Item(BaseModel):  # noqa: F811
+        uuid: str
+        name: str
+        rating: Optional[float]
+
+    # Проверка результата
+    assert model_version(Item) != version
+    assert model_version(Genre) == model_version(Genre)
@@ -1,5 +1,6 @@
 from . import asyncapi
 from . import authapi
+from . import stats
 from . import voice_assistant
 
-__all__ = [asyncapi, authapi, voice_assistant]
+__all__ = [asyncapi, authapi, stats, voice_assistant]
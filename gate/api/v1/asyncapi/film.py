@@ -1,14 +1,14 @@
 from typing import List
 
-from aiohttp import ClientSession
 from core import context_logger
 from core.logger_route import LoggerRoute
-from fastapi import APIRouter
-from fastapi.responses import ORJSONResponse
+from fastapi import APIRouter, Depends
 from models.asyncapi.film import Film
-from security.security import jwt_permissions_required
-from settings import ASYNC_API_URL
+from security.security import get_permissions
+from services.proxy import proxy
+from services.upstreams import ASYNC_API
 from starlette.requests import Request
+from starlette.responses import Response
 
 logger = context_logger.get(__name__)
 
@@ -23,14 +23,8 @@ router = APIRouter(route_class=LoggerRoute)
     description='Детальная информация о фильме',
     response_description='Название, рейтинг, описание фильма и список участников'
 )
-async def film_details(film_id: str, request: Request) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.get(
-        url=ASYNC_API_URL + f'/film/{film_id}/',
-        params=request.query_params,
-        headers=request.headers
-    ) as resp:
-        return ORJSONResponse(content=await resp.json())
+async def film_details(film_id: str, request: Request) -> Response:
+    return await proxy(request, 'GET', ASYNC_API, f'/film/{film_id}/', params=request.query_params, cacheable=True)
 
 
 @router.get(
@@ -40,12 +34,6 @@ async def film_details(film_id: str, request: Request) -> ORJSONResponse:
     description='Детальная информация о фильмах с доступом',
     response_description='Просмотреть список фильмов с различным доступом'
 )
-@jwt_permissions_required(response_model=List[Film])
-async def security_films(request: Request) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.get(
-        url=ASYNC_API_URL + f'/security_films/',
-        params=request.query_params,
-        headers=request.headers
-    ) as resp:
-        return await resp.json()
+async def security_films(request: Request, permissions: int = Depends(get_permissions)) -> Response:
+    # недоступные фильмы отсекает asyncapi, здесь токен только проверяется, чтобы не гонять запрос с плохим токеном
+    return await proxy(request, 'GET', ASYNC_API, '/security_films/', params=request.query_params)
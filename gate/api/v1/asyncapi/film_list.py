@@ -1,14 +1,15 @@
 from typing import List
 
-from aiohttp import ClientSession
 from core import context_logger
 from core.logger_route import LoggerRoute
 from fastapi import APIRouter, Depends
-from fastapi.responses import ORJSONResponse
 from models.asyncapi.film_response import FilmResponse
+from security.security import get_permissions
 from schemas.film_list import FilmFilterRequest, FilmSearchRequest
-from settings import ASYNC_API_URL
+from services.proxy import proxy
+from services.upstreams import ASYNC_API
 from starlette.requests import Request
+from starlette.responses import Response
 
 logger = context_logger.get(__name__)
 
@@ -25,10 +26,9 @@ router = APIRouter(route_class=LoggerRoute)
 async def film_list_with_filter(
     request: Request,
     model: FilmFilterRequest = Depends(),
-) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.get(url=ASYNC_API_URL + '/film', params=request.query_params, headers=request.headers) as resp:
-        return ORJSONResponse(content=await resp.json())
+    permissions: int = Depends(get_permissions),
+) -> Response:
+    return await proxy(request, 'GET', ASYNC_API, '/film', params=request.query_params, cacheable=True)
 
 
 @router.get(
@@ -41,11 +41,6 @@ async def film_list_with_filter(
 async def film_search(
     request: Request,
     model: FilmSearchRequest = Depends(),
-) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.get(
-        url=ASYNC_API_URL + '/film/search',
-        params=request.query_params,
-        headers=request.headers
-    ) as resp:
-        return ORJSONResponse(content=await resp.json())
+    permissions: int = Depends(get_permissions),
+) -> Response:
+    return await proxy(request, 'GET', ASYNC_API, '/film/search', params=request.query_params, cacheable=True)
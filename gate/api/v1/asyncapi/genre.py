@@ -1,10 +1,10 @@
-from aiohttp import ClientSession
 from core import context_logger
 from fastapi import APIRouter
-from fastapi.responses import ORJSONResponse
 from models.asyncapi.genre import Genre
-from settings import ASYNC_API_URL
+from services.proxy import proxy
+from services.upstreams import ASYNC_API
 from starlette.requests import Request
+from starlette.responses import Response
 
 logger = context_logger.get(__name__)
 
@@ -20,11 +20,5 @@ router = APIRouter()
 async def genre_details(
     request: Request,
     genre_id: str,
-) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.get(
-        url=ASYNC_API_URL + f'/genre/{genre_id}/',
-        params=request.query_params,
-        headers=request.headers
-    ) as resp:
-        return ORJSONResponse(content=await resp.json())
+) -> Response:
+    return await proxy(request, 'GET', ASYNC_API, f'/genre/{genre_id}/', params=request.query_params, cacheable=True)
@@ -1,13 +1,13 @@
 from typing import List
 
-from aiohttp import ClientSession
 from core import context_logger
 from fastapi import APIRouter
-from fastapi.responses import ORJSONResponse
 from models.asyncapi.film_response import FilmResponse
 from models.asyncapi.person_response import PersonResponse
-from settings import ASYNC_API_URL
+from services.proxy import proxy
+from services.upstreams import ASYNC_API
 from starlette.requests import Request
+from starlette.responses import Response
 
 logger = context_logger.get(__name__)
 
@@ -24,14 +24,8 @@ router = APIRouter()
 async def person_details(
     person_id: str,
     request: Request,
-) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.get(
-        url=ASYNC_API_URL + f'/person/{person_id}/',
-        params=request.query_params,
-        headers=request.headers
-    ) as resp:
-        return ORJSONResponse(content=await resp.json())
+) -> Response:
+    return await proxy(request, 'GET', ASYNC_API, f'/person/{person_id}/', params=request.query_params, cacheable=True)
 
 
 @router.get(
@@ -45,11 +39,5 @@ async def person_details(
 async def person_films(
     person_id: str,
     request: Request,
-) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.get(
-        url=ASYNC_API_URL + f'/person/{person_id}/film/',
-        params=request.query_params,
-        headers=request.headers
-    ) as resp:
-        return ORJSONResponse(content=await resp.json())
+) -> Response:
+    return await proxy(request, 'GET', ASYNC_API, f'/person/{person_id}/film/', params=request.query_params, cacheable=True)
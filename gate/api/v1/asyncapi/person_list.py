@@ -1,13 +1,13 @@
 from typing import List
 
-from aiohttp import ClientSession
 from core import context_logger
 from fastapi import APIRouter, Depends
-from fastapi.responses import ORJSONResponse
 from models.asyncapi.person_response import PersonResponse
 from schemas.person_list import PersonSearchRequest
-from settings import ASYNC_API_URL
+from services.proxy import proxy
+from services.upstreams import ASYNC_API
 from starlette.requests import Request
+from starlette.responses import Response
 
 logger = context_logger.get(__name__)
 
@@ -24,11 +24,5 @@ router = APIRouter()
 async def person_details(
     request: Request,
     model: PersonSearchRequest = Depends(),
-) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.get(
-        url=ASYNC_API_URL + f'/person/search',
-        params=request.query_params,
-        headers=request.headers
-    ) as resp:
-        return ORJSONResponse(content=await resp.json())
+) -> Response:
+    return await proxy(request, 'GET', ASYNC_API, '/person/search', params=request.query_params, cacheable=True)
@@ -0,0 +1,24 @@
+from core import context_logger
+from fastapi import APIRouter
+from security.token_cache import token_cache
+from services import collapser, edge_cache, upstreams
+
+logger = context_logger.get(__name__)
+
+router = APIRouter()
+
+
+@router.get(
+    '/stats',
+    summary='Статистика шлюза',
+    description='Счетчики текущего воркера: кэш проверенных JWT, пулы соединений к бэкендам, кэш ответов '
+                'и объединение одинаковых запросов',
+    response_description='Попадания и промахи кэшей, занятые соединения и ошибки по каждому бэкенду'
+)
+async def gate_stats() -> dict:
+    return {
+        'jwt': token_cache.stats(),
+        'upstreams': upstreams.registry.stats(),
+        'edge_cache': edge_cache.edge_cache.stats() if edge_cache.edge_cache else None,
+        'collapse': collapser.collapser.stats() if collapser.collapser else None,
+    }
@@ -1,12 +1,12 @@
-from aiohttp import ClientSession
 from security.limiter import RateLimiter
 
 from core import context_logger
 from core.logger_route import LoggerRoute
 from fastapi import APIRouter, Depends
-from fastapi.responses import ORJSONResponse
-from settings import VOICE_ASSISTANT_URL
+from services.proxy import proxy
+from services.upstreams import VOICE_ASSISTANT
 from starlette.requests import Request
+from starlette.responses import Response
 
 logger = context_logger.get(__name__)
 
@@ -19,15 +19,16 @@ router = APIRouter(route_class=LoggerRoute)
     description='Обрабатывает запросы от Алисы',
     dependencies=[Depends(RateLimiter(times=1000, seconds=60 * 60))]
 )
-async def alice(request: Request) -> ORJSONResponse:
-    session: ClientSession = request.app.state.session
-    async with session.post(
-        url=VOICE_ASSISTANT_URL + '/alice',
-        json=await request.json(),
+async def alice(request: Request) -> Response:
+    return await proxy(
+        request,
+        'POST',
+        VOICE_ASSISTANT, '/alice',
+        # тело запроса уходит как есть, без разбора json
+        data=await request.body(),
         params=request.query_params,
         headers={
             'X-REQUEST-ID': request.headers.get('x-request-id'),
+            'CONTENT-TYPE': 'application/json',
         },
-    ) as resp:
-
-        return ORJSONResponse(content=await resp.json())
+    )
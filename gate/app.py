@@ -3,12 +3,12 @@ import logging
 import aioredis
 import api.v1 as api
 import settings
-from aiohttp import ClientSession
 from core import context_logger
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
+from security import key_provider
 from security.limiter import FastAPILimiter
-from security.security import init_jwt_public_key
+from services import collapser, edge_cache, upstreams
 
 logging.config.dictConfig(settings.LOGGING)
 logger = context_logger.get(__name__)
@@ -24,8 +24,28 @@ app = FastAPI(
 
 @app.on_event('startup')
 async def startup():
-    app.state.jwt_public_key = await init_jwt_public_key()
-    app.state.session = ClientSession()
+    key_provider.key_provider = key_provider.PublicKeyProvider(
+        url=settings.JWT_KEY_URL,
+        static_key=settings.JWT_PUBLIC_KEY,
+        cache_path=settings.JWT_KEY_CACHE_PATH,
+        refresh_interval=settings.JWT_KEY_REFRESH_IN_SECONDS,
+        min_backoff=settings.JWT_KEY_MIN_BACKOFF_IN_SECONDS,
+        max_backoff=settings.JWT_KEY_MAX_BACKOFF_IN_SECONDS,
+    )
+    await key_provider.key_provider.start(settings.JWT_KEY_STARTUP_TIMEOUT_IN_SECONDS)
+    upstreams.registry = upstreams.UpstreamRegistry(settings.UPSTREAMS)
+    upstreams.registry.start()
+    if settings.GATE_CACHE_ENABLED:
+        edge_cache.edge_cache = edge_cache.EdgeCache(
+            max_bytes=settings.GATE_CACHE_MAX_BYTES,
+            max_entry_bytes=settings.GATE_CACHE_MAX_ENTRY_BYTES,
+            default_ttl=settings.GATE_CACHE_DEFAULT_TTL_IN_SECONDS,
+        )
+    if settings.GATE_COLLAPSE_ENABLED:
+        collapser.collapser = collapser.RequestCollapser(
+            max_body_bytes=settings.GATE_COLLAPSE_MAX_BODY_BYTES,
+            wait_timeout=settings.GATE_COLLAPSE_WAIT_TIMEOUT_IN_SECONDS,
+        )
     redis = aioredis.Redis(
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
@@ -38,7 +58,8 @@ async def startup():
 
 @app.on_event('shutdown')
 async def shutdown():
-    await app.state.session.close()
+    await key_provider.key_provider.stop()
+    await upstreams.registry.close()
 
 app.include_router(api.asyncapi.film_list.router, prefix='/api/v1', tags=['AsyncAPI'])
 app.include_router(api.asyncapi.film.router, prefix='/api/v1', tags=['AsyncAPI'])
@@ -50,3 +71,5 @@ app.include_router(api.asyncapi.genre_list.router, prefix='/api/v1', tags=['Asyn
 app.include_router(api.authapi.routes.router, prefix='/api/v1', tags=['AuthAPI'])
 
 app.include_router(api.voice_assistant.voices_assistants.router, prefix='/api/v1', tags=['Voice Assistants'])
+
+app.include_router(api.stats.router, prefix='/api/v1', tags=['Служебное'])
@@ -2,6 +2,7 @@ import uuid
 from collections import Callable
 
 from core import context_logger
+from fastapi import HTTPException
 from fastapi.responses import ORJSONResponse
 from fastapi.routing import APIRoute
 from starlette.datastructures import Headers
@@ -40,6 +41,9 @@ class LoggerRoute(APIRoute):
 
             try:
                 response = await original_route_handler(request)
+            except HTTPException:
+                # ошибки с кодом ответа (404, 401, 502) отдаем как есть, а не как 500
+                raise
             except Exception as e:
                 logger.exception(f'during {original_handler_name.__name__} an error occurred: {str(e)}')
                 return ORJSONResponse(
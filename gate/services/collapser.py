@@ -0,0 +1,110 @@
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Mapping, Optional, Tuple
+
+from core import context_logger
+
+logger = context_logger.get(__name__)
+
+
+@dataclass(frozen=True)
+class SharedResponse:
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+
+
+class RequestCollapser:
+    """
+    Объединение одинаковых одновременных GET-запросов к бэкенду.
+    Первый запрос (ведущий) идет в бэкенд и отдает ответ своему клиенту потоком, как обычно,
+    а остальные с тем же ключом ждут и получают копию тела, когда оно придет целиком.
+    Если тело больше max_body_bytes, клиент ведущего отключился или бэкенд не ответил,
+    то ожидающие получают None и идут в бэкенд сами
+    """
+
+    def __init__(self, max_body_bytes: int, wait_timeout: float):
+        self.max_body_bytes = max_body_bytes
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.collapsed = 0
+        self.fallbacks = 0
+
+    def lead(self, key: str) -> Tuple[asyncio.Future, bool]:
+        """
+        Возвращает запрос в полете по ключу и False, если он есть, иначе делает вызывающего ведущим
+        и возвращает его запрос и True. Ведущий обязан завершить запрос вызовом finish или share
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.collapsed += 1
+            return call, False
+
+        call = self._calls[key] = asyncio.get_event_loop().create_future()
+        self.leaders += 1
+        return call, True
+
+    async def wait(self, key: str, call: asyncio.Future) -> Optional[SharedResponse]:
+        try:
+            shared = await asyncio.wait_for(asyncio.shield(call), self.wait_timeout)
+        except asyncio.TimeoutError:
+            # ведущий мог так и не начать отдавать ответ, тогда его запрос никогда не завершится
+            self.finish(key, call, None)
+            shared = None
+
+        if shared is None:
+            self.fallbacks += 1
+        return shared
+
+    def finish(self, key: str, call: asyncio.Future, shared: Optional[SharedResponse]) -> None:
+        """
+        Завершает запрос call. Повторный вызов ничего не делает, а под ключом к этому времени
+        может быть уже запрос нового ведущего - его не трогаем
+        """
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.done():
+            call.set_result(shared)
+
+    async def share(
+        self,
+        key: str,
+        call: asyncio.Future,
+        status: int,
+        headers: Mapping[str, str],
+        chunks: AsyncIterator[bytes],
+    ) -> AsyncIterator[bytes]:
+        """Отдает тело ведущему потоком и копию - ожидающим, когда тело передано целиком"""
+        body = []
+        size = 0
+        completed = False
+        try:
+            async for chunk in chunks:
+                if body is not None:
+                    size += len(chunk)
+                    if size <= self.max_body_bytes:
+                        body.append(chunk)
+                    else:
+                        # ожидающим незачем ждать конца тела, которое они не получат
+                        body = None
+                        self.finish(key, call, None)
+                yield chunk
+            completed = True
+        finally:
+            shared = None
+            if completed and body is not None:
+                shared = SharedResponse(status, headers, b''.join(body))
+            self.finish(key, call, shared)
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'collapsed': self.collapsed,
+            'fallbacks': self.fallbacks,
+        }
+
+
+# Создается при старте приложения, если объединение запросов включено, один на процесс
+collapser: Optional[RequestCollapser] = None
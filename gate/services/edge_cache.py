@@ -0,0 +1,131 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator, Mapping, Optional
+from urllib.parse import urlencode
+
+from core import context_logger
+from starlette.datastructures import QueryParams
+
+logger = context_logger.get(__name__)
+
+# Директивы Cache-Control, при которых ответ нельзя отдавать другим клиентам
+NOT_SHARED_DIRECTIVES = {'no-store', 'no-cache', 'private'}
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+    expires_at: float
+
+
+def make_key(upstream_name: str, path: str, params: Optional[QueryParams]) -> str:
+    """Ключ ответа: бэкенд, путь и параметры запроса по алфавиту, чтобы ?a=1&b=2 и ?b=2&a=1 совпадали"""
+    query = urlencode(sorted(params.multi_items())) if params else ''
+    return f'{upstream_name}:{path}?{query}'
+
+
+def ttl_from_headers(headers: Mapping[str, str], default_ttl: int) -> int:
+    """
+    Сколько можно хранить ответ по Cache-Control бэкенда: s-maxage, затем max-age,
+    без заголовка - default_ttl. 0 - хранить нельзя
+    """
+    if headers.get('vary', '').lower() not in ('', 'accept-encoding'):
+        # ответ зависит от заголовков запроса, а они не входят в ключ
+        return 0
+
+    directives = {}
+    for directive in headers.get('cache-control', '').split(','):
+        name, _, value = directive.strip().lower().partition('=')
+        if name:
+            directives[name] = value.strip('"')
+
+    if NOT_SHARED_DIRECTIVES & directives.keys():
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        if name in directives:
+            try:
+                return max(0, int(directives[name]))
+            except ValueError:
+                return 0
+    return default_ttl
+
+
+class EdgeCache:
+    """
+    Кэш ответов бэкендов в памяти воркера шлюза для анонимных GET-запросов каталога.
+    Размер ограничен суммой размеров тел max_bytes, при переполнении вытесняются давно не запрошенные.
+    Ответы больше max_entry_bytes не кешируются и отдаются потоком, как и раньше
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, default_ttl: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.default_ttl = default_ttl
+        self._data: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._data.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, status: int, headers: Mapping[str, str], body: bytes, ttl: int) -> None:
+        if len(body) > self.max_entry_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = CachedResponse(status, dict(headers), body, time.monotonic() + ttl)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._data)))
+
+    async def tee(
+        self,
+        key: str,
+        status: int,
+        headers: Mapping[str, str],
+        ttl: int,
+        chunks: AsyncIterator[bytes],
+    ) -> AsyncIterator[bytes]:
+        """Отдает тело потоком дальше и кладет его в кэш, когда оно передано целиком и не слишком большое"""
+        body = []
+        size = 0
+        async for chunk in chunks:
+            if body is not None:
+                size += len(chunk)
+                if size <= self.max_entry_bytes:
+                    body.append(chunk)
+                else:
+                    body = None
+            yield chunk
+
+        if body is not None:
+            self.set(key, status, headers, b''.join(body), ttl)
+
+    def _remove(self, key: str) -> None:
+        self.size -= len(self._data.pop(key).body)
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._data),
+            'size': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# Кэш создается при старте приложения, если включен, один на процесс
+edge_cache: Optional[EdgeCache] = None
@@ -0,0 +1,164 @@
+import asyncio
+from typing import AsyncIterator, Callable, Optional
+
+from aiohttp import ClientError, ClientResponse
+from core import context_logger
+from fastapi import HTTPException
+from services import collapser, edge_cache, upstreams
+from services.upstreams import Replica, Upstream
+from starlette import status
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+logger = context_logger.get(__name__)
+
+# Заголовки соединения, а не запроса: их не пересылаем.
+# accept-encoding тоже: aiohttp всё равно распакует ответ, так что сжимать его в бэкенде незачем
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailers',
+    'transfer-encoding', 'upgrade', 'host', 'content-length', 'accept-encoding',
+}
+# Заголовки ответа бэкенда, которые отдаем клиенту
+RESPONSE_HEADERS = (
+    'content-type', 'cache-control', 'etag', 'last-modified', 'expires', 'vary', 'location', 'retry-after',
+    'www-authenticate', 'x-cached', 'x-next-cursor', 'x-search-phase',
+)
+CHUNK_SIZE = 64 * 1024
+
+
+def forward_headers(request: Request) -> dict:
+    return {name: value for name, value in request.headers.items() if name not in HOP_BY_HOP_HEADERS}
+
+
+def response_headers(resp: ClientResponse) -> dict:
+    headers = {name: resp.headers[name] for name in RESPONSE_HEADERS if name in resp.headers}
+    # длина известна, только если тело не было сжато: распакованное aiohttp тело длиннее
+    if 'content-length' in resp.headers and 'content-encoding' not in resp.headers:
+        headers['content-length'] = resp.headers['content-length']
+    return headers
+
+
+def _releaser(upstream: Upstream, replica: Replica, resp: ClientResponse) -> Callable[[], None]:
+    """Возврат соединения в пул, который можно вызывать несколько раз: из генератора тела и из ответа"""
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            upstream.release(replica, resp)
+    return release
+
+
+async def _stream(resp: ClientResponse, release: Callable[[], None]) -> AsyncIterator[bytes]:
+    # соединение возвращается в пул и тогда, когда клиент отключился, не дочитав ответ
+    try:
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            yield chunk
+    finally:
+        release()
+
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """
+    Потоковый ответ бэкенда. on_close вызывается, когда ответ отдан или отдать его не удалось.
+    Генератор тела этого не гарантирует: если клиент отключился до начала чтения тела или во время
+    отправки куска, генератор не доходит до своего finally
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+
+async def proxy(
+    request: Request,
+    method: str,
+    upstream_name: str,
+    path: str,
+    headers: Optional[dict] = None,
+    cacheable: bool = False,
+    **kwargs,
+) -> Response:
+    """
+    Пересылает запрос в бэкенд upstream_name по пути path и отдает клиенту статус, нужные заголовки
+    и тело ответа потоком, как есть, без разбора json и повторной сериализации.
+    headers - заголовки для бэкенда, по умолчанию - заголовки клиента.
+    cacheable - ответ на анонимный GET можно хранить в кэше шлюза и отдавать одновременным таким же запросам,
+    если это включено.
+    Остальные параметры передаются в ClientSession.request: params, json, data
+    """
+    cache = edge_cache.edge_cache
+    key = None
+    if cacheable and method == 'GET' and 'authorization' not in request.headers:
+        key = edge_cache.make_key(upstream_name, path, kwargs.get('params'))
+
+    if key and cache:
+        cached = cache.get(key)
+        if cached:
+            return Response(cached.body, status_code=cached.status, headers={**cached.headers, 'x-cached': '1'})
+
+    # одинаковые анонимные запросы в полете объединяются в один запрос к бэкенду
+    call = None
+    leading = False
+    if key and collapser.collapser:
+        call, leading = collapser.collapser.lead(key)
+        if not leading:
+            shared = await collapser.collapser.wait(key, call)
+            if shared:
+                return Response(shared.body, status_code=shared.status, headers=shared.headers)
+
+    def abandon() -> None:
+        # ведущий не отдал тело целиком: ожидающие сразу идут в бэкенд сами, а не ждут таймаута.
+        # Если тело отдано, то запрос уже завершен в share и вызов ничего не делает
+        if leading:
+            collapser.collapser.finish(key, call, None)
+
+    try:
+        upstream = upstreams.registry.get(upstream_name)
+        try:
+            replica, resp = await upstream.request(
+                method,
+                path,
+                headers=forward_headers(request) if headers is None else headers,
+                **kwargs,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f'Upstream {upstream_name} {method} {path} timed out')
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail='Upstream timed out')
+        except ClientError as e:
+            logger.warning(f'Upstream {upstream_name} {method} {path} failed: {str(e)}')
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail='Upstream is unavailable')
+    except BaseException:
+        abandon()
+        raise
+
+    release = _releaser(upstream, replica, resp)
+
+    def on_close() -> None:
+        release()
+        abandon()
+
+    try:
+        body = _stream(resp, release)
+        client_headers = response_headers(resp)
+        # длину ответа при отдаче копии посчитает Response
+        shared_headers = {name: value for name, value in client_headers.items() if name != 'content-length'}
+        if key and cache and resp.status == 200:
+            ttl = edge_cache.ttl_from_headers(resp.headers, cache.default_ttl)
+            if ttl:
+                body = cache.tee(key, resp.status, shared_headers, ttl, body)
+        if leading:
+            body = collapser.collapser.share(key, call, resp.status, shared_headers, body)
+
+        return UpstreamStreamingResponse(body, on_close, status_code=resp.status, headers=client_headers)
+    except BaseException:
+        on_close()
+        raise
@@ -0,0 +1,246 @@
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import ClientResponse, ClientSession, ClientTimeout, TCPConnector
+from core import context_logger
+
+logger = context_logger.get(__name__)
+
+ASYNC_API = 'asyncapi'
+AUTH_API = 'auth'
+VOICE_ASSISTANT = 'voice_assistant'
+
+LEAST_OUTSTANDING = 'least_outstanding'
+POWER_OF_TWO_CHOICES = 'p2c'
+
+# Вес нового замера во взвешенном среднем времени ответа реплики
+LATENCY_EWMA_ALPHA = 0.3
+# Реплика не считается медленной, пока отвечает быстрее: на малых временах разброс велик
+MIN_OUTLIER_LATENCY = 0.05
+
+
+class Replica:
+    """Экземпляр бэкенда и то, что о нем известно: нагрузка, время ответа, ошибки подряд, исключение из балансировки"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0
+        # взвешенное среднее время до получения заголовков ответа, в секундах
+        self.latency: Optional[float] = None
+        self.ejected_until = 0.0
+        # результат последней активной проверки
+        self.healthy = True
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and self.ejected_until <= time.monotonic()
+
+    def observe_latency(self, seconds: float) -> None:
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_EWMA_ALPHA * (seconds - self.latency)
+
+    def stats(self) -> dict:
+        return {
+            'available': self.available,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'latency_ms': round(self.latency * 1000, 3) if self.latency is not None else None,
+        }
+
+
+class Upstream:
+    """
+    Бэкенд из одной или нескольких реплик с общим пулом соединений и таймаутами.
+    Запрос уходит в реплику с наименьшим числом незавершенных запросов среди всех (least_outstanding)
+    или среди двух случайных (p2c). Реплика исключается из балансировки на ejection_time после max_failures
+    ошибок подряд (отказ соединения, таймаут, 5xx) или если отвечает в outlier_factor раз медленнее остальных.
+    Если задан health_path, то реплики в фоне проверяются запросом к нему, ответ 5xx или ошибка - реплика больна.
+    Исключить можно не больше max_ejection_percent реплик, а если доступных не осталось, то запросы идут во все.
+    Соединение считается занятым с начала запроса и до release: для потоковых ответов - пока тело не дочитано
+    """
+
+    def __init__(
+        self,
+        name: str,
+        urls: List[str],
+        pool_size: int,
+        keepalive_timeout: float,
+        connect_timeout: float,
+        read_timeout: float,
+        dns_ttl: int,
+        balancer: str = LEAST_OUTSTANDING,
+        health_path: Optional[str] = None,
+        health_check_interval: float = 5,
+        max_failures: int = 3,
+        ejection_time: float = 30,
+        outlier_factor: float = 3,
+        max_ejection_percent: int = 50,
+    ):
+        self.name = name
+        self.replicas = [Replica(url) for url in urls]
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.dns_ttl = dns_ttl
+        self.balancer = balancer
+        self.health_path = health_path
+        self.health_check_interval = health_check_interval
+        self.max_failures = max_failures
+        self.ejection_time = ejection_time
+        self.outlier_factor = outlier_factor
+        self.max_ejection_percent = max_ejection_percent
+        self.session: Optional[ClientSession] = None
+        self._health_checker: Optional[asyncio.Task] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        # pool_size - на каждую реплику
+        connector = TCPConnector(
+            limit=self.pool_size * len(self.replicas),
+            limit_per_host=self.pool_size,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_ttl,
+        )
+        # total не ограничиваем: потоковый ответ может читаться долго, важны паузы между данными
+        timeout = ClientTimeout(total=None, connect=self.connect_timeout, sock_read=self.read_timeout)
+        self.session = ClientSession(connector=connector, timeout=timeout)
+        if self.health_path:
+            self._health_checker = asyncio.create_task(self._check_health_periodically())
+
+    async def close(self) -> None:
+        if self._health_checker:
+            self._health_checker.cancel()
+        if self.session:
+            await self.session.close()
+
+    def choose(self) -> Replica:
+        candidates = [replica for replica in self.replicas if replica.available] or self.replicas
+        if self.balancer == POWER_OF_TWO_CHOICES and len(candidates) > 2:
+            candidates = random.sample(candidates, 2)
+        # при равной нагрузке - более быстрая реплика
+        return min(candidates, key=lambda replica: (replica.in_flight, replica.latency or 0))
+
+    async def request(self, method: str, path: str, **kwargs) -> Tuple[Replica, ClientResponse]:
+        """Запрос к бэкенду, path - путь от корня бэкенда. Ответ надо вернуть вызовом release"""
+        replica = self.choose()
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        replica.requests += 1
+        replica.in_flight += 1
+        started = time.monotonic()
+        try:
+            resp = await self.session.request(method, replica.url + path, **kwargs)
+        except asyncio.CancelledError:
+            # клиент ушел, не дождавшись ответа: реплика не виновата, но запрос больше не выполняется
+            self.in_flight -= 1
+            replica.in_flight -= 1
+            raise
+        except Exception:
+            self.in_flight -= 1
+            self.errors += 1
+            replica.in_flight -= 1
+            replica.errors += 1
+            self._record_failure(replica)
+            raise
+
+        replica.observe_latency(time.monotonic() - started)
+        if resp.status >= 500:
+            replica.errors += 1
+            self._record_failure(replica)
+        else:
+            replica.failures = 0
+            self._check_outlier(replica)
+        return replica, resp
+
+    def release(self, replica: Replica, resp: ClientResponse) -> None:
+        resp.release()
+        self.in_flight -= 1
+        replica.in_flight -= 1
+
+    def _record_failure(self, replica: Replica) -> None:
+        replica.failures += 1
+        if replica.failures >= self.max_failures:
+            self._eject(replica, f'{replica.failures} failures in a row')
+
+    def _check_outlier(self, replica: Replica) -> None:
+        others = [other.latency for other in self.replicas if other is not replica and other.latency is not None]
+        if not others or replica.latency < MIN_OUTLIER_LATENCY:
+            return
+        if replica.latency > self.outlier_factor * statistics.median(others):
+            self._eject(replica, f'latency {replica.latency * 1000:.0f}ms')
+
+    def _eject(self, replica: Replica, reason: str) -> None:
+        unavailable = sum(1 for other in self.replicas if not other.available)
+        if not replica.available or (unavailable + 1) * 100 > self.max_ejection_percent * len(self.replicas):
+            return
+        replica.ejected_until = time.monotonic() + self.ejection_time
+        replica.failures = 0
+        # после возвращения время ответа считается заново, иначе реплику сразу исключит старое среднее
+        replica.latency = None
+        logger.warning(f'Eject {self.name} replica {replica.url} for {self.ejection_time}s: {reason}')
+
+    async def _check_health(self, replica: Replica) -> None:
+        try:
+            async with self.session.get(replica.url + self.health_path) as resp:
+                healthy = resp.status < 500
+        except Exception:
+            healthy = False
+
+        if healthy != replica.healthy:
+            logger.warning(f'{self.name} replica {replica.url} is {"healthy" if healthy else "unhealthy"}')
+        replica.healthy = healthy
+
+    async def _check_health_periodically(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check_health(replica) for replica in self.replicas))
+            await asyncio.sleep(self.health_check_interval)
+
+    def stats(self) -> dict:
+        return {
+            'pool_size': self.pool_size,
+            'in_flight': self.in_flight,
+            # запросы сверх размера пула реплики ждут свободного соединения
+            'waiting': sum(max(0, replica.in_flight - self.pool_size) for replica in self.replicas),
+            'peak_in_flight': self.peak_in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'replicas': {replica.url: replica.stats() for replica in self.replicas},
+        }
+
+
+class UpstreamRegistry:
+    def __init__(self, config: Dict[str, dict]):
+        self.upstreams = {name: Upstream(name, **upstream_config) for name, upstream_config in config.items()}
+
+    def get(self, name: str) -> Upstream:
+        return self.upstreams[name]
+
+    def start(self) -> None:
+        for upstream in self.upstreams.values():
+            upstream.start()
+
+    async def close(self) -> None:
+        for upstream in self.upstreams.values():
+            await upstream.close()
+
+    def stats(self) -> dict:
+        return {name: upstream.stats() for name, upstream in self.upstreams.items()}
+
+
+# Реестр создается при старте приложения, один на процесс
+registry: Optional[UpstreamRegistry] = None
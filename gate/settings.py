@@ -22,6 +22,17 @@ REDIS_USE_SSL = env.bool('REDIS_USE_SSL', False)
 
 JWT_KEY_URL = env('JWT_KEY_URL', 'http://localhost:8002/public_key')
 JWT_PUBLIC_KEY = env('JWT_PUBLIC_KEY', None)
+# Кэш проверенных токенов: размер и максимальное время жизни записи, если exp токена дальше
+JWT_CACHE_MAX_SIZE = env.int('JWT_CACHE_MAX_SIZE', 10000)
+JWT_CACHE_MAX_TTL_IN_SECONDS = env.int('JWT_CACHE_MAX_TTL_IN_SECONDS', 60 * 10)
+# Публичные ключи JWT: фоновое обновление, пауза между попытками при недоступности сервиса авторизации,
+# копия на диске для старта без него и сколько ждать ключ при старте, если копии нет.
+# Копия на диске выключена по умолчанию: путь должен вести в каталог, куда пишет только сервис
+JWT_KEY_REFRESH_IN_SECONDS = env.int('JWT_KEY_REFRESH_IN_SECONDS', 60 * 10)
+JWT_KEY_MIN_BACKOFF_IN_SECONDS = env.float('JWT_KEY_MIN_BACKOFF_IN_SECONDS', 1)
+JWT_KEY_MAX_BACKOFF_IN_SECONDS = env.float('JWT_KEY_MAX_BACKOFF_IN_SECONDS', 60)
+JWT_KEY_CACHE_PATH = env('JWT_KEY_CACHE_PATH', None)
+JWT_KEY_STARTUP_TIMEOUT_IN_SECONDS = env.float('JWT_KEY_STARTUP_TIMEOUT_IN_SECONDS', 10)
 
 ASYNC_API_HOST = env('ASYNC_API_HOST', 'localhost')
 ASYNC_API_PORT = env('ASYNC_API_PORT', '8001')
@@ -35,6 +46,63 @@ VOICE_ASSISTANT_HOST = env('VOICE_ASSISTANT_HOST', '0.0.0.0')
 VOICE_ASSISTANT_PORT = env('VOICE_ASSISTANT_PORT', '8003')
 VOICE_ASSISTANT_URL = f'http://{VOICE_ASSISTANT_HOST}:{VOICE_ASSISTANT_PORT}/api/v1'
 
+# Реплики бэкендов: список базовых адресов через запятую, по умолчанию - один адрес из HOST и PORT
+ASYNC_API_REPLICAS = env.list('ASYNC_API_REPLICAS', [ASYNC_API_URL])
+AUTH_API_REPLICAS = env.list('AUTH_API_REPLICAS', [AUTH_API_URL])
+VOICE_ASSISTANT_REPLICAS = env.list('VOICE_ASSISTANT_REPLICAS', [VOICE_ASSISTANT_URL])
+
+# Балансировка между репликами: least_outstanding или p2c (лучшая из двух случайных)
+UPSTREAM_BALANCER = env('UPSTREAM_BALANCER', 'least_outstanding')
+# Активная проверка реплик запросом к пути бэкенда раз в интервал
+UPSTREAM_HEALTH_CHECK_INTERVAL_IN_SECONDS = env.float('UPSTREAM_HEALTH_CHECK_INTERVAL_IN_SECONDS', 5)
+# Пассивная проверка: реплика исключается из балансировки после ошибок подряд или если отвечает
+# во столько раз медленнее остальных, но исключить можно не больше указанной доли реплик
+UPSTREAM_MAX_FAILURES = env.int('UPSTREAM_MAX_FAILURES', 3)
+UPSTREAM_EJECTION_TIME_IN_SECONDS = env.float('UPSTREAM_EJECTION_TIME_IN_SECONDS', 30)
+UPSTREAM_LATENCY_OUTLIER_FACTOR = env.float('UPSTREAM_LATENCY_OUTLIER_FACTOR', 3)
+UPSTREAM_MAX_EJECTION_PERCENT = env.int('UPSTREAM_MAX_EJECTION_PERCENT', 50)
+
+# Пулы соединений к бэкендам, у каждого свой: медленный бэкенд занимает только свой пул.
+# <ИМЯ>_POOL_SIZE - максимум соединений к реплике, KEEPALIVE_TIMEOUT - сколько держать простаивающее соединение,
+# CONNECT_TIMEOUT - ожидание соединения из пула вместе с подключением, READ_TIMEOUT - пауза между данными ответа,
+# DNS_TTL - сколько кешировать адрес бэкенда, HEALTH_PATH - путь для активной проверки, пустой - без нее
+UPSTREAMS = {
+    name: {
+        'urls': urls,
+        'pool_size': env.int(f'{prefix}_POOL_SIZE', pool_size),
+        'keepalive_timeout': env.float(f'{prefix}_KEEPALIVE_TIMEOUT', 30),
+        'connect_timeout': env.float(f'{prefix}_CONNECT_TIMEOUT', 2),
+        'read_timeout': env.float(f'{prefix}_READ_TIMEOUT', read_timeout),
+        'dns_ttl': env.int(f'{prefix}_DNS_TTL', 60),
+        'balancer': UPSTREAM_BALANCER,
+        'health_path': env(f'{prefix}_HEALTH_PATH', health_path) or None,
+        'health_check_interval': UPSTREAM_HEALTH_CHECK_INTERVAL_IN_SECONDS,
+        'max_failures': UPSTREAM_MAX_FAILURES,
+        'ejection_time': UPSTREAM_EJECTION_TIME_IN_SECONDS,
+        'outlier_factor': UPSTREAM_LATENCY_OUTLIER_FACTOR,
+        'max_ejection_percent': UPSTREAM_MAX_EJECTION_PERCENT,
+    }
+    for name, prefix, urls, pool_size, read_timeout, health_path in [
+        # жанры asyncapi отдает из памяти, это самый дешевый запрос
+        ('asyncapi', 'ASYNC_API', ASYNC_API_REPLICAS, 100, 10, '/genre/'),
+        ('auth', 'AUTH_API', AUTH_API_REPLICAS, 20, 5, '/public_key'),
+        ('voice_assistant', 'VOICE_ASSISTANT', VOICE_ASSISTANT_REPLICAS, 20, 5, ''),
+    ]
+}
+
+# Кэш ответов asyncapi на анонимные GET-запросы каталога в памяти воркера шлюза.
+# Время хранения берется из Cache-Control ответа, без него - GATE_CACHE_DEFAULT_TTL_IN_SECONDS
+GATE_CACHE_ENABLED = env.bool('GATE_CACHE_ENABLED', False)
+GATE_CACHE_MAX_BYTES = env.int('GATE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+GATE_CACHE_MAX_ENTRY_BYTES = env.int('GATE_CACHE_MAX_ENTRY_BYTES', 1024 * 1024)
+GATE_CACHE_DEFAULT_TTL_IN_SECONDS = env.int('GATE_CACHE_DEFAULT_TTL_IN_SECONDS', 30)
+
+# Объединение одинаковых одновременных анонимных GET-запросов каталога в один запрос к бэкенду.
+# Тела больше GATE_COLLAPSE_MAX_BODY_BYTES не копируются, ожидающие таких ответов идут в бэкенд сами
+GATE_COLLAPSE_ENABLED = env.bool('GATE_COLLAPSE_ENABLED', True)
+GATE_COLLAPSE_MAX_BODY_BYTES = env.int('GATE_COLLAPSE_MAX_BODY_BYTES', 1024 * 1024)
+GATE_COLLAPSE_WAIT_TIMEOUT_IN_SECONDS = env.float('GATE_COLLAPSE_WAIT_TIMEOUT_IN_SECONDS', 10)
+
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DEFAULT_HANDLERS = ['console', ]
 
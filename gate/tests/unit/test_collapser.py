@@ -0,0 +1,218 @@
+import asyncio
+from typing import AsyncIterator, List
+
+import pytest
+from services import collapser, edge_cache, proxy, upstreams
+from services.collapser import RequestCollapser, SharedResponse
+from starlette.requests import Request
+
+KEY = 'asyncapi:/film?'
+
+
+async def stream(chunks: List[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        await asyncio.sleep(0)
+        yield chunk
+
+
+async def test_followers_share_leader_body():
+    """Тестирование того, что ожидающие получают копию тела, отданного ведущим целиком"""
+    requests = RequestCollapser(max_body_bytes=100, wait_timeout=5)
+    call, leading = requests.lead(KEY)
+    followers = [asyncio.ensure_future(requests.wait(KEY, requests.lead(KEY)[0])) for _ in range(2)]
+
+    # Выполнение запроса
+    body = requests.share(KEY, call, 200, {'content-type': 'application/json'}, stream([b'{}', b'\n']))
+    chunks = [chunk async for chunk in body]
+
+    # Проверка результата
+    assert leading
+    assert chunks == [b'{}', b'\n']
+    assert await asyncio.gather(*followers) == [SharedResponse(200, {'content-type': 'application/json'}, b'{}\n')] * 2
+    assert requests.stats() == {'in_flight': 0, 'leaders': 1, 'collapsed': 2, 'fallbacks': 0}
+
+
+async def test_oversized_body_falls_back():
+    """Тестирование того, что тело больше max_body_bytes не ждут: ожидающие сразу идут в бэкенд сами"""
+    requests = RequestCollapser(max_body_bytes=10, wait_timeout=5)
+    call, _ = requests.lead(KEY)
+    follower = asyncio.ensure_future(requests.wait(KEY, requests.lead(KEY)[0]))
+    body = requests.share(KEY, call, 200, {}, stream([b'x' * 8, b'y' * 8, b'z' * 8]))
+
+    # Выполнение запроса: ведущий прочитал только два куска, а ожидающий уже отпущен
+    chunks = [await body.__anext__(), await body.__anext__()]
+    shared = await follower
+    chunks += [chunk async for chunk in body]
+
+    # Проверка результата
+    assert shared is None
+    assert b''.join(chunks) == b'x' * 8 + b'y' * 8 + b'z' * 8
+    assert requests.stats()['fallbacks'] == 1
+
+
+async def test_wait_timeout():
+    """Тестирование того, что ожидающий не ждет ведущего дольше wait_timeout и освобождает ключ"""
+    requests = RequestCollapser(max_body_bytes=100, wait_timeout=0.01)
+    requests.lead(KEY)
+    call, leading = requests.lead(KEY)
+
+    # Выполнение запроса
+    shared = await requests.wait(KEY, call)
+
+    # Проверка результата: следующий запрос становится новым ведущим
+    assert not leading
+    assert shared is None
+    assert requests.lead(KEY)[1]
+
+
+async def test_finish_of_old_call_keeps_new_leader():
+    """Тестирование того, что запоздалое завершение старого запроса не трогает запрос нового ведущего"""
+    requests = RequestCollapser(max_body_bytes=100, wait_timeout=5)
+    old_call, _ = requests.lead(KEY)
+    requests.finish(KEY, old_call, None)
+    new_call, _ = requests.lead(KEY)
+
+    # Выполнение запроса
+    requests.finish(KEY, old_call, None)
+
+    # Проверка результата
+    assert requests.lead(KEY) == (new_call, False)
+
+
+class FakeContent:
+    def __init__(self, chunks: List[bytes]):
+        self.chunks = chunks
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class FakeResponse:
+    status = 200
+    headers = {'content-type': 'application/json'}
+
+    def __init__(self, chunks: List[bytes]):
+        self.content = FakeContent(chunks)
+
+
+class FakeUpstream:
+    """Бэкенд, который отвечает телом из кусков chunks или выбрасывает error"""
+
+    def __init__(self, chunks: List[bytes] = None, error: BaseException = None):
+        self.chunks = chunks or [b'[]']
+        self.error = error
+        self.requests = 0
+        self.released = 0
+
+    async def request(self, method: str, path: str, **kwargs):
+        self.requests += 1
+        await asyncio.sleep(0)
+        if self.error:
+            raise self.error
+        return object(), FakeResponse(self.chunks)
+
+    def release(self, replica, resp) -> None:
+        self.released += 1
+
+
+class FakeRegistry:
+    def __init__(self, upstream: FakeUpstream):
+        self.upstream = upstream
+
+    def get(self, name: str) -> FakeUpstream:
+        return self.upstream
+
+
+@pytest.fixture
+def requests(monkeypatch) -> RequestCollapser:
+    monkeypatch.setattr(edge_cache, 'edge_cache', None)
+    monkeypatch.setattr(collapser, 'collapser', RequestCollapser(max_body_bytes=100, wait_timeout=5))
+    return collapser.collapser
+
+
+def use_upstream(monkeypatch, upstream: FakeUpstream) -> FakeUpstream:
+    monkeypatch.setattr(upstreams, 'registry', FakeRegistry(upstream))
+    return upstream
+
+
+def make_request() -> Request:
+    return Request({'type': 'http', 'method': 'GET', 'headers': [], 'path': '/film', 'query_string': b''})
+
+
+async def receive() -> dict:
+    # клиент молчит, пока ему отдают ответ
+    await asyncio.sleep(10)
+    return {'type': 'http.disconnect'}
+
+
+async def send_to(sent: List[dict], message: dict) -> None:
+    sent.append(message)
+
+
+async def test_proxy_shares_response(requests, monkeypatch):
+    """Тестирование того, что одинаковые анонимные запросы в полете получают один ответ бэкенда"""
+    upstream = use_upstream(monkeypatch, FakeUpstream(chunks=[b'[', b']']))
+    response = await proxy.proxy(make_request(), 'GET', 'asyncapi', '/film', cacheable=True)
+    follower = asyncio.ensure_future(proxy.proxy(make_request(), 'GET', 'asyncapi', '/film', cacheable=True))
+    await asyncio.sleep(0)
+
+    # Выполнение запроса
+    sent = []
+    await response(None, receive, lambda message: send_to(sent, message))
+    shared = await follower
+
+    # Проверка результата
+    assert upstream.requests == 1
+    assert upstream.released == 1
+    assert shared.body == b'[]'
+    assert shared.headers['content-type'] == 'application/json'
+    assert requests.stats()['in_flight'] == 0
+
+
+async def test_proxy_upstream_error_releases_followers(requests, monkeypatch):
+    """Тестирование того, что при ошибке запроса ведущего ожидающие сразу идут в бэкенд сами"""
+    upstream = use_upstream(monkeypatch, FakeUpstream(error=ValueError('boom')))
+    follower = None
+
+    async def request_with_follower(method: str, path: str, **kwargs):
+        nonlocal follower
+        # пока ведущий ждет бэкенд, приходит такой же запрос
+        follower = asyncio.ensure_future(requests.wait(KEY, requests.lead(KEY)[0]))
+        return await FakeUpstream.request(upstream, method, path, **kwargs)
+
+    monkeypatch.setattr(upstream, 'request', request_with_follower)
+
+    # Выполнение запроса
+    with pytest.raises(ValueError):
+        await proxy.proxy(make_request(), 'GET', 'asyncapi', '/film', cacheable=True)
+
+    # Проверка результата: ожидающий отпущен сразу, а не по таймауту
+    assert await asyncio.wait_for(follower, 0.1) is None
+    assert requests.stats()['in_flight'] == 0
+
+
+async def test_proxy_unsent_body_releases_followers(requests, monkeypatch):
+    """
+    Тестирование того, что если клиент ведущего отключился до начала чтения тела,
+    то on_close возвращает соединение и отпускает ожидающих
+    """
+    upstream = use_upstream(monkeypatch, FakeUpstream())
+    response = await proxy.proxy(make_request(), 'GET', 'asyncapi', '/film', cacheable=True)
+    follower = asyncio.ensure_future(proxy.proxy(make_request(), 'GET', 'asyncapi', '/film', cacheable=True))
+    await asyncio.sleep(0)
+
+    async def gone(message: dict) -> None:
+        raise OSError('client disconnected')
+
+    # Выполнение запроса
+    with pytest.raises(OSError):
+        await response(None, receive, gone)
+    fallback = await asyncio.wait_for(follower, 0.1)
+
+    # Проверка результата: ожидающий сам сходил в бэкенд и получил потоковый ответ
+    assert isinstance(fallback, proxy.UpstreamStreamingResponse)
+    assert upstream.requests == 2
+    assert upstream.released == 1
+    assert requests.stats()['fallbacks'] == 1
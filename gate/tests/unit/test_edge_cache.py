@@ -0,0 +1,128 @@
+from typing import AsyncIterator, List
+
+import pytest
+from services.edge_cache import EdgeCache, make_key, ttl_from_headers
+from starlette.datastructures import QueryParams
+
+
+@pytest.mark.parametrize('headers, ttl', [
+    ({}, 60),
+    ({'cache-control': 'max-age=30'}, 30),
+    ({'cache-control': 'public, max-age=30, s-maxage=120'}, 120),
+    ({'cache-control': 's-maxage="15"'}, 15),
+    ({'cache-control': 'max-age=-5'}, 0),
+    ({'cache-control': 'max-age=soon'}, 0),
+    ({'cache-control': 'no-store'}, 0),
+    ({'cache-control': 'No-Cache, max-age=30'}, 0),
+    ({'cache-control': 'private, max-age=30'}, 0),
+    ({'cache-control': 'public'}, 60),
+    ({'cache-control': 'max-age=30', 'vary': 'Accept-Encoding'}, 30),
+    ({'cache-control': 'max-age=30', 'vary': 'Authorization'}, 0),
+])
+def test_ttl_from_headers(headers, ttl):
+    """Тестирование срока хранения ответа по Cache-Control и Vary бэкенда"""
+    assert ttl_from_headers(headers, default_ttl=60) == ttl
+
+
+def test_make_key_ignores_params_order():
+    """Тестирование того, что порядок параметров запроса не меняет ключ"""
+    assert make_key('asyncapi', '/film', QueryParams('a=1&b=2')) == make_key('asyncapi', '/film', QueryParams('b=2&a=1'))
+    assert make_key('asyncapi', '/film', None) == 'asyncapi:/film?'
+
+
+def test_lru_eviction_by_size():
+    """Тестирование вытеснения давно не запрошенных ответов, когда сумма размеров тел больше max_bytes"""
+    cache = EdgeCache(max_bytes=30, max_entry_bytes=20, default_ttl=60)
+    cache.set('a', 200, {}, b'a' * 10, ttl=60)
+    cache.set('b', 200, {}, b'b' * 10, ttl=60)
+    cache.set('c', 200, {}, b'c' * 10, ttl=60)
+
+    # Выполнение запроса: 'a' запрошен и стал свежее 'b', новый ответ вытесняет 'b'
+    assert cache.get('a') is not None
+    cache.set('d', 200, {}, b'd' * 10, ttl=60)
+
+    # Проверка результата
+    assert cache.get('b') is None
+    assert [key for key in 'acd' if cache.get(key) is not None] == ['a', 'c', 'd']
+    assert cache.size == 30
+
+
+def test_replaced_entry_is_counted_once():
+    """Тестирование того, что повторная запись ключа не увеличивает размер кэша дважды"""
+    cache = EdgeCache(max_bytes=100, max_entry_bytes=100, default_ttl=60)
+    cache.set('a', 200, {}, b'a' * 10, ttl=60)
+    cache.set('a', 200, {}, b'a' * 20, ttl=60)
+
+    # Проверка результата
+    assert cache.size == 20
+    assert cache.get('a').body == b'a' * 20
+
+
+def test_expired_entry_is_removed():
+    """Тестирование того, что истекший ответ не отдается и освобождает место"""
+    cache = EdgeCache(max_bytes=100, max_entry_bytes=100, default_ttl=60)
+    cache.set('a', 200, {}, b'a' * 10, ttl=0)
+
+    # Проверка результата
+    assert cache.get('a') is None
+    assert cache.size == 0
+    assert cache.stats()['misses'] == 1
+
+
+def test_oversized_entry_is_not_cached():
+    """Тестирование того, что ответ больше max_entry_bytes не кешируется и не вытесняет другие"""
+    cache = EdgeCache(max_bytes=100, max_entry_bytes=20, default_ttl=60)
+    cache.set('a', 200, {}, b'a' * 10, ttl=60)
+    cache.set('big', 200, {}, b'b' * 21, ttl=60)
+
+    # Проверка результата
+    assert cache.get('big') is None
+    assert cache.get('a') is not None
+    assert cache.size == 10
+
+
+async def stream(chunks: List[bytes]) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def test_tee_caches_streamed_body():
+    """Тестирование того, что тело отдается потоком без изменений и кладется в кэш целиком"""
+    cache = EdgeCache(max_bytes=100, max_entry_bytes=20, default_ttl=60)
+
+    # Выполнение запроса
+    body = stream([b'{"a"', b': 1}'])
+    chunks = [chunk async for chunk in cache.tee('a', 200, {'content-type': 'application/json'}, 60, body)]
+
+    # Проверка результата
+    assert chunks == [b'{"a"', b': 1}']
+    entry = cache.get('a')
+    assert entry.body == b'{"a": 1}'
+    assert entry.headers == {'content-type': 'application/json'}
+
+
+async def test_tee_skips_oversized_body():
+    """Тестирование того, что слишком большое тело отдается целиком, но не кешируется"""
+    cache = EdgeCache(max_bytes=100, max_entry_bytes=20, default_ttl=60)
+    body = [b'x' * 15, b'y' * 15, b'z' * 15]
+
+    # Выполнение запроса
+    chunks = [chunk async for chunk in cache.tee('big', 200, {}, 60, stream(body))]
+
+    # Проверка результата
+    assert chunks == body
+    assert cache.get('big') is None
+    assert cache.size == 0
+
+
+async def test_tee_does_not_cache_interrupted_body():
+    """Тестирование того, что тело, которое клиент не дочитал, не кешируется"""
+    cache = EdgeCache(max_bytes=100, max_entry_bytes=20, default_ttl=60)
+    chunks = cache.tee('a', 200, {}, 60, stream([b'first', b'second']))
+
+    # Выполнение запроса
+    await chunks.__anext__()
+    await chunks.aclose()
+
+    # Проверка результата
+    assert cache.get('a') is None
@@ -0,0 +1,182 @@
+import asyncio
+import contextlib
+import random
+import time
+
+import pytest
+from services.upstreams import (LEAST_OUTSTANDING, POWER_OF_TWO_CHOICES,
+                                Upstream)
+
+
+class FakeResponse:
+    def __init__(self, status: int):
+        self.status = status
+
+    def release(self) -> None:
+        pass
+
+
+class FakeSession:
+    """Пул соединений: statuses - код ответа по url реплики, hang - запросы к реплике не завершаются"""
+
+    def __init__(self, statuses: dict = None, hang: bool = False):
+        self.statuses = statuses or {}
+        self.hang = hang
+
+    async def request(self, method: str, url: str, **kwargs) -> FakeResponse:
+        if self.hang:
+            await asyncio.Event().wait()
+        status = self.statuses.get(url.rsplit('/', 1)[0], 200)
+        if isinstance(status, Exception):
+            raise status
+        return FakeResponse(status)
+
+
+def make_upstream(count: int = 3, **kwargs) -> Upstream:
+    return Upstream(
+        'asyncapi',
+        [f'http://replica-{number}' for number in range(count)],
+        pool_size=10,
+        keepalive_timeout=30,
+        connect_timeout=1,
+        read_timeout=1,
+        dns_ttl=60,
+        **kwargs,
+    )
+
+
+def test_choose_least_outstanding():
+    """Тестирование выбора реплики с наименьшим числом запросов, а при равенстве - более быстрой"""
+    upstream = make_upstream(balancer=LEAST_OUTSTANDING)
+    first, second, third = upstream.replicas
+    first.in_flight, second.in_flight, third.in_flight = 2, 1, 1
+    second.latency, third.latency = 0.2, 0.1
+
+    # Проверка результата
+    assert upstream.choose() is third
+
+
+def test_choose_skips_unavailable():
+    """Тестирование того, что исключенная и больная реплики не выбираются, а если доступных нет - выбираются все"""
+    upstream = make_upstream()
+    first, second, third = upstream.replicas
+    first.ejected_until = time.monotonic() + 30
+    second.healthy = False
+    third.in_flight = 5
+
+    # Проверка результата
+    assert upstream.choose() is third
+    third.healthy = False
+    assert upstream.choose() is first
+
+
+def test_choose_power_of_two_choices(monkeypatch):
+    """Тестирование p2c: из двух случайных реплик выбирается менее нагруженная"""
+    upstream = make_upstream(balancer=POWER_OF_TWO_CHOICES)
+    first, second, third = upstream.replicas
+    first.in_flight, second.in_flight, third.in_flight = 0, 3, 1
+    monkeypatch.setattr(random, 'sample', lambda candidates, count: [second, third])
+
+    # Проверка результата: самая свободная реплика не попала в выборку
+    assert upstream.choose() is third
+
+
+def test_eject_respects_max_ejection_percent():
+    """Тестирование того, что исключается не больше max_ejection_percent реплик"""
+    upstream = make_upstream(count=4, max_ejection_percent=50)
+    replicas = upstream.replicas
+
+    # Выполнение исключения
+    for replica in replicas:
+        upstream._eject(replica, 'test')
+
+    # Проверка результата
+    assert [replica.available for replica in replicas] == [False, False, True, True]
+
+
+def test_eject_resets_latency_and_failures():
+    """Тестирование того, что после возвращения реплики её время ответа и ошибки считаются заново"""
+    upstream = make_upstream(ejection_time=0)
+    replica = upstream.replicas[0]
+    replica.latency, replica.failures = 1.0, 3
+
+    # Выполнение исключения
+    upstream._eject(replica, 'test')
+
+    # Проверка результата
+    assert replica.latency is None
+    assert replica.failures == 0
+
+
+def test_check_outlier():
+    """Тестирование исключения реплики, которая отвечает в outlier_factor раз медленнее медианы остальных"""
+    upstream = make_upstream(outlier_factor=3)
+    slow, first, second = upstream.replicas
+    first.latency, second.latency = 0.1, 0.1
+
+    # Выполнение проверки: в 2 раза медленнее - терпимо, в 4 раза - исключается
+    slow.latency = 0.2
+    upstream._check_outlier(slow)
+    tolerated = slow.available
+    slow.latency = 0.4
+    upstream._check_outlier(slow)
+
+    # Проверка результата
+    assert tolerated
+    assert not slow.available
+
+
+def test_check_outlier_ignores_fast_replicas():
+    """Тестирование того, что реплика быстрее MIN_OUTLIER_LATENCY или без соседей с замерами не исключается"""
+    upstream = make_upstream(outlier_factor=3)
+    fast, first, second = upstream.replicas
+    first.latency, second.latency, fast.latency = 0.001, 0.001, 0.01
+
+    # Выполнение проверки
+    upstream._check_outlier(fast)
+    lonely = make_upstream()
+    lonely.replicas[0].latency = 10
+    lonely._check_outlier(lonely.replicas[0])
+
+    # Проверка результата
+    assert fast.available
+    assert lonely.replicas[0].available
+
+
+async def test_failures_in_a_row_eject_replica():
+    """Тестирование исключения реплики после max_failures ошибок подряд"""
+    upstream = make_upstream(count=2, max_failures=2)
+    upstream.session = FakeSession(statuses={'http://replica-0': 500, 'http://replica-1': ConnectionError()})
+
+    # Выполнение запроса
+    for _ in range(4):
+        with contextlib.suppress(ConnectionError):
+            replica, resp = await upstream.request('GET', '/film')
+            upstream.release(replica, resp)
+
+    # Проверка результата: исключена только одна из двух реплик из-за max_ejection_percent
+    assert [replica.available for replica in upstream.replicas].count(False) == 1
+    assert upstream.errors == 2
+    assert upstream.in_flight == 0
+
+
+async def test_cancelled_request_releases_counters():
+    """Тестирование того, что отмененный запрос возвращает счетчики и не считается ошибкой реплики"""
+    upstream = make_upstream(count=1)
+    upstream.session = FakeSession(hang=True)
+
+    # Выполнение запроса
+    task = asyncio.ensure_future(upstream.request('GET', '/film'))
+    await asyncio.sleep(0)
+    in_flight = upstream.in_flight
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # Проверка результата
+    replica = upstream.replicas[0]
+    assert in_flight == 1
+    assert upstream.in_flight == 0
+    assert replica.in_flight == 0
+    assert replica.errors == 0
+    assert replica.failures == 0
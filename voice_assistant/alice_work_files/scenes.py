@@ -10,6 +10,7 @@ from alice_work_files.intents import FILM_INFO_INTENTS, PERSON_INFO_INTENTS, TOP
 from alice_work_files.request import AliceRequest
 from alice_work_files.response_helpers import button
 from core import context_logger
+from settings import ASYNC_API_URL, BATCH_MAX_IDS
 
 logger = context_logger.get(__name__)
 
@@ -251,6 +252,18 @@ class PersonInfo(GlobalScene):
         else:
             return ''
 
+    async def _get_films(self, request: AliceRequest, film_ids: list[str]) -> list[dict]:
+        # фильмы получаем пачками через film/batch, а не по одному: asyncapi принимает не больше BATCH_MAX_IDS id
+        films = []
+        for start in range(0, len(film_ids), BATCH_MAX_IDS):
+            ids = ','.join(film_ids[start:start + BATCH_MAX_IDS])
+            async with request.session.get(url=f'{ASYNC_API_URL}/film/batch', params={'ids': ids}) as resp:
+                if resp.status != 200:
+                    logger.error(f'film/batch failed with status {resp.status}')
+                    continue
+                films.extend(await resp.json())
+        return films
+
     async def person_age(self, request: AliceRequest):
         person_id = await self._get_person_id(request)
 
@@ -265,12 +278,8 @@ class PersonInfo(GlobalScene):
 
         resp_json = await self.get_request(request, path=f'person/{person_id}')
 
-        person_film_ids = (film_id for film_id in resp_json['film_ids'])
-
-        person_films = []
-        for film_id in person_film_ids:
-            resp_json = await self.get_request(request, path=f'film/{film_id}')
-            person_films.append(resp_json['title'])
+        films = await self._get_films(request, resp_json['film_ids'])
+        person_films = (film['title'] for film in films)
 
         text = '\n'.join(person_films)
         return await self.make_response(text)
@@ -17,6 +17,8 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ASYNC_API_HOST = env('ASYNC_API_HOST', '0.0.0.0')
 ASYNC_API_PORT = env('ASYNC_API_PORT', '8001')
 ASYNC_API_URL = f'http://{ASYNC_API_HOST}:{ASYNC_API_PORT}/api/v1'
+# Сколько id фильмов можно передать в film/batch за раз, не больше BATCH_MAX_IDS в asyncapi
+BATCH_MAX_IDS = env.int('BATCH_MAX_IDS', 100)
 
 DEBUG = bool(os.getenv('DEBUG', False))
 LOGGING_LEVEL = os.getenv('LOGGING_LEVEL', 'DEBUG')